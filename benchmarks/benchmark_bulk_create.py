@@ -0,0 +1,59 @@
+import asyncio
+import time
+import sys
+import os
+
+# Add src to path
+sys.path.append(os.getcwd())
+
+from benchmarks.common import get_benchmark_db
+from src.db.repository import VehicleRepository
+from src.services.vehicle_service import VehicleService
+from src.models.vehicle import VehicleCreate, VehicleType
+
+BATCH_SIZE = int(os.getenv("BENCH_BATCH_SIZE", "500"))
+
+def make_batch(prefix: str, count: int) -> list:
+    return [
+        VehicleCreate(
+            placa=f"{prefix}-{i:05d}",
+            numero_economico=f"{prefix}-{i}",
+            marca="Utility",
+            modelo="3000R",
+            anno=2021,
+            tipo_vehiculo=VehicleType.TRAILER,
+            capacidad_carga_kg=30000,
+            numero_serie=f"{prefix}{i:015d}",
+            poliza_seguro="P-123",
+            vigencia_seguro="2030-01-01"
+        )
+        for i in range(count)
+    ]
+
+async def benchmark_bulk_create():
+    print(f"Benchmarking creation of {BATCH_SIZE} vehicles...")
+    repo = VehicleRepository(await get_benchmark_db())
+    await repo.collection.drop()
+    await repo.create_indexes()
+    service = VehicleService(repo)
+    service.max_bulk_size = BATCH_SIZE
+
+    sequential = make_batch("SQ", BATCH_SIZE)
+    start_time = time.time()
+    for vehicle in sequential:
+        await service.create_vehicle(vehicle)
+    sequential_time = time.time() - start_time
+
+    bulk = make_batch("BK", BATCH_SIZE)
+    start_time = time.time()
+    result = await service.create_vehicles_bulk(bulk)
+    bulk_time = time.time() - start_time
+    assert result.created == BATCH_SIZE
+
+    print(f"Sequential create_vehicle: {sequential_time:.4f}s ({BATCH_SIZE * 2} round trips)")
+    print(f"create_vehicles_bulk: {bulk_time:.4f}s (2 round trips)")
+    print(f"Speedup: {sequential_time / bulk_time:.1f}x")
+    await repo.collection.drop()
+
+if __name__ == "__main__":
+    asyncio.run(benchmark_bulk_create())
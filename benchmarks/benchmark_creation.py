@@ -1,7 +1,8 @@
+import asyncio
 import time
 import sys
 import os
-from unittest.mock import MagicMock
+from unittest.mock import AsyncMock, MagicMock
 
 # Add src to path
 sys.path.append(os.getcwd())
@@ -9,22 +10,34 @@ sys.path.append(os.getcwd())
 from src.services.vehicle_service import VehicleService
 from src.models.vehicle import VehicleCreate, VehicleType
 
-def benchmark_create():
-    print("Benchmarking create_vehicle (Optimized)...")
+ROUND_TRIP = 0.01 # 10ms simulated DB latency per query
 
+async def benchmark_mode(mode: str, vehicle_in: VehicleCreate, iterations: int) -> float:
     # Mock Repository
-    repo = MagicMock()
+    repo = AsyncMock()
 
-    # Simulate DB latency for the new optimized call
-    # 10ms for a single query checking all 3 fields
-    def check_uniqueness_side_effect(placa, numero_economico, numero_serie):
-        time.sleep(0.01) # 10ms latency
+    # One query checking all 3 fields
+    async def check_uniqueness_side_effect(placa, numero_economico, numero_serie):
+        await asyncio.sleep(ROUND_TRIP)
         return []
 
+    async def create_side_effect(vehicle):
+        await asyncio.sleep(ROUND_TRIP)
+        return MagicMock()
+
     repo.check_uniqueness.side_effect = check_uniqueness_side_effect
-    repo.create.return_value = MagicMock()
+    repo.create.side_effect = create_side_effect
 
     service = VehicleService(repo)
+    service.create_mode = mode
+
+    start_time = time.time()
+    for _ in range(iterations):
+        await service.create_vehicle(vehicle_in)
+    return time.time() - start_time
+
+async def benchmark_create():
+    print("Benchmarking create_vehicle (precheck vs direct insert)...")
 
     # Minimal valid vehicle
     vehicle_in = VehicleCreate(
@@ -41,14 +54,10 @@ def benchmark_create():
     )
 
     iterations = 50
-    start_time = time.time()
-    for _ in range(iterations):
-        service.create_vehicle(vehicle_in)
-    end_time = time.time()
-
-    total_time = end_time - start_time
-    print(f"Time taken for {iterations} creations: {total_time:.4f}s")
-    print(f"Average time per creation: {total_time/iterations:.4f}s")
+    for mode in ("precheck", "direct"):
+        total_time = await benchmark_mode(mode, vehicle_in, iterations)
+        print(f"[{mode}] Time taken for {iterations} creations: {total_time:.4f}s")
+        print(f"[{mode}] Average time per creation: {total_time/iterations:.4f}s")
 
 if __name__ == "__main__":
-    benchmark_create()
+    asyncio.run(benchmark_create())
@@ -0,0 +1,93 @@
+import asyncio
+import random
+import time
+import sys
+import os
+from datetime import datetime, timedelta
+
+# Add src to path
+sys.path.append(os.getcwd())
+
+from benchmarks.common import get_benchmark_db
+from src.db.repository import VehicleRepository
+from src.services.vehicle_service import VehicleService
+
+FLEET_SIZE = int(os.getenv("BENCH_FLEET_SIZE", "100000"))
+INSURANCE_WITHIN_DAYS = 30
+INSPECTION_OLDER_THAN_DAYS = 365
+
+async def seed(repo: VehicleRepository, count: int):
+    await repo.collection.drop()
+    await repo.create_indexes()
+    rng = random.Random(42)
+    today = datetime.combine(datetime.utcnow().date(), datetime.min.time())
+    batch = []
+    for i in range(count):
+        batch.append({
+            "placa": f"DU-{i:07d}",
+            "numero_economico": f"DUE-{i}",
+            "marca": "Volvo",
+            "modelo": "VNL",
+            "anno": 2020,
+            "tipo_vehiculo": "TRAILER",
+            "capacidad_carga_kg": 20000.0,
+            "numero_serie": f"DUE{i:014d}",
+            "estado_vehiculo": "ACTIVE",
+            "fecha_alta": datetime(2020, 1, 1),
+            "ultima_verificacion": today - timedelta(days=rng.randint(0, 400)),
+            "poliza_seguro": "P-123",
+            "vigencia_seguro": today + timedelta(days=rng.randint(-30, 730)),
+            "version": 1,
+        })
+        if len(batch) == 5000:
+            await repo.collection.insert_many(batch)
+            batch = []
+    if batch:
+        await repo.collection.insert_many(batch)
+
+async def paged_scan(service: VehicleService) -> int:
+    # What compliance does today: page through the whole fleet and filter
+    today = datetime.combine(datetime.utcnow().date(), datetime.min.time())
+    insurance_cutoff = today + timedelta(days=INSURANCE_WITHIN_DAYS)
+    inspection_cutoff = datetime.utcnow() - timedelta(days=INSPECTION_OLDER_THAN_DAYS)
+    due = 0
+    cursor = None
+    while True:
+        page = await service.list_vehicles(limit=1000, cursor=cursor)
+        due += sum(
+            1 for v in page.items
+            if datetime.combine(v.vigencia_seguro, datetime.min.time()) <= insurance_cutoff
+            or v.ultima_verificacion is None
+            or v.ultima_verificacion < inspection_cutoff
+        )
+        if page.next_cursor is None:
+            return due
+        cursor = page.next_cursor
+
+async def due_query(service: VehicleService) -> int:
+    chunks = service.due_vehicles(
+        insurance_within_days=INSURANCE_WITHIN_DAYS,
+        inspection_older_than_days=INSPECTION_OLDER_THAN_DAYS,
+    )
+    return sum([chunk.count(b"\n") async for chunk in chunks])
+
+async def benchmark_due():
+    print(f"Benchmarking compliance checks over {FLEET_SIZE} vehicles...")
+    repo = VehicleRepository(await get_benchmark_db())
+    await seed(repo, FLEET_SIZE)
+    service = VehicleService(repo)
+
+    start_time = time.time()
+    scanned = await paged_scan(service)
+    scan_time = time.time() - start_time
+
+    start_time = time.time()
+    streamed = await due_query(service)
+    due_time = time.time() - start_time
+
+    print(f"Paged list scan: {scan_time:.3f}s ({scanned} due)")
+    print(f"/due query: {due_time:.3f}s ({streamed} due)")
+    await repo.collection.drop()
+
+if __name__ == "__main__":
+    asyncio.run(benchmark_due())
@@ -0,0 +1,284 @@
+import asyncio
+import itertools
+import json
+import random
+import time
+import sys
+import os
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, List, Optional, Tuple
+
+# Add src to path
+sys.path.append(os.getcwd())
+
+import httpx
+from bson import ObjectId
+from benchmarks.common import get_benchmark_db, benchmark_backend
+from src.main import app
+from src.db.database import get_database
+from src.db.cache import vehicle_cache, vehicle_count_cache
+from src.db.pagination import encode_cursor
+from src.db.repository import VehicleRepository
+from src.db.stats_repository import FleetStatsRepository
+
+# Drives every vehicles endpoint through the ASGI app, so routing, validation,
+# serialization and the repository all count. Results are compared against
+# benchmarks/baselines.json. On mongod the run exits non-zero on a
+# regression; mongomock numbers swing by ~2x between identical runs (queries
+# run in-process, on whatever CPU is left), so there the comparison is only
+# reported and just unexpected responses fail the run.
+#
+#   BENCH_FLEET_SIZE        vehicles seeded before the run (default 2000)
+#   BENCH_REQUESTS          requests per scenario (default 200)
+#   BENCH_CONCURRENCY       requests in flight per scenario (default 16)
+#   BENCH_TOLERANCE         allowed slowdown against the baseline (default 0.5 = 50%)
+#   BENCH_SCENARIOS         comma-separated subset of scenario names to run
+#   BENCH_UPDATE_BASELINE=1 store this run as the new baseline instead of checking it
+
+FLEET_SIZE = int(os.getenv("BENCH_FLEET_SIZE", "2000"))
+REQUESTS = int(os.getenv("BENCH_REQUESTS", "200"))
+CONCURRENCY = int(os.getenv("BENCH_CONCURRENCY", "16"))
+TOLERANCE = float(os.getenv("BENCH_TOLERANCE", "0.5"))
+SCENARIO_FILTER = [name for name in os.getenv("BENCH_SCENARIOS", "").split(",") if name]
+UPDATE_BASELINE = os.getenv("BENCH_UPDATE_BASELINE", "").lower() in ("1", "true", "yes")
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+
+Request = Tuple[str, str, dict]  # method, url, httpx keyword arguments
+
+@dataclass
+class Scenario:
+    name: str
+    build: Callable[[int], Request]
+    expected_status: int = 200
+    requests: Optional[int] = None
+    # mongomock lacks some operators (e.g. $text); such scenarios only run on mongod
+    needs_mongod: bool = False
+
+@dataclass
+class Result:
+    name: str
+    requests: int
+    errors: int
+    rps: float
+    p50: float
+    p95: float
+    p99: float
+
+def vehicle_payload(prefix: str, i: int) -> dict:
+    return {
+        "placa": f"{prefix}-{i:06d}",
+        "numero_economico": f"{prefix}-{i}",
+        "marca": "Volvo",
+        "modelo": "VNL",
+        "anno": 2020,
+        "tipo_vehiculo": "TRAILER",
+        "capacidad_carga_kg": 20000,
+        "numero_serie": f"{prefix}{i:015d}",
+        "poliza_seguro": "P-123",
+        "vigencia_seguro": "2030-01-01",
+    }
+
+async def seed(db, count: int) -> List[str]:
+    repo = VehicleRepository(db)
+    await repo.collection.drop()
+    await repo.create_indexes()
+    rng = random.Random(42)
+    today = datetime.combine(datetime.utcnow().date(), datetime.min.time())
+    docs = [
+        {
+            **vehicle_payload("LD", i),
+            "marca": ["Volvo", "Kenworth", "Freightliner"][i % 3],
+            "anno": 2010 + i % 14,
+            "estado_vehiculo": ["ACTIVE", "IN_MAINTENANCE"][i % 2],
+            "base_operativa": ["MTY", "GDL", "CDMX"][i % 3],
+            "fecha_alta": datetime(2020, 1, 1) + timedelta(minutes=i),
+            "ultima_verificacion": today - timedelta(days=rng.randint(0, 400)),
+            "vigencia_seguro": today + timedelta(days=rng.randint(-30, 730)),
+            "version": 1,
+        }
+        for i in range(count)
+    ]
+    for start in range(0, len(docs), 5000):
+        await repo.collection.insert_many(docs[start:start + 5000])
+    await FleetStatsRepository(db).rebuild()
+    return [str(doc["_id"]) for doc in docs]
+
+def import_body(rows: int, counter) -> bytes:
+    columns = list(vehicle_payload("IM", 0))
+    lines = [",".join(columns)]
+    for _ in range(rows):
+        payload = vehicle_payload("IM", next(counter))
+        lines.append(",".join(str(payload[column]) for column in columns))
+    return "\n".join(lines).encode()
+
+def build_scenarios(ids: List[str]) -> List[Scenario]:
+    # Write scenarios touch their own slice of ids so they never collide
+    quarter = len(ids) // 4
+    read_ids, update_ids, bulk_ids, delete_ids = (
+        ids[:quarter], ids[quarter:2 * quarter], ids[2 * quarter:3 * quarter], ids[3 * quarter:]
+    )
+    base = "/api/v1/vehicles"
+    # A cursor half way through the fleet, the page `skip` handles worst
+    mid_cursor = encode_cursor("_id", {"_id": ObjectId(ids[len(ids) // 2])})
+    counter = itertools.count()
+
+    def pick(pool: List[str], i: int) -> str:
+        return pool[i % len(pool)]
+
+    # GET /events is a long-lived stream rather than a request/response
+    # endpoint, so it has no latency to measure here
+    return [
+        Scenario("create", lambda i: ("POST", f"{base}/", {"json": vehicle_payload("CR", next(counter))}), 201),
+        Scenario("create_bulk", lambda i: (
+            "POST", f"{base}/bulk", {"json": [vehicle_payload("BC", next(counter)) for _ in range(20)]}
+        ), requests=max(REQUESTS // 10, 1)),
+        Scenario("import_csv", lambda i: (
+            "POST", f"{base}/import", {"content": import_body(200, counter), "headers": {"Content-Type": "text/csv"}}
+        ), requests=max(REQUESTS // 40, 1)),
+        Scenario("update_bulk", lambda i: (
+            "PATCH", f"{base}/bulk", {"json": {"items": [
+                {"id": pick(bulk_ids, i * 10 + j), "update": {"estado_vehiculo": ["ACTIVE", "IN_MAINTENANCE"][i % 2]}}
+                for j in range(10)
+            ]}}
+        ), requests=max(REQUESTS // 10, 1)),
+        Scenario("list", lambda i: ("GET", f"{base}/", {"params": {"limit": 100}})),
+        Scenario("list_filtered", lambda i: (
+            "GET", f"{base}/", {"params": {"estado_vehiculo": "ACTIVE", "anno_min": 2015, "limit": 50}}
+        )),
+        Scenario("list_sorted_fields", lambda i: (
+            "GET", f"{base}/", {"params": {"sort": "-anno", "fields": "placa,anno", "limit": 100}}
+        )),
+        Scenario("list_cursor", lambda i: ("GET", f"{base}/", {"params": {"limit": 50, "cursor": mid_cursor}})),
+        Scenario("export", lambda i: ("GET", f"{base}/export", {"params": {"batch_size": 500}}),
+                 requests=max(REQUESTS // 40, 1)),
+        Scenario("due", lambda i: (
+            "GET", f"{base}/due", {"params": {"insurance_within_days": 30, "inspection_older_than_days": 365}}
+        ), requests=max(REQUESTS // 20, 1)),
+        Scenario("search", lambda i: ("GET", f"{base}/search", {"params": {"q": f"ld-{i % 200:05d}"}}),
+                 needs_mongod=True),
+        Scenario("stats", lambda i: ("GET", f"{base}/stats", {})),
+        Scenario("stats_rebuild", lambda i: ("POST", f"{base}/stats/rebuild", {}),
+                 requests=max(REQUESTS // 40, 1)),
+        Scenario("get", lambda i: ("GET", f"{base}/{pick(read_ids, i)}", {})),
+        Scenario("get_fields", lambda i: ("GET", f"{base}/{pick(read_ids, i)}", {"params": {"fields": "placa,estado_vehiculo"}})),
+        Scenario("update", lambda i: (
+            "PUT", f"{base}/{pick(update_ids, i)}", {"json": {"kilometraje_actual": 1000 + i}}
+        )),
+        Scenario("delete", lambda i: ("DELETE", f"{base}/{pick(delete_ids, i)}", {}), 204,
+                 requests=min(REQUESTS, len(delete_ids))),
+    ]
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    index = min(int(round(fraction * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+async def run_scenario(client: httpx.AsyncClient, scenario: Scenario) -> Result:
+    total = scenario.requests or REQUESTS
+    latencies: List[float] = []
+    errors = 0
+    next_index = itertools.count()
+
+    async def worker():
+        nonlocal errors
+        while True:
+            i = next(next_index)
+            if i >= total:
+                return
+            method, url, kwargs = scenario.build(i)
+            started = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code != scenario.expected_status:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(min(CONCURRENCY, total))))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return Result(
+        name=scenario.name,
+        requests=total,
+        errors=errors,
+        rps=total / elapsed,
+        p50=percentile(latencies, 0.50) * 1000,
+        p95=percentile(latencies, 0.95) * 1000,
+        p99=percentile(latencies, 0.99) * 1000,
+    )
+
+def load_baselines() -> dict:
+    if not os.path.exists(BASELINE_PATH):
+        return {}
+    with open(BASELINE_PATH) as handle:
+        return json.load(handle)
+
+def check_regressions(results: List[Result], baseline: dict) -> List[str]:
+    failures = []
+    for result in results:
+        expected = baseline.get(result.name)
+        if not expected:
+            if baseline:
+                # A scenario added without re-recording would never be checked
+                failures.append(f"{result.name}: no baseline; re-record with BENCH_UPDATE_BASELINE=1")
+            continue
+        if result.p95 > expected["p95_ms"] * (1 + TOLERANCE):
+            failures.append(f"{result.name}: p95 {result.p95:.2f}ms > baseline {expected['p95_ms']:.2f}ms")
+        if result.rps < expected["rps"] / (1 + TOLERANCE):
+            failures.append(f"{result.name}: {result.rps:.0f} req/s < baseline {expected['rps']:.0f} req/s")
+    return failures
+
+async def benchmark_load() -> int:
+    db = await get_benchmark_db()
+    backend = benchmark_backend(db)
+    print(f"Seeding {FLEET_SIZE} vehicles ({backend}); {REQUESTS} requests per scenario, concurrency {CONCURRENCY}")
+    ids = await seed(db, FLEET_SIZE)
+    vehicle_cache.clear()
+    vehicle_count_cache.clear()
+    app.dependency_overrides[get_database] = lambda: db
+
+    scenarios = [
+        scenario for scenario in build_scenarios(ids)
+        if backend == "mongod" or not scenario.needs_mongod
+    ]
+    if SCENARIO_FILTER:
+        scenarios = [scenario for scenario in scenarios if scenario.name in SCENARIO_FILTER]
+
+    results = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for scenario in scenarios:
+            results.append(await run_scenario(client, scenario))
+
+    print(f"{'scenario':<20}{'reqs':>6}{'errors':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for r in results:
+        print(f"{r.name:<20}{r.requests:>6}{r.errors:>8}{r.rps:>10.1f}{r.p50:>10.2f}{r.p95:>10.2f}{r.p99:>10.2f}")
+
+    await db.client.drop_database(db.name)
+    app.dependency_overrides.pop(get_database, None)
+
+    baselines = load_baselines()
+    # Baselines are kept per backend and fleet size: mongomock numbers say
+    # nothing about a real mongod and vice versa
+    key = f"{backend}-{FLEET_SIZE}"
+    if UPDATE_BASELINE:
+        baselines[key] = {r.name: {"rps": round(r.rps, 1), "p95_ms": round(r.p95, 2)} for r in results}
+        with open(BASELINE_PATH, "w") as handle:
+            json.dump(baselines, handle, indent=2, sort_keys=True)
+            handle.write("\n")
+        print(f"Stored baseline {key} in {BASELINE_PATH}")
+        return 0
+
+    if key not in baselines:
+        print(f"No baseline for {key}; run with BENCH_UPDATE_BASELINE=1 to record one")
+    errors = [f"{r.name}: {r.errors} unexpected responses" for r in results if r.errors]
+    for error in errors:
+        print(f"ERROR {error}")
+    regressions = check_regressions(results, baselines.get(key, {}))
+    # Too noisy on mongomock to gate on; shown for orientation only
+    label = "SLOWER" if backend == "mongomock" else "REGRESSION"
+    for regression in regressions:
+        print(f"{label} {regression}")
+    return 1 if errors or (regressions and backend != "mongomock") else 0
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(benchmark_load()))
@@ -0,0 +1,65 @@
+import asyncio
+import time
+import sys
+import os
+from unittest.mock import AsyncMock
+
+# Add src to path
+sys.path.append(os.getcwd())
+
+import httpx
+from fastapi import FastAPI
+from src.api.deps import get_service
+from src.api.responses import ORJSONResponse
+from src.api.v1.endpoints import vehicles
+from src.metrics import MetricsMiddleware
+from src.models.vehicle import Vehicle, VehicleType
+
+REQUESTS = int(os.getenv("BENCH_REQUESTS", "2000"))
+ROUNDS = int(os.getenv("BENCH_ROUNDS", "5"))
+
+def build_app(instrumented: bool) -> FastAPI:
+    app = FastAPI(default_response_class=ORJSONResponse)
+    app.include_router(vehicles.router, prefix="/api/v1/vehicles")
+    if instrumented:
+        app.add_middleware(MetricsMiddleware)
+
+    # Serve from memory so the numbers isolate the middleware cost
+    service = AsyncMock()
+    service.get_vehicle.return_value = Vehicle(
+        id="65a000000000000000000001", version=1, placa="AA-123-BB", numero_economico="100",
+        marca="Volvo", modelo="VNL", anno=2020, tipo_vehiculo=VehicleType.TRACTOR_TRUCK,
+        capacidad_carga_kg=20000, numero_serie="12345678901234567", poliza_seguro="P-123",
+        vigencia_seguro="2025-01-01"
+    )
+    app.dependency_overrides[get_service] = lambda: service
+    return app
+
+async def measure(app: FastAPI) -> float:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        url = "/api/v1/vehicles/65a000000000000000000001"
+        for _ in range(100):
+            await client.get(url)
+        start_time = time.perf_counter()
+        for _ in range(REQUESTS):
+            await client.get(url)
+        return (time.perf_counter() - start_time) / REQUESTS
+
+async def benchmark_metrics():
+    print(f"Benchmarking metrics middleware overhead over {REQUESTS} requests...")
+    apps = {False: build_app(instrumented=False), True: build_app(instrumented=True)}
+    # Interleave rounds and keep the best of each, so scheduler noise does not
+    # swamp a difference of a few microseconds
+    best = {False: float("inf"), True: float("inf")}
+    for _ in range(ROUNDS):
+        for instrumented, app in apps.items():
+            best[instrumented] = min(best[instrumented], await measure(app))
+    plain, instrumented = best[False], best[True]
+
+    print(f"without metrics: {plain * 1e6:.1f}us per request")
+    print(f"with metrics: {instrumented * 1e6:.1f}us per request")
+    print(f"overhead: {(instrumented - plain) * 1e6:.1f}us ({(instrumented / plain - 1) * 100:.1f}%)")
+
+if __name__ == "__main__":
+    asyncio.run(benchmark_metrics())
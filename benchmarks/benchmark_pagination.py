@@ -0,0 +1,68 @@
+import asyncio
+import time
+import sys
+import os
+from datetime import datetime
+
+# Add src to path
+sys.path.append(os.getcwd())
+
+from benchmarks.common import get_benchmark_db
+from src.db.repository import VehicleRepository
+
+FLEET_SIZE = int(os.getenv("BENCH_FLEET_SIZE", "60000"))
+PAGE_SIZE = 100
+
+async def seed(repo: VehicleRepository, count: int):
+    await repo.collection.drop()
+    await repo.create_indexes()
+    batch = []
+    for i in range(count):
+        batch.append({
+            "placa": f"BP-{i:07d}",
+            "numero_economico": f"BENCH-{i}",
+            "marca": "Volvo",
+            "modelo": "VNL",
+            "anno": 2020,
+            "tipo_vehiculo": "TRAILER",
+            "capacidad_carga_kg": 20000.0,
+            "numero_serie": f"BENCH{i:012d}",
+            "estado_vehiculo": "ACTIVE",
+            "fecha_alta": datetime(2020, 1, 1),
+            "poliza_seguro": "P-123",
+            "vigencia_seguro": datetime(2030, 1, 1),
+        })
+        if len(batch) == 5000:
+            await repo.collection.insert_many(batch)
+            batch = []
+    if batch:
+        await repo.collection.insert_many(batch)
+
+async def benchmark_pagination():
+    print(f"Benchmarking deep pagination over {FLEET_SIZE} vehicles...")
+    repo = VehicleRepository(await get_benchmark_db())
+    await seed(repo, FLEET_SIZE)
+
+    deep_skip = FLEET_SIZE - PAGE_SIZE * 2
+
+    # Grab the cursor that points at the same deep page so both modes fetch identical data
+    page = await repo.list(skip=deep_skip - PAGE_SIZE, limit=PAGE_SIZE)
+    deep_cursor = page.next_cursor
+
+    iterations = 20
+    start_time = time.time()
+    for _ in range(iterations):
+        await repo.list(skip=deep_skip, limit=PAGE_SIZE)
+    skip_time = (time.time() - start_time) / iterations
+
+    start_time = time.time()
+    for _ in range(iterations):
+        await repo.list(cursor=deep_cursor, limit=PAGE_SIZE)
+    cursor_time = (time.time() - start_time) / iterations
+
+    print(f"skip={deep_skip}: {skip_time * 1000:.2f}ms per page")
+    print(f"cursor at the same offset: {cursor_time * 1000:.2f}ms per page")
+    await repo.collection.drop()
+
+if __name__ == "__main__":
+    asyncio.run(benchmark_pagination())
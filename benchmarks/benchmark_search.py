@@ -0,0 +1,70 @@
+import asyncio
+import time
+import sys
+import os
+from datetime import datetime
+
+# Add src to path
+sys.path.append(os.getcwd())
+
+from benchmarks.common import get_benchmark_db, benchmark_backend
+from src.db.repository import VehicleRepository, SEARCH_FIELDS
+from src.services.vehicle_service import VehicleService
+
+FLEET_SIZE = int(os.getenv("BENCH_FLEET_SIZE", "100000"))
+ITERATIONS = 50
+MARCAS = ["Kenworth", "Volvo", "Freightliner", "International", "Scania"]
+
+async def seed(repo: VehicleRepository, count: int):
+    await repo.collection.drop()
+    await repo.create_indexes()
+    batch = []
+    for i in range(count):
+        batch.append({
+            "placa": f"S{chr(65 + i % 26)}-{i:06d}",
+            "numero_economico": f"ECO-{i}",
+            "marca": MARCAS[i % len(MARCAS)],
+            "modelo": f"Model {i % 40}",
+            "anno": 2020,
+            "tipo_vehiculo": "TRAILER",
+            "capacidad_carga_kg": 20000.0,
+            "numero_serie": f"SRCH{i:013d}",
+            "estado_vehiculo": "ACTIVE",
+            "fecha_alta": datetime(2020, 1, 1),
+            "poliza_seguro": "P-123",
+            "vigencia_seguro": datetime(2030, 1, 1),
+            "version": 1,
+        })
+        if len(batch) == 5000:
+            await repo.collection.insert_many(batch)
+            batch = []
+    if batch:
+        await repo.collection.insert_many(batch)
+
+async def timed(label: str, call):
+    start_time = time.perf_counter()
+    for _ in range(ITERATIONS):
+        results = await call()
+    elapsed = (time.perf_counter() - start_time) / ITERATIONS
+    print(f"{label}: {elapsed * 1000:.2f}ms per search ({len(results)} results)")
+
+async def benchmark_search():
+    print(f"Benchmarking autocomplete search over {FLEET_SIZE} vehicles...")
+    db = await get_benchmark_db()
+    repo = VehicleRepository(db)
+    await seed(repo, FLEET_SIZE)
+
+    terms = {"placa": "sa-0004", "numero_economico": "eco-777", "numero_serie": "SRCH000000004"}
+    for field in SEARCH_FIELDS:
+        await timed(f"prefix {field}={terms[field]!r}", lambda: repo.prefix_search(field, terms[field], 10))
+
+    if benchmark_backend(db) == "mongod":
+        service = VehicleService(repo)
+        await timed("text 'volvo'", lambda: repo.text_search("volvo", 10))
+        await timed("full search 'eco-77'", lambda: service.search_vehicles("eco-77", 10))
+    else:
+        print("Text search needs a real MongoDB; skipped")
+    await repo.collection.drop()
+
+if __name__ == "__main__":
+    asyncio.run(benchmark_search())
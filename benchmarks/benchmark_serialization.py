@@ -0,0 +1,62 @@
+import asyncio
+import copy
+import json
+import time
+import sys
+import os
+from typing import List
+
+# Add src to path
+sys.path.append(os.getcwd())
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+from benchmarks.common import get_benchmark_db
+from benchmarks.benchmark_pagination import seed
+from src.api.responses import ORJSONResponse
+from src.db.repository import VehicleRepository
+from src.models.vehicle import Vehicle, vehicle_from_document
+
+PAGE_SIZE = 1000
+ITERATIONS = int(os.getenv("BENCH_ITERATIONS", "20"))
+
+# What `response_model=List[Vehicle]` did to every list response
+response_adapter = TypeAdapter(List[Vehicle])
+
+def validated_response(docs: List[dict]) -> bytes:
+    vehicles = [Vehicle(**doc) for doc in docs]
+    checked = response_adapter.validate_python(vehicles, from_attributes=True)
+    return json.dumps(jsonable_encoder(checked)).encode()
+
+def trusted_response(docs: List[dict]) -> bytes:
+    return ORJSONResponse([vehicle_from_document(doc) for doc in docs]).body
+
+def measure(render, docs: List[dict]) -> float:
+    # Both paths get fresh copies; the trusted one rewrites documents in place
+    batches = [copy.deepcopy(docs) for _ in range(ITERATIONS)]
+    start_time = time.perf_counter()
+    for batch in batches:
+        render(batch)
+    return (time.perf_counter() - start_time) / ITERATIONS
+
+async def benchmark_serialization():
+    print(f"Benchmarking list_vehicles response building with limit={PAGE_SIZE}...")
+    repo = VehicleRepository(await get_benchmark_db())
+    await seed(repo, PAGE_SIZE)
+    docs = await repo.collection.find().sort("_id", 1).to_list(length=PAGE_SIZE)
+
+    assert json.loads(validated_response(copy.deepcopy(docs))) == \
+        json.loads(trusted_response(copy.deepcopy(docs)))
+
+    validated_time = measure(validated_response, docs)
+    trusted_time = measure(trusted_response, docs)
+
+    print(f"validate + response_model + json: {validated_time * 1000:.2f}ms per page "
+          f"({1 / validated_time:.1f} pages/s)")
+    print(f"trusted read + orjson: {trusted_time * 1000:.2f}ms per page "
+          f"({1 / trusted_time:.1f} pages/s)")
+    print(f"speedup: {validated_time / trusted_time:.1f}x")
+    await repo.collection.drop()
+
+if __name__ == "__main__":
+    asyncio.run(benchmark_serialization())
@@ -0,0 +1,22 @@
+import os
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import ServerSelectionTimeoutError
+
+async def get_benchmark_db():
+    # Prefer a real MongoDB: mongomock runs every query in-process, so it hides
+    # round-trip costs and cannot show index range scans.
+    mongo_url = os.getenv("MONGODB_URL", "mongodb://localhost:27017")
+    client = AsyncIOMotorClient(mongo_url, serverSelectionTimeoutMS=2000)
+    try:
+        await client.admin.command("ping")
+        print(f"Using MongoDB at {mongo_url}")
+    except ServerSelectionTimeoutError:
+        from mongomock_motor import AsyncMongoMockClient
+        print("MongoDB not reachable, falling back to mongomock (numbers are not representative)")
+        client = AsyncMongoMockClient()
+    return client["vehicles_benchmark"]
+
+def benchmark_backend(db) -> str:
+    """"mongomock" or "mongod", so results are only compared against like."""
+    from mongomock_motor import AsyncMongoMockClient
+    return "mongomock" if isinstance(db.client, AsyncMongoMockClient) else "mongod"
@@ -0,0 +1,93 @@
+import gzip
+import os
+from typing import Optional
+import brotli
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Preference order when the client accepts both equally
+ENCODINGS = ("br", "gzip")
+
+def choose_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """The best supported encoding in an `Accept-Encoding` header, if any."""
+    accepted = {}
+    for entry in (accept_encoding or "").split(","):
+        coding, *params = [part.strip() for part in entry.split(";")]
+        q = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        accepted[coding.lower()] = q
+    wildcard = accepted.get("*", 0.0)
+    best, best_q = None, 0.0
+    for encoding in ENCODINGS:
+        q = accepted.get(encoding, wildcard)
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+class CompressionMiddleware:
+    """Compress complete response bodies with brotli or gzip.
+
+    Only bodies sent in one message and at least `minimum_size` bytes are
+    compressed. Streamed responses (NDJSON exports, the SSE feed) pass
+    through untouched: compressing them would buffer output and stall
+    heartbeats. Brotli runs at a low quality, which on JSON still beats gzip
+    on size at comparable CPU cost. Compressed responses carry a weak ETag.
+    """
+    minimum_size: int = int(os.getenv("RESPONSE_COMPRESSION_MIN_SIZE", "1024"))
+    gzip_level: int = int(os.getenv("RESPONSE_GZIP_LEVEL", "6"))
+    brotli_quality: int = int(os.getenv("RESPONSE_BROTLI_QUALITY", "4"))
+
+    def __init__(self, app: ASGIApp, minimum_size: Optional[int] = None):
+        self.app = app
+        if minimum_size is not None:
+            self.minimum_size = minimum_size
+
+    def compress(self, body: bytes, encoding: str) -> bytes:
+        if encoding == "br":
+            return brotli.compress(body, quality=self.brotli_quality)
+        return gzip.compress(body, compresslevel=self.gzip_level)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: Optional[Message] = None
+
+        async def send_wrapper(message: Message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                # Hold the headers until the body shows whether to compress
+                start = message
+                return
+            if start is None:
+                await send(message)
+                return
+            held, start = start, None
+            body = message.get("body", b"")
+            headers = MutableHeaders(raw=held["headers"])
+            if message.get("more_body") or len(body) < self.minimum_size or "content-encoding" in headers:
+                await send(held)
+                await send(message)
+                return
+            body = self.compress(body, encoding)
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(body))
+            headers.add_vary_header("Accept-Encoding")
+            etag = headers.get("etag")
+            if etag and not etag.startswith("W/"):
+                # The encoded bytes differ from the identity body the strong ETag named
+                headers["ETag"] = f"W/{etag}"
+            await send(held)
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_wrapper)
@@ -1,12 +1,26 @@
 from typing import Annotated
 from fastapi import Depends
-from pymongo.database import Database
+from motor.motor_asyncio import AsyncIOMotorDatabase
 from src.db.database import get_database
 from src.db.repository import VehicleRepository
+from src.db.cache import vehicle_cache, vehicle_count_cache
+from src.db.single_flight import vehicle_reads
+from src.db.stats_repository import FleetStatsRepository
 from src.services.vehicle_service import VehicleService
+from src.services.events import vehicle_events
+from src.services.telemetry import vehicle_telemetry
 
-def get_repository(db: Annotated[Database, Depends(get_database)]) -> VehicleRepository:
-    return VehicleRepository(db)
+def get_repository(db: Annotated[AsyncIOMotorDatabase, Depends(get_database)]) -> VehicleRepository:
+    return VehicleRepository(db, cache=vehicle_cache, flights=vehicle_reads)
 
-def get_service(repository: Annotated[VehicleRepository, Depends(get_repository)]) -> VehicleService:
-    return VehicleService(repository)
+def get_stats_repository(db: Annotated[AsyncIOMotorDatabase, Depends(get_database)]) -> FleetStatsRepository:
+    return FleetStatsRepository(db)
+
+def get_service(
+    repository: Annotated[VehicleRepository, Depends(get_repository)],
+    stats: Annotated[FleetStatsRepository, Depends(get_stats_repository)],
+) -> VehicleService:
+    return VehicleService(
+        repository, stats, events=vehicle_events, counts=vehicle_count_cache,
+        telemetry=vehicle_telemetry,
+    )
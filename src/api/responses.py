@@ -0,0 +1,129 @@
+from datetime import date, datetime
+from enum import Enum
+from typing import Any, Dict, Mapping, Optional, Type
+import bson
+import msgpack
+import orjson
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from pydantic import BaseModel
+from starlette.types import Receive, Scope, Send
+from src.services.etag import representation_etag
+
+def _default(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+class ORJSONResponse(JSONResponse):
+    """JSON response rendered by orjson.
+
+    Accepts models as well as plain data: models are dumped to Python objects
+    and orjson encodes enums, dates and datetimes natively, so an endpoint
+    returning this skips FastAPI's response_model validation and
+    jsonable_encoder passes.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+def _msgpack_default(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    if isinstance(value, (date, datetime)):
+        # Same ISO strings the JSON representation carries
+        return value.isoformat()
+    raise TypeError(f"Type is not MessagePack serializable: {type(value).__name__}")
+
+def _bson_value(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        value = value.model_dump()
+    if isinstance(value, Mapping):
+        return {key: _bson_value(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_bson_value(item) for item in value]
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, date) and not isinstance(value, datetime):
+        return datetime.combine(value, datetime.min.time())
+    return value
+
+class MsgPackResponse(Response):
+    """MessagePack rendering of the same data ORJSONResponse emits; dates stay ISO strings."""
+    media_type = "application/msgpack"
+
+    def render(self, content: Any) -> bytes:
+        return msgpack.packb(content, default=_msgpack_default)
+
+class BSONResponse(Response):
+    """BSON rendering with native dates. A BSON document must be an object,
+    so list responses are wrapped as `{"items": [...]}`."""
+    media_type = "application/bson"
+
+    def render(self, content: Any) -> bytes:
+        if not isinstance(content, (Mapping, BaseModel)):
+            content = {"items": content}
+        return bson.encode(_bson_value(content))
+
+RESPONSE_CLASSES: Dict[str, Type[Response]] = {
+    "application/json": ORJSONResponse,
+    "application/msgpack": MsgPackResponse,
+    "application/vnd.msgpack": MsgPackResponse,
+    "application/x-msgpack": MsgPackResponse,
+    "application/bson": BSONResponse,
+}
+
+# ETag variant per format; JSON keeps the plain ETag
+ETAG_VARIANTS: Dict[Type[Response], str] = {MsgPackResponse: "msgpack", BSONResponse: "bson"}
+
+def negotiate(accept: Optional[str]) -> Type[Response]:
+    """Pick the response class for an `Accept` header.
+
+    The highest q-value wins, earlier entries break ties, and wildcards
+    mean JSON. Anything unsupported falls back to JSON rather than 406 so
+    existing clients keep working.
+    """
+    best: Type[Response] = ORJSONResponse
+    best_q = 0.0
+    for entry in (accept or "").split(","):
+        media_range, *params = [part.strip() for part in entry.split(";")]
+        q = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        media_range = media_range.lower()
+        if media_range in ("*/*", "application/*"):
+            media_range = "application/json"
+        response_class = RESPONSE_CLASSES.get(media_range)
+        if response_class is not None and q > best_q:
+            best, best_q = response_class, q
+    return best
+
+def negotiated_response(content: Any, accept: Optional[str], headers: Optional[Dict[str, str]] = None) -> Response:
+    response = negotiate(accept)(content, headers=headers)
+    response.headers["Vary"] = "Accept"
+    return response
+
+def negotiated_etag(etag: str, accept: Optional[str]) -> str:
+    """The ETag of the representation `accept` selects."""
+    return representation_etag(etag, ETAG_VARIANTS.get(negotiate(accept)))
+
+def not_modified(headers: Dict[str, str]) -> Response:
+    # Same Vary as the full response, so a shared cache keys it the same way
+    return Response(status_code=304, headers={**headers, "Vary": "Accept, Accept-Encoding"})
+
+class DuplexStreamingResponse(StreamingResponse):
+    """Streaming response whose body iterator is still reading the request body.
+
+    StreamingResponse listens on `receive` for a disconnect while it streams,
+    which would swallow request body chunks; here the iterator reading the
+    body sees the disconnect itself (as `ClientDisconnect`).
+    """
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
@@ -1,59 +1,304 @@
-from typing import Annotated, List
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from src.models.vehicle import Vehicle, VehicleCreate, VehicleUpdate
-from src.services.vehicle_service import VehicleService
+import asyncio
+from typing import Annotated, List, Literal, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, status, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from src.models.vehicle import (
+    Vehicle, VehicleCreate, VehicleUpdate, BulkCreateResult, FleetStats, VehicleFilters, VehicleStatus,
+    VehicleType, FuelType, BulkUpdateRequest, BulkUpdateResult,
+    VehicleSearchHit, TelemetryBatch, TelemetryAck
+)
+from src.db.pagination import SORT_PATTERN
+from src.services.vehicle_service import VehicleService, parse_fields
 from src.api.deps import get_service
+from src.api.responses import DuplexStreamingResponse, negotiated_response, negotiated_etag, not_modified
+from src.services.etag import vehicle_etag, list_etag, fields_etag, etag_matches
+from src.services.importer import detect_format, read_rows
+
+FIELDS_DESCRIPTION = "Comma-separated subset of fields to return; `id` and `version` are always included"
+# Alternative formats selected through `Accept`, listed for the OpenAPI schema
+BINARY_FORMATS = {200: {"content": {"application/msgpack": {}, "application/bson": {}}}}
 
 router = APIRouter()
 
 @router.post("/", response_model=Vehicle, status_code=status.HTTP_201_CREATED)
-def create_vehicle(
+async def create_vehicle(
     service: Annotated[VehicleService, Depends(get_service)],
     vehicle: VehicleCreate
 ):
     """
     Create a new vehicle.
     """
-    return service.create_vehicle(vehicle)
+    return await service.create_vehicle(vehicle)
 
-@router.get("/", response_model=List[Vehicle])
-def list_vehicles(
+@router.post("/bulk", response_model=BulkCreateResult)
+async def create_vehicles_bulk(
     service: Annotated[VehicleService, Depends(get_service)],
+    vehicles: List[VehicleCreate]
+):
+    """
+    Create many vehicles in one request, reporting the outcome of each item.
+    """
+    return await service.create_vehicles_bulk(vehicles)
+
+@router.patch("/bulk", response_model=BulkUpdateResult)
+async def update_vehicles_bulk(
+    service: Annotated[VehicleService, Depends(get_service)],
+    request: BulkUpdateRequest
+):
+    """
+    Update many vehicles in one request, e.g. status transitions.
+
+    Send `items` with an `id` and `update` each, or a `filter` with one `set`
+    applied to every matching vehicle. Reports the outcome of each vehicle.
+    """
+    return await service.update_vehicles_bulk(request)
+
+@router.post("/import", response_class=DuplexStreamingResponse)
+async def import_vehicles(
+    service: Annotated[VehicleService, Depends(get_service)],
+    request: Request,
+    format: Optional[Literal["csv", "ndjson"]] = Query(None, description="Defaults to the Content-Type"),
+    chunk_size: Optional[int] = Query(None, ge=1, le=10000)
+):
+    """
+    Import vehicles from a CSV (with a header row) or NDJSON request body.
+
+    The body is parsed as it arrives and rows are validated and inserted in
+    chunks; the response is NDJSON with one line per rejected row followed
+    by a summary line.
+    """
+    file_format = format or detect_format(request.headers.get("content-type"))
+    if file_format is None:
+        raise HTTPException(
+            status_code=415,
+            detail="Send text/csv or application/x-ndjson, or pass format=csv or format=ndjson"
+        )
+    return DuplexStreamingResponse(
+        service.import_vehicles(read_rows(request.stream(), file_format), chunk_size=chunk_size),
+        media_type="application/x-ndjson"
+    )
+
+@router.post("/telemetry", response_model=TelemetryAck, status_code=status.HTTP_202_ACCEPTED)
+async def ingest_telemetry(
+    service: Annotated[VehicleService, Depends(get_service)],
+    batch: TelemetryBatch
+):
+    """
+    Accept odometer, fuel efficiency and heartbeat readings from telematics units.
+
+    Readings are addressed by vehicle `id` or `gps_id`, merged per vehicle
+    in memory and written on the next periodic flush. A full buffer answers
+    503 with `Retry-After`.
+    """
+    return await service.ingest_telemetry(batch)
+
+def list_filters(
+    estado_vehiculo: Optional[VehicleStatus] = None,
+    tipo_vehiculo: Optional[VehicleType] = None,
+    base_operativa: Optional[str] = None,
+    marca: Optional[str] = None,
+    tipo_combustible: Optional[FuelType] = None,
+    anno_min: Optional[int] = Query(None, ge=1990),
+    anno_max: Optional[int] = Query(None, ge=1990)
+) -> VehicleFilters:
+    return VehicleFilters(
+        estado_vehiculo=estado_vehiculo,
+        tipo_vehiculo=tipo_vehiculo,
+        base_operativa=base_operativa,
+        marca=marca,
+        tipo_combustible=tipo_combustible,
+        anno_min=anno_min,
+        anno_max=anno_max,
+    )
+
+@router.get("/", response_model=List[Vehicle], responses=BINARY_FORMATS)
+async def list_vehicles(
+    service: Annotated[VehicleService, Depends(get_service)],
+    filters: Annotated[VehicleFilters, Depends(list_filters)],
+    if_none_match: Annotated[Optional[str], Header()] = None,
+    accept: Annotated[Optional[str], Header()] = None,
     skip: int = Query(0, ge=0),
-    limit: int = Query(100, ge=1, le=1000)
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from a previous X-Next-Cursor header"),
+    sort: Optional[str] = Query(None, pattern=SORT_PATTERN, description="Sort field, prefix with '-' for descending"),
+    order_by: Optional[Literal["_id", "fecha_alta"]] = Query(None, deprecated=True),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION)
 ):
     """
-    List vehicles with pagination.
+    List vehicles with filtering, sorting and pagination.
+
+    Pass the `X-Next-Cursor` header of a full page back as `cursor` to fetch
+    the next page without the cost of a deep `skip`. `X-Total-Count` carries
+    the number of vehicles matching the filters, from a cached count that may
+    lag writes made by other processes by up to its TTL.
+
+    Responds in MessagePack or BSON when `Accept` asks for
+    `application/msgpack` or `application/bson` (BSON wraps the list as
+    `{"items": [...]}`), JSON otherwise.
     """
-    return service.list_vehicles(skip=skip, limit=limit)
+    sort = sort or order_by or "_id"
+    if fields is not None:
+        requested = parse_fields(fields)
+        page, total = await asyncio.gather(
+            service.list_vehicle_fields(requested, skip=skip, limit=limit, cursor=cursor, sort=sort, filters=filters),
+            service.count_vehicles(filters),
+        )
+        headers = {"ETag": negotiated_etag(fields_etag(page.items, requested, page.next_cursor), accept)}
+    else:
+        page, total = await asyncio.gather(
+            service.list_vehicles(skip=skip, limit=limit, cursor=cursor, sort=sort, filters=filters),
+            service.count_vehicles(filters),
+        )
+        headers = {"ETag": negotiated_etag(list_etag(page.items, page.next_cursor), accept)}
+    headers["X-Total-Count"] = str(total)
+    if page.next_cursor:
+        headers["X-Next-Cursor"] = page.next_cursor
+    if etag_matches(if_none_match, headers["ETag"], weak=True):
+        return not_modified(headers)
+    # Items come from the trusted read path; returning the response directly
+    # skips a second validation pass through response_model.
+    return negotiated_response(page.items, accept, headers=headers)
 
-@router.get("/{vehicle_id}", response_model=Vehicle)
-def get_vehicle(
-    vehicle_id: str,
+@router.get("/export", response_class=StreamingResponse)
+async def export_vehicles(
+    service: Annotated[VehicleService, Depends(get_service)],
+    batch_size: int = Query(1000, ge=1, le=10000),
+    validate: bool = Query(True, description="Re-validate each stored document before emitting it")
+):
+    """
+    Stream every vehicle as newline-delimited JSON.
+    """
+    return StreamingResponse(
+        service.export_vehicles(batch_size=batch_size, validate=validate),
+        media_type="application/x-ndjson"
+    )
+
+@router.get("/due", response_class=StreamingResponse)
+async def due_vehicles(
+    service: Annotated[VehicleService, Depends(get_service)],
+    insurance_within_days: Optional[int] = Query(None, ge=0, le=3650),
+    inspection_older_than_days: Optional[int] = Query(None, ge=0, le=3650),
+    batch_size: int = Query(500, ge=1, le=10000)
+):
+    """
+    Stream vehicles whose insurance expires within N days and/or whose last
+    inspection is older than M days, as NDJSON in due-date order.
+    """
+    return StreamingResponse(
+        service.due_vehicles(
+            insurance_within_days=insurance_within_days,
+            inspection_older_than_days=inspection_older_than_days,
+            batch_size=batch_size,
+        ),
+        media_type="application/x-ndjson"
+    )
+
+@router.get("/search", response_model=List[VehicleSearchHit], responses=BINARY_FORMATS)
+async def search_vehicles(
+    service: Annotated[VehicleService, Depends(get_service)],
+    q: str = Query(..., min_length=1, max_length=50, description="Prefix of a plate, fleet number or VIN, or marca/modelo words"),
+    limit: int = Query(10, ge=1, le=50),
+    accept: Annotated[Optional[str], Header()] = None
+):
+    """
+    Autocomplete search over plate, fleet number and VIN prefixes, plus
+    free-text matches on marca and modelo, best matches first.
+    """
+    return negotiated_response(await service.search_vehicles(q, limit=limit), accept)
+
+@router.get("/events", response_class=StreamingResponse)
+async def vehicle_events(
+    service: Annotated[VehicleService, Depends(get_service)],
+    last_event_id: Annotated[Optional[str], Header()] = None,
+    since: Optional[str] = Query(None, description="Resume token, for clients that cannot set Last-Event-ID")
+):
+    """
+    Server-Sent Events feed of vehicle creates, updates and deletes. Bulk
+    imports send one `imported` event per chunk with the number of vehicles
+    created instead; clients should reload their state on it.
+
+    Reconnect with the last received event id (the `Last-Event-ID` header
+    browsers send automatically) to receive the events missed meanwhile; a
+    `reset` event means they are no longer available and state should be
+    reloaded.
+    """
+    return StreamingResponse(
+        service.stream_events(last_event_id or since),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/stats", response_model=FleetStats)
+async def get_fleet_stats(
     service: Annotated[VehicleService, Depends(get_service)]
+):
+    """
+    Fleet counts by status, type and base, plus load capacity per base.
+    """
+    return await service.get_stats()
+
+@router.post("/stats/rebuild", response_model=FleetStats)
+async def rebuild_fleet_stats(
+    service: Annotated[VehicleService, Depends(get_service)]
+):
+    """
+    Recompute the fleet counters from the vehicles collection.
+    """
+    return await service.rebuild_stats()
+
+@router.get("/{vehicle_id}", response_model=Vehicle, responses=BINARY_FORMATS)
+async def get_vehicle(
+    vehicle_id: str,
+    service: Annotated[VehicleService, Depends(get_service)],
+    if_none_match: Annotated[Optional[str], Header()] = None,
+    accept: Annotated[Optional[str], Header()] = None,
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION)
 ):
     """
     Get a specific vehicle by ID.
+
+    Answers 304 Not Modified when `If-None-Match` carries the current ETag.
+    The format follows `Accept` as for the list endpoint; each format has
+    its own ETag.
     """
-    return service.get_vehicle(vehicle_id)
+    if fields is not None:
+        requested = parse_fields(fields)
+        partial = await service.get_vehicle_fields(vehicle_id, requested)
+        etag = negotiated_etag(fields_etag([partial], requested), accept)
+        if etag_matches(if_none_match, etag, weak=True):
+            return not_modified({"ETag": etag})
+        return negotiated_response(partial, accept, headers={"ETag": etag})
+
+    vehicle = await service.get_vehicle(vehicle_id)
+    etag = negotiated_etag(vehicle_etag(vehicle), accept)
+    if etag_matches(if_none_match, etag, weak=True):
+        return not_modified({"ETag": etag})
+    return negotiated_response(vehicle, accept, headers={"ETag": etag})
 
 @router.put("/{vehicle_id}", response_model=Vehicle)
-def update_vehicle(
+async def update_vehicle(
     vehicle_id: str,
     vehicle_update: VehicleUpdate,
-    service: Annotated[VehicleService, Depends(get_service)]
+    response: Response,
+    service: Annotated[VehicleService, Depends(get_service)],
+    if_match: Annotated[Optional[str], Header()] = None
 ):
     """
     Update a vehicle's fields.
+
+    With `If-Match` the update only applies if the vehicle still has that
+    ETag; otherwise 412 Precondition Failed is returned.
     """
-    return service.update_vehicle(vehicle_id, vehicle_update)
+    vehicle = await service.update_vehicle(vehicle_id, vehicle_update, if_match=if_match)
+    response.headers["ETag"] = vehicle_etag(vehicle)
+    return vehicle
 
 @router.delete("/{vehicle_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_vehicle(
+async def delete_vehicle(
     vehicle_id: str,
     service: Annotated[VehicleService, Depends(get_service)]
 ):
     """
     Delete a vehicle.
     """
-    service.delete_vehicle(vehicle_id)
+    await service.delete_vehicle(vehicle_id)
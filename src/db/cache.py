@@ -0,0 +1,191 @@
+import os
+import time
+from collections import OrderedDict
+import json
+from typing import Callable, Dict, Iterable, Optional, Tuple
+from src.models.vehicle import Vehicle, VehicleFilters
+
+class VehicleCache:
+    """In-process LRU cache with per-entry TTL for single-vehicle lookups.
+
+    Entries are bounded by `max_size`; the least recently used one is evicted
+    first and anything older than `ttl_seconds` is treated as a miss.
+
+    `invalidate` bumps a per-vehicle generation. A loader reads `generation`
+    before querying and hands it to `put`, which drops the result if the
+    vehicle was written in between, so a read that raced a write cannot
+    cache the pre-write document.
+    """
+    max_size: int = int(os.getenv("VEHICLE_CACHE_MAX_SIZE", "1024"))
+    ttl_seconds: float = float(os.getenv("VEHICLE_CACHE_TTL_SECONDS", "30"))
+    enabled: bool = os.getenv("VEHICLE_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+
+    def __init__(
+        self,
+        max_size: Optional[int] = None,
+        ttl_seconds: Optional[float] = None,
+        enabled: Optional[bool] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if max_size is not None:
+            self.max_size = max_size
+        if ttl_seconds is not None:
+            self.ttl_seconds = ttl_seconds
+        if enabled is not None:
+            self.enabled = enabled
+        self._clock = clock
+        self._entries: "OrderedDict[str, Tuple[float, Vehicle]]" = OrderedDict()
+        # Last invalidation per vehicle, bounded like the entries; `_floor` is
+        # the newest generation forgotten, so a forgotten one still compares newer
+        self._generations: "OrderedDict[str, int]" = OrderedDict()
+        self._counter = 0
+        self._floor = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.stale_puts = 0
+
+    def get(self, vehicle_id: str) -> Optional[Vehicle]:
+        if not self.enabled:
+            return None
+        entry = self._entries.get(vehicle_id)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, vehicle = entry
+        if expires_at <= self._clock():
+            del self._entries[vehicle_id]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(vehicle_id)
+        self.hits += 1
+        return vehicle
+
+    def generation(self, vehicle_id: str) -> int:
+        return self._generations.get(vehicle_id, self._floor)
+
+    def put(self, vehicle_id: str, vehicle: Vehicle, generation: Optional[int] = None):
+        if not self.enabled or self.max_size <= 0:
+            return
+        if generation is not None and generation != self.generation(vehicle_id):
+            # Invalidated while it was being loaded
+            self.stale_puts += 1
+            return
+        self._entries[vehicle_id] = (self._clock() + self.ttl_seconds, vehicle)
+        self._entries.move_to_end(vehicle_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, vehicle_id: str):
+        self._entries.pop(vehicle_id, None)
+        self._counter += 1
+        self._generations[vehicle_id] = self._counter
+        self._generations.move_to_end(vehicle_id)
+        while len(self._generations) > max(self.max_size, 1):
+            _, forgotten = self._generations.popitem(last=False)
+            self._floor = max(self._floor, forgotten)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "enabled": self.enabled,
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "stale_puts": self.stale_puts,
+        }
+
+class CountCache:
+    """Cached vehicle counts per list filter.
+
+    Writes made through this process adjust every live entry the changed
+    vehicle falls in, so counts stay current between refreshes; `ttl_seconds`
+    bounds how long changes made elsewhere (other processes, direct
+    database writes) can go unnoticed.
+
+    Every applied change bumps `generation`. A count is only stored if no
+    change was applied while it ran: the query may or may not have seen
+    that write, so `apply` would count it twice or miss it.
+    """
+    max_size: int = int(os.getenv("VEHICLE_COUNT_CACHE_MAX_SIZE", "256"))
+    ttl_seconds: float = float(os.getenv("VEHICLE_COUNT_TTL_SECONDS", "60"))
+
+    def __init__(
+        self,
+        max_size: Optional[int] = None,
+        ttl_seconds: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if max_size is not None:
+            self.max_size = max_size
+        if ttl_seconds is not None:
+            self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._entries: "OrderedDict[str, Tuple[float, VehicleFilters, int]]" = OrderedDict()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.stale_puts = 0
+
+    @staticmethod
+    def key(filters: VehicleFilters) -> str:
+        return json.dumps(filters.to_query(), sort_keys=True)
+
+    def get(self, filters: VehicleFilters) -> Optional[int]:
+        key = self.key(filters)
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= self._clock():
+            self._entries.pop(key, None)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[2]
+
+    def generation(self) -> int:
+        return self._generation
+
+    def put(self, filters: VehicleFilters, count: int, generation: Optional[int] = None):
+        if self.max_size <= 0:
+            return
+        if generation is not None and generation != self._generation:
+            # A local write landed while the count was running
+            self.stale_puts += 1
+            return
+        key = self.key(filters)
+        self._entries[key] = (self._clock() + self.ttl_seconds, filters, count)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def apply(self, added: Iterable[Vehicle] = (), removed: Iterable[Vehicle] = ()):
+        """Adjust cached counts for vehicles entering and leaving the fleet."""
+        changes = [(vehicle, 1) for vehicle in added] + [(vehicle, -1) for vehicle in removed]
+        if not changes:
+            return
+        self._generation += 1
+        for key, (expires_at, filters, count) in list(self._entries.items()):
+            delta = sum(sign for vehicle, sign in changes if filters.matches(vehicle))
+            if delta:
+                self._entries[key] = (expires_at, filters, max(count + delta, 0))
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale_puts": self.stale_puts,
+        }
+
+# Shared by every request-scoped repository in this process
+vehicle_cache = VehicleCache()
+vehicle_count_cache = CountCache()
@@ -0,0 +1,16 @@
+from pymongo import monitoring
+from src.metrics import mongo_command_duration
+
+class CommandMonitor(monitoring.CommandListener):
+    """Feeds driver-reported MongoDB command durations into the metrics registry."""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        mongo_command_duration.observe((event.command_name, "success"), event.duration_micros / 1e6)
+
+    def failed(self, event):
+        mongo_command_duration.observe((event.command_name, "failure"), event.duration_micros / 1e6)
+
+command_monitor = CommandMonitor()
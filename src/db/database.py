@@ -1,15 +1,48 @@
 import os
-from pymongo import MongoClient
-from pymongo.database import Database
+from typing import Optional
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from src.db.pool_monitor import pool_monitor
+from src.db.command_monitor import command_monitor
+
+def _optional_int(name: str) -> Optional[int]:
+    value = os.getenv(name)
+    return int(value) if value else None
 
 class DatabaseManager:
-    client: MongoClient = None
+    client: AsyncIOMotorClient = None
     db_name: str = os.getenv("DATABASE_NAME", "vehicles_db")
 
+    # Connection pool and timeout settings. Unset values keep pymongo's defaults.
+    max_pool_size: int = int(os.getenv("MONGODB_MAX_POOL_SIZE", "100"))
+    min_pool_size: int = int(os.getenv("MONGODB_MIN_POOL_SIZE", "0"))
+    max_idle_time_ms: Optional[int] = _optional_int("MONGODB_MAX_IDLE_TIME_MS")
+    wait_queue_timeout_ms: Optional[int] = _optional_int("MONGODB_WAIT_QUEUE_TIMEOUT_MS")
+    server_selection_timeout_ms: int = int(os.getenv("MONGODB_SERVER_SELECTION_TIMEOUT_MS", "30000"))
+    connect_timeout_ms: int = int(os.getenv("MONGODB_CONNECT_TIMEOUT_MS", "20000"))
+    # Comma-separated, in order of preference, e.g. "zstd,snappy,zlib"
+    compressors: str = os.getenv("MONGODB_COMPRESSORS", "")
+
+    @classmethod
+    def client_options(cls) -> dict:
+        options = {
+            "maxPoolSize": cls.max_pool_size,
+            "minPoolSize": cls.min_pool_size,
+            "maxIdleTimeMS": cls.max_idle_time_ms,
+            "waitQueueTimeoutMS": cls.wait_queue_timeout_ms,
+            "serverSelectionTimeoutMS": cls.server_selection_timeout_ms,
+            "connectTimeoutMS": cls.connect_timeout_ms,
+            "compressors": cls.compressors or None,
+        }
+        return {key: value for key, value in options.items() if value is not None}
+
     @classmethod
     def connect(cls):
         mongo_url = os.getenv("MONGODB_URL", "mongodb://localhost:27017")
-        cls.client = MongoClient(mongo_url)
+        # Motor keeps the event loop free while Mongo works, so concurrency is
+        # bounded by the connection pool rather than Starlette's threadpool.
+        cls.client = AsyncIOMotorClient(
+            mongo_url, event_listeners=[pool_monitor, command_monitor], **cls.client_options()
+        )
         print(f"Connected to MongoDB at {mongo_url}")
 
     @classmethod
@@ -19,11 +52,11 @@ class DatabaseManager:
             print("Closed MongoDB connection")
 
     @classmethod
-    def get_db(cls) -> Database:
+    def get_db(cls) -> AsyncIOMotorDatabase:
         if cls.client is None:
             # Lazy connect or raise error. For simplicity, we assume connect called at startup.
             cls.connect()
         return cls.client[cls.db_name]
 
-def get_database() -> Database:
+def get_database() -> AsyncIOMotorDatabase:
     return DatabaseManager.get_db()
@@ -0,0 +1,121 @@
+import asyncio
+import os
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+from motor.motor_asyncio import AsyncIOMotorCollection
+
+Keys = Union[str, Sequence[Tuple[str, Any]]]
+# Key pattern and create_index options, e.g. ([("placa", 1)], {"unique": True})
+IndexSpec = Tuple[Keys, Dict[str, Any]]
+
+def _normalize(keys: Keys) -> List[Tuple[str, Any]]:
+    return [(keys, 1)] if isinstance(keys, str) else [tuple(pair) for pair in keys]
+
+def index_name(keys: Keys, options: Dict[str, Any]) -> str:
+    """The name MongoDB gives the index unless the spec sets one."""
+    return options.get("name") or "_".join(f"{field}_{direction}" for field, direction in _normalize(keys))
+
+class IndexReconciler:
+    """Create the indexes a collection is missing from a declared spec.
+
+    One `index_information()` call finds what exists, matching by name and
+    then by key pattern, and only the missing indexes are built, concurrently;
+    with nothing missing a restart costs one round trip.
+    An existing index that has the declared keys but different options
+    (e.g. not unique) is reported as a conflict and left for an operator,
+    never dropped. A declared unique index that exists without the
+    constraint leaves the state "failed": duplicates could be written, so
+    the readiness probe must not pass.
+
+    `mode` "background" lets the app serve while indexes build; `state`
+    stays "building" until they are in place, for the readiness probe.
+    """
+    mode: str = os.getenv("INDEX_BUILD_MODE", "foreground")
+
+    def __init__(self, collection: AsyncIOMotorCollection, spec: Sequence[IndexSpec], mode: Optional[str] = None):
+        self.collection = collection
+        self.spec = list(spec)
+        if mode is not None:
+            self.mode = mode
+        self.state = "pending"
+        self.created: List[str] = []
+        self.conflicts: List[str] = []
+        self.error: Optional[str] = None
+        self.duration_ms: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def plan(self) -> Tuple[List[IndexSpec], List[str], List[str]]:
+        """The indexes to create, the names of conflicting existing ones, and
+        those among them that lack a declared unique constraint."""
+        existing = await self.collection.index_information()
+        by_keys = {tuple(_normalize(list(info["key"]))): name for name, info in existing.items()}
+        missing, conflicts, unenforced = [], [], []
+        for keys, options in self.spec:
+            name = index_name(keys, options)
+            found = name if name in existing else by_keys.get(tuple(_normalize(keys)))
+            if found is None:
+                missing.append((_normalize(keys), options))
+            elif bool(existing[found].get("unique")) != bool(options.get("unique")):
+                conflicts.append(found)
+                if options.get("unique"):
+                    unenforced.append(found)
+        return missing, conflicts, unenforced
+
+    async def reconcile(self) -> List[str]:
+        """Create what is missing; returns the names of the indexes created."""
+        started = time.perf_counter()
+        self.state = "building"
+        try:
+            missing, self.conflicts, unenforced = await self.plan()
+            self.created = list(await asyncio.gather(
+                *(self.collection.create_index(keys, **options) for keys, options in missing)
+            ))
+        except Exception as exc:
+            self.state = "failed"
+            self.error = str(exc)
+            raise
+        finally:
+            self.duration_ms = (time.perf_counter() - started) * 1000
+        if self.conflicts:
+            print(f"Indexes with conflicting options on {self.collection.name}: {', '.join(self.conflicts)}")
+        if unenforced:
+            self.state = "failed"
+            self.error = f"Indexes not unique as declared, duplicates are not rejected: {', '.join(unenforced)}"
+            return self.created
+        self.state = "ready"
+        return self.created
+
+    async def start(self):
+        if self.mode != "background":
+            await self.reconcile()
+            return
+        self._task = asyncio.create_task(self._reconcile_in_background())
+
+    async def _reconcile_in_background(self):
+        try:
+            await self.reconcile()
+        except Exception as exc:
+            # Recorded in `state`/`error`; the readiness probe reports it
+            print(f"Index build on {self.collection.name} failed: {exc}")
+
+    async def stop(self):
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    @property
+    def ready(self) -> bool:
+        return self.state == "ready"
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "mode": self.mode,
+            "created": self.created,
+            "conflicts": self.conflicts,
+            "duration_ms": round(self.duration_ms, 2) if self.duration_ms is not None else None,
+            "error": self.error,
+        }
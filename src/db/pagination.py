@@ -0,0 +1,79 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, Optional, Tuple
+from bson import ObjectId
+from bson.errors import InvalidId
+
+# Sort keys that can drive keyset pagination, optionally prefixed with "-" for
+# descending order. Each one is paired with `_id` as a tie-breaker so the
+# ordering is total; all of them are required fields, so no document has a
+# null sort value. Every one needs a `(field, _id)` index (see
+# repository.VEHICLE_INDEXES) or the sort runs in memory over the fleet.
+KEYSET_SORT_FIELDS = ("_id", "fecha_alta", "anno", "placa", "numero_economico", "capacidad_carga_kg")
+# Unique keys already order totally, so they sort on their own and their
+# unique index serves the sort without a tie-breaker
+UNIQUE_SORT_FIELDS = ("placa", "numero_economico")
+SORT_PATTERN = r"^-?(" + "|".join(KEYSET_SORT_FIELDS) + r")$"
+
+
+class InvalidCursorError(ValueError):
+    pass
+
+
+def parse_sort(sort: str) -> Tuple[str, int]:
+    if sort.startswith("-"):
+        return sort[1:], -1
+    return sort, 1
+
+
+def encode_cursor(sort: str, doc: dict) -> str:
+    sort_field, _ = parse_sort(sort)
+    value = doc.get(sort_field) if sort_field != "_id" else None
+    if isinstance(value, datetime):
+        value = {"$date": value.isoformat()}
+    payload = {"s": sort, "v": value, "id": str(doc["_id"])}
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str) -> Tuple[Any, ObjectId]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        last_id = ObjectId(payload["id"])
+        value = payload.get("v")
+        if isinstance(value, dict) and "$date" in value:
+            value = datetime.fromisoformat(value["$date"])
+        cursor_sort = payload["s"]
+    except (ValueError, KeyError, TypeError, InvalidId) as exc:
+        raise InvalidCursorError("Malformed pagination cursor") from exc
+
+    if cursor_sort != sort:
+        raise InvalidCursorError("Cursor was issued for a different sort order")
+    return value, last_id
+
+
+def keyset_query(sort: str, cursor: Optional[str]) -> dict:
+    if cursor is None:
+        return {}
+    value, last_id = decode_cursor(cursor, sort)
+    sort_field, direction = parse_sort(sort)
+    after = "$gt" if direction == 1 else "$lt"
+    if sort_field == "_id":
+        return {"_id": {after: last_id}}
+    if sort_field in UNIQUE_SORT_FIELDS:
+        return {sort_field: {after: value}}
+    return {
+        "$or": [
+            {sort_field: {after: value}},
+            {sort_field: value, "_id": {after: last_id}},
+        ]
+    }
+
+
+def keyset_sort(sort: str) -> list:
+    sort_field, direction = parse_sort(sort)
+    if sort_field == "_id" or sort_field in UNIQUE_SORT_FIELDS:
+        return [(sort_field, direction)]
+    return [(sort_field, direction), ("_id", direction)]
@@ -0,0 +1,99 @@
+import threading
+import time
+from typing import Dict
+from pymongo import monitoring
+
+class PoolMonitor(monitoring.ConnectionPoolListener):
+    """Connection pool telemetry fed by pymongo pool events.
+
+    Motor runs pymongo operations on worker threads and a checkout's start
+    and end events fire on the same thread, so the wait time is measured
+    with a thread-local start timestamp. Counters are shared between those
+    threads and guarded by a lock.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.connections = 0
+            self.in_use = 0
+            self.waiting = 0
+            self.checkouts = 0
+            self.checkout_failures = 0
+            self.wait_time_total_ms = 0.0
+            self.wait_time_max_ms = 0.0
+            self.pool_clears = 0
+
+    def _finish_wait(self) -> float:
+        started = getattr(self._local, "checkout_started", None)
+        self._local.checkout_started = None
+        if started is None:
+            return 0.0
+        return (time.perf_counter() - started) * 1000
+
+    def connection_check_out_started(self, event):
+        self._local.checkout_started = time.perf_counter()
+        with self._lock:
+            self.waiting += 1
+
+    def connection_checked_out(self, event):
+        waited_ms = self._finish_wait()
+        with self._lock:
+            self.waiting -= 1
+            self.in_use += 1
+            self.checkouts += 1
+            self.wait_time_total_ms += waited_ms
+            self.wait_time_max_ms = max(self.wait_time_max_ms, waited_ms)
+
+    def connection_check_out_failed(self, event):
+        self._finish_wait()
+        with self._lock:
+            self.waiting -= 1
+            self.checkout_failures += 1
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.in_use -= 1
+
+    def connection_created(self, event):
+        with self._lock:
+            self.connections += 1
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.connections -= 1
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self.pool_clears += 1
+
+    def pool_created(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "connections": self.connections,
+                "in_use": self.in_use,
+                "waiting": self.waiting,
+                "checkouts": self.checkouts,
+                "checkout_failures": self.checkout_failures,
+                "wait_time_avg_ms": self.wait_time_total_ms / self.checkouts if self.checkouts else 0.0,
+                "wait_time_max_ms": self.wait_time_max_ms,
+                "pool_clears": self.pool_clears,
+            }
+
+pool_monitor = PoolMonitor()
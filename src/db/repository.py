@@ -1,31 +1,156 @@
-from typing import List, Optional
+import re
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple, TypeVar
 from datetime import date, datetime
-from pymongo.database import Database
-from pymongo.results import InsertOneResult, UpdateResult, DeleteResult
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError
+from pymongo.results import InsertOneResult, DeleteResult
 from bson import ObjectId
-from src.models.vehicle import Vehicle, VehicleCreate, VehicleUpdate
+from src.models.vehicle import (
+    Vehicle, VehicleCreate, VehicleUpdate, VehiclePage, VehicleFieldsPage, VehicleFilters,
+    vehicle_document_to_dict, vehicle_from_document
+)
+from src.db.pagination import encode_cursor, keyset_query, keyset_sort, parse_sort
+from src.db.cache import VehicleCache
+from src.db.indexes import IndexReconciler, IndexSpec
+from src.db.single_flight import SingleFlight
+
+T = TypeVar("T")
+
+UNIQUE_FIELDS = ("placa", "numero_economico", "numero_serie")
+
+# Compound indexes for the list filters, laid out Equality -> Sort -> Range so
+# the default `_id` ordering is served from the index and `anno` ranges are
+# bounded inside it instead of forcing an in-memory sort.
+LIST_INDEXES = [
+    # Status alone is the most common filter; the wider index below cannot
+    # serve its `_id` order because `tipo_vehiculo` is not bound
+    [("estado_vehiculo", 1), ("_id", 1)],
+    [("estado_vehiculo", 1), ("tipo_vehiculo", 1), ("_id", 1), ("anno", 1)],
+    [("tipo_vehiculo", 1), ("_id", 1), ("anno", 1)],
+    [("base_operativa", 1), ("estado_vehiculo", 1), ("_id", 1)],
+    [("marca", 1), ("_id", 1), ("anno", 1)],
+    [("tipo_combustible", 1), ("_id", 1)],
+    [("anno", 1), ("_id", 1)],
+]
+
+# One `(field, _id)` index per keyset sort field that is not unique (`anno`'s
+# is in LIST_INDEXES); the unique indexes serve `placa` and `numero_economico`
+SORT_INDEXES = [
+    [("fecha_alta", 1), ("_id", 1)],
+    [("capacidad_carga_kg", 1), ("_id", 1)],
+]
+
+# Compliance scans walk these in date order, so the sort comes straight off
+# the index and the date bound limits how much of it is read.
+DUE_DATE_INDEXES = [
+    [("vigencia_seguro", 1), ("_id", 1)],
+    [("ultima_verificacion", 1), ("_id", 1)],
+]
+
+# Autocomplete matches anchored prefixes of the unique keys, so each lookup is
+# a range scan on that key's index; free text goes through the text index.
+SEARCH_FIELDS = UNIQUE_FIELDS
+TEXT_INDEX = [("marca", "text"), ("modelo", "text")]
+
+# Every index the vehicles collection should have; see IndexReconciler
+VEHICLE_INDEXES: List[IndexSpec] = [
+    *[([(field, 1)], {"unique": True}) for field in UNIQUE_FIELDS],
+    *[(keys, {}) for keys in LIST_INDEXES + SORT_INDEXES + DUE_DATE_INDEXES],
+    (TEXT_INDEX, {"name": "marca_modelo_text"}),
+    # Telemetry addressed by GPS unit is resolved through this on every flush
+    ([("gps_id", 1)], {"sparse": True}),
+]
+
+def duplicate_key_field(error: dict) -> Optional[str]:
+    """Name the unique field behind an E11000 write error, if it can be told."""
+    key_pattern = error.get("keyPattern") or {}
+    for field in UNIQUE_FIELDS:
+        if field in key_pattern:
+            return field
+    # Older servers (and mongomock) only report the index in the message
+    message = error.get("errmsg", "")
+    for field in UNIQUE_FIELDS:
+        if field in message:
+            return field
+    return None
+
+def build_list_query(filters: Optional[VehicleFilters], sort: str, cursor: Optional[str]) -> dict:
+    filter_query = filters.to_query() if filters else {}
+    clauses = [clause for clause in (filter_query, keyset_query(sort, cursor)) if clause]
+    if len(clauses) > 1:
+        return {"$and": clauses}
+    return clauses[0] if clauses else {}
 
 class VehicleRepository:
-    def __init__(self, db: Database):
+    def __init__(
+        self,
+        db: AsyncIOMotorDatabase,
+        cache: Optional[VehicleCache] = None,
+        flights: Optional[SingleFlight] = None,
+    ):
         self.collection = db.get_collection("vehicles")
+        self.cache = cache
+        self.flights = flights
 
-    def create_indexes(self):
-        self.collection.create_index("placa", unique=True)
-        self.collection.create_index("numero_economico", unique=True)
-        self.collection.create_index("numero_serie", unique=True)
+    def index_reconciler(self, mode: Optional[str] = None) -> IndexReconciler:
+        return IndexReconciler(self.collection, VEHICLE_INDEXES, mode=mode)
 
-    def create(self, vehicle: VehicleCreate) -> Vehicle:
+    async def create_indexes(self) -> List[str]:
+        """Create whichever declared indexes are missing; returns their names."""
+        return await self.index_reconciler(mode="foreground").reconcile()
+
+    async def create(self, vehicle: VehicleCreate) -> Vehicle:
         vehicle_dict = vehicle.model_dump(by_alias=True, exclude=["id"])
         self._convert_dates(vehicle_dict)
-        result: InsertOneResult = self.collection.insert_one(vehicle_dict)
-        return Vehicle(id=str(result.inserted_id), **vehicle.model_dump())
+        vehicle_dict["version"] = 1
+        result: InsertOneResult = await self.collection.insert_one(vehicle_dict)
+        self._invalidate()
+        return Vehicle(id=str(result.inserted_id), version=1, **vehicle.model_dump())
     
+    async def create_many(self, vehicles: List[VehicleCreate]) -> Tuple[List[Optional[Vehicle]], Dict[int, dict]]:
+        """Insert all vehicles in one unordered round trip.
+
+        Returns the created vehicles by position (None where the insert failed)
+        and the raw write errors keyed by the same position.
+        """
+        if not vehicles:
+            return [], {}
+        docs = [vehicle.model_dump(by_alias=True, exclude=["id"]) for vehicle in vehicles]
+        errors = await self.insert_documents(docs)
+
+        # insert_many assigns `_id` to every document before sending the batch
+        created = [
+            None if i in errors else Vehicle(id=str(doc["_id"]), version=1, **vehicle.model_dump())
+            for i, (doc, vehicle) in enumerate(zip(docs, vehicles))
+        ]
+        return created, errors
+
+    async def insert_documents(self, docs: List[dict]) -> Dict[int, dict]:
+        """Insert already validated vehicle documents in one unordered round trip.
+
+        Sets `version` and `_id` on each document in place and returns the raw
+        write errors keyed by position.
+        """
+        if not docs:
+            return {}
+        for doc in docs:
+            self._convert_dates(doc)
+            doc["version"] = 1
+        try:
+            await self.collection.insert_many(docs, ordered=False)
+        except BulkWriteError as exc:
+            return {error["index"]: error for error in exc.details.get("writeErrors", [])}
+        finally:
+            self._invalidate()
+        return {}
+
     def _convert_dates(self, data: dict):
         for key, value in data.items():
             if isinstance(value, date) and not isinstance(value, datetime):
                 data[key] = datetime.combine(value, datetime.min.time())
 
-    def check_uniqueness(self, placa: str, numero_economico: str, numero_serie: str) -> List[Vehicle]:
+    async def check_uniqueness(self, placa: str, numero_economico: str, numero_serie: str) -> List[Vehicle]:
         query = {
             "$or": [
                 {"placa": placa},
@@ -34,29 +159,190 @@ class VehicleRepository:
             ]
         }
         cursor = self.collection.find(query)
-        return [Vehicle(**doc) for doc in cursor]
+        return [vehicle_from_document(doc) async for doc in cursor]
+
+    async def find_conflicts(self, vehicles: List[VehicleCreate]) -> List[dict]:
+        """Fetch the unique keys of stored vehicles clashing with any of the given ones."""
+        query = {
+            "$or": [
+                {field: {"$in": list({getattr(v, field) for v in vehicles})}}
+                for field in UNIQUE_FIELDS
+            ]
+        }
+        projection = {field: 1 for field in UNIQUE_FIELDS}
+        return await self.collection.find(query, projection).to_list(length=None)
 
-    def get_by_id(self, vehicle_id: str) -> Optional[Vehicle]:
+    async def get_by_id(self, vehicle_id: str) -> Optional[Vehicle]:
         if not ObjectId.is_valid(vehicle_id):
             return None
         
-        doc = self.collection.find_one({"_id": ObjectId(vehicle_id)})
+        object_id = ObjectId(vehicle_id)
+        if self.cache is not None:
+            cached = self.cache.get(str(object_id))
+            if cached is not None:
+                return cached
+
+        # A burst of reads for one vehicle after a cache miss shares one find_one
+        return await self._coalesce(("get", str(object_id)), lambda: self._load(object_id))
+
+    async def _load(self, object_id: ObjectId) -> Optional[Vehicle]:
+        # Taken before the query: a write landing meanwhile makes the put a no-op
+        generation = self.cache.generation(str(object_id)) if self.cache is not None else None
+        doc = await self.collection.find_one({"_id": object_id})
         if doc:
-            return Vehicle(**doc)
+            vehicle = vehicle_from_document(doc)
+            if self.cache is not None:
+                self.cache.put(str(object_id), vehicle, generation)
+            return vehicle
         return None
 
-    def get_by_field(self, field: str, value: str) -> Optional[Vehicle]:
-        doc = self.collection.find_one({field: value})
+    async def get_fields_by_id(self, vehicle_id: str, fields: List[str]) -> Optional[dict]:
+        if not ObjectId.is_valid(vehicle_id):
+            return None
+
+        doc = await self.collection.find_one({"_id": ObjectId(vehicle_id)}, self._projection(fields))
         if doc:
-            return Vehicle(**doc)
+            return vehicle_document_to_dict(doc)
         return None
 
+    async def get_by_field(self, field: str, value: str) -> Optional[Vehicle]:
+        doc = await self.collection.find_one({field: value})
+        if doc:
+            return vehicle_from_document(doc)
+        return None
+
+
+    async def list(
+        self,
+        skip: int = 0,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        sort: str = "_id",
+        filters: Optional[VehicleFilters] = None,
+    ) -> VehiclePage:
+        # Keyset pagination: the cursor becomes a range predicate on the sort
+        # index, so deep pages cost the same as the first one. `skip` is kept
+        # for backward compatibility and can be combined with a cursor.
+        async def query() -> VehiclePage:
+            docs, next_cursor = await self._find_page(skip, limit, cursor, sort, filters)
+            return VehiclePage(items=[vehicle_from_document(doc) for doc in docs], next_cursor=next_cursor)
+
+        key = ("list", skip, limit, cursor, sort, self._filters_key(filters))
+        return await self._coalesce(key, query)
+
+    async def list_fields(
+        self,
+        fields: List[str],
+        skip: int = 0,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        sort: str = "_id",
+        filters: Optional[VehicleFilters] = None,
+    ) -> VehicleFieldsPage:
+        # Projection keeps unrequested fields off the wire and out of Pydantic
+        sort_field, _ = parse_sort(sort)
+        projection = self._projection(fields + [sort_field])
+
+        async def query() -> VehicleFieldsPage:
+            docs, next_cursor = await self._find_page(skip, limit, cursor, sort, filters, projection)
+            if sort_field not in fields and sort_field != "_id":
+                for doc in docs:
+                    doc.pop(sort_field, None)
+            return VehicleFieldsPage(
+                items=[vehicle_document_to_dict(doc) for doc in docs], next_cursor=next_cursor
+            )
+
+        key = ("list", tuple(fields), skip, limit, cursor, sort, self._filters_key(filters))
+        return await self._coalesce(key, query)
+
+    async def _find_page(
+        self,
+        skip: int,
+        limit: int,
+        cursor: Optional[str],
+        sort: str,
+        filters: Optional[VehicleFilters] = None,
+        projection: Optional[dict] = None,
+    ) -> Tuple[List[dict], Optional[str]]:
+        query = build_list_query(filters, sort, cursor)
+        docs = await (
+            self.collection.find(query, projection).sort(keyset_sort(sort)).skip(skip).limit(limit)
+        ).to_list(length=limit)
+        next_cursor = encode_cursor(sort, docs[-1]) if len(docs) == limit else None
+        return docs, next_cursor
 
-    def list(self, skip: int = 0, limit: int = 100) -> List[Vehicle]:
-        cursor = self.collection.find().skip(skip).limit(limit)
-        return [Vehicle(**doc) for doc in cursor]
+    def _projection(self, fields: List[str]) -> dict:
+        projection = {field: 1 for field in fields if field != "_id"}
+        projection["version"] = 1
+        return projection
 
-    def update(self, vehicle_id: str, vehicle_update: VehicleUpdate) -> Optional[Vehicle]:
+    async def prefix_search(self, field: str, prefix: str, limit: int = 10) -> List[Vehicle]:
+        """Vehicles whose `field` starts with `prefix`, ignoring case.
+
+        The unique keys are stored uppercased, so the uppercased prefix is one
+        anchored, case-sensitive pattern and turns into index bounds; a
+        case-insensitive regex would scan every key instead.
+        """
+        pattern = re.compile("^" + re.escape(prefix.upper()))
+        cursor = self.collection.find({field: pattern}).sort(field, 1).limit(limit)
+        return [vehicle_from_document(doc) async for doc in cursor]
+
+    async def text_search(self, text: str, limit: int = 10) -> List[Tuple[Vehicle, float]]:
+        """Vehicles matching `text` on marca/modelo, best text score first."""
+        score = {"score": {"$meta": "textScore"}}
+        cursor = self.collection.find({"$text": {"$search": text}}, score).sort([("score", score["score"])]).limit(limit)
+        results = []
+        async for doc in cursor:
+            text_score = doc.pop("score")
+            results.append((vehicle_from_document(doc), text_score))
+        return results
+
+    async def stream(
+        self,
+        batch_size: int = 1000,
+        query: Optional[dict] = None,
+        sort: Optional[list] = None,
+    ) -> AsyncIterator[dict]:
+        """Yield raw documents (in `_id` order by default), `batch_size` per round trip."""
+        cursor = self.collection.find(query or {}).sort(sort or [("_id", 1)]).batch_size(batch_size)
+        async for doc in cursor:
+            yield doc
+
+    def stream_insurance_due(self, cutoff: datetime, batch_size: int = 1000) -> AsyncIterator[dict]:
+        """Vehicles whose insurance expires on or before `cutoff`, soonest first."""
+        return self.stream(
+            batch_size,
+            {"vigencia_seguro": {"$lte": cutoff}},
+            [("vigencia_seguro", 1), ("_id", 1)],
+        )
+
+    def stream_inspection_due(self, cutoff: datetime, batch_size: int = 1000) -> AsyncIterator[dict]:
+        """Vehicles never inspected or last inspected before `cutoff`, oldest first."""
+        return self.stream(
+            batch_size,
+            {"$or": [{"ultima_verificacion": {"$lt": cutoff}}, {"ultima_verificacion": None}]},
+            [("ultima_verificacion", 1), ("_id", 1)],
+        )
+
+    async def update(
+        self,
+        vehicle_id: str,
+        vehicle_update: VehicleUpdate,
+        expected_version: Optional[int] = None,
+    ) -> Optional[Vehicle]:
+        result = await self.update_with_previous(vehicle_id, vehicle_update, expected_version)
+        return result[1] if result else None
+
+    async def update_with_previous(
+        self,
+        vehicle_id: str,
+        vehicle_update: VehicleUpdate,
+        expected_version: Optional[int] = None,
+    ) -> Optional[Tuple[Vehicle, Vehicle]]:
+        """Apply an update in one round trip, returning the vehicle before and after it.
+
+        Unique key clashes surface as DuplicateKeyError from the indexes.
+        """
         if not ObjectId.is_valid(vehicle_id):
             return None
         
@@ -64,22 +350,183 @@ class VehicleRepository:
         update_data = vehicle_update.model_dump(by_alias=True, exclude_unset=True)
         self._convert_dates(update_data)
         
+        query = {"_id": ObjectId(vehicle_id)}
+        if expected_version is not None:
+            # Optimistic concurrency: only apply if nobody wrote in between
+            query["version"] = expected_version
+
         if not update_data:
-            return self.get_by_id(vehicle_id)
+            if expected_version is None:
+                current = await self.get_by_id(vehicle_id)
+            else:
+                # Nothing to write, but a stale version must still fail
+                doc = await self.collection.find_one(query)
+                current = vehicle_from_document(doc) if doc else None
+            return (current, current) if current else None
 
-        result: UpdateResult = self.collection.find_one_and_update(
-            {"_id": ObjectId(vehicle_id)},
-            {"$set": update_data},
-            return_document=True
+        # Ask for the previous document and replay the $set locally: the
+        # caller gets both sides of the change without a second read.
+        before = await self.collection.find_one_and_update(
+            query,
+            {"$set": update_data, "$inc": {"version": 1}},
+            return_document=ReturnDocument.BEFORE
         )
+        self._invalidate(vehicle_id)
         
-        if result:
-            return Vehicle(**result)
-        return None
+        if not before:
+            return None
+        after = {**before, **update_data, "version": (before.get("version") or 0) + 1}
+        return vehicle_from_document(before), vehicle_from_document(after)
+
+    async def bulk_update(
+        self, changes: List[Tuple[str, VehicleUpdate]]
+    ) -> Tuple[List[Optional[Tuple[Vehicle, Vehicle]]], Dict[int, dict]]:
+        """Apply many updates with one read and one unordered bulk_write.
+
+        Returns the (previous, updated) vehicles by position, None where the
+        vehicle was missing, changed concurrently or the write failed, and
+        the raw write errors keyed by the same position. Each write is
+        guarded by the version that was read, so the returned pairs are
+        exactly what changed.
+        """
+        results: List[Optional[Tuple[Vehicle, Vehicle]]] = [None] * len(changes)
+        object_ids = {ObjectId(vehicle_id) for vehicle_id, _ in changes if ObjectId.is_valid(vehicle_id)}
+        if not object_ids:
+            return results, {}
+        stored = {
+            str(doc["_id"]): doc
+            async for doc in self.collection.find({"_id": {"$in": list(object_ids)}})
+        }
+
+        operations, pending = [], []
+        for position, (vehicle_id, vehicle_update) in enumerate(changes):
+            before = stored.get(vehicle_id)
+            if before is None:
+                continue
+            update_data = vehicle_update.model_dump(by_alias=True, exclude_unset=True)
+            self._convert_dates(update_data)
+            if not update_data:
+                vehicle = vehicle_from_document(dict(before))
+                results[position] = (vehicle, vehicle)
+                continue
+            version = before.get("version")
+            operations.append(UpdateOne(
+                {"_id": before["_id"], "version": version},
+                {"$set": update_data, "$inc": {"version": 1}},
+            ))
+            after = {**before, **update_data, "version": (version or 0) + 1}
+            pending.append((position, before, after))
 
-    def delete(self, vehicle_id: str) -> bool:
+        errors: Dict[int, dict] = {}
+        matched = len(operations)
+        if operations:
+            try:
+                result = await self.collection.bulk_write(operations, ordered=False)
+                matched = result.matched_count
+            except BulkWriteError as exc:
+                errors = {
+                    pending[error["index"]][0]: error for error in exc.details.get("writeErrors", [])
+                }
+                matched = exc.details.get("nMatched", 0)
+            for _, before, _ in pending:
+                self._invalidate(str(before["_id"]))
+
+        applied = None
+        if matched < len(pending) - len(errors):
+            # Some version guards missed; find out which writes went through
+            ids = [before["_id"] for _, before, _ in pending]
+            applied = {
+                doc["_id"]: doc.get("version")
+                async for doc in self.collection.find({"_id": {"$in": ids}}, {"version": 1})
+            }
+        for position, before, after in pending:
+            if position in errors:
+                continue
+            if applied is not None and applied.get(before["_id"]) != after["version"]:
+                continue
+            results[position] = (vehicle_from_document(dict(before)), vehicle_from_document(after))
+        return results, errors
+
+    async def ids_for_gps(self, gps_ids: List[str]) -> Dict[str, str]:
+        """Map GPS unit ids to vehicle ids in one query; unknown units are left out."""
+        cursor = self.collection.find({"gps_id": {"$in": list(gps_ids)}}, {"gps_id": 1})
+        return {doc["gps_id"]: str(doc["_id"]) async for doc in cursor}
+
+    async def apply_telemetry(
+        self, updates: List[Tuple[str, dict]], guarded: Sequence[Tuple[str, dict, dict]] = ()
+    ) -> int:
+        """Apply raw per-vehicle update documents with one unordered
+        bulk_write; returns how many vehicles matched.
+
+        `guarded` holds (vehicle id, condition, update) writes that only
+        apply where the stored document also matches the condition; they go
+        in a second bulk_write so the count above stays per vehicle.
+        """
+        if not updates and not guarded:
+            return 0
+        matched = await self._bulk_write_matched(
+            [UpdateOne({"_id": ObjectId(vehicle_id)}, update) for vehicle_id, update in updates]
+        )
+        await self._bulk_write_matched([
+            UpdateOne({"_id": ObjectId(vehicle_id), **condition}, update)
+            for vehicle_id, condition, update in guarded
+        ])
+        for vehicle_id in {vehicle_id for vehicle_id, *_ in (*updates, *guarded)}:
+            self._invalidate(vehicle_id)
+        return matched
+
+    async def _bulk_write_matched(self, operations: List[UpdateOne]) -> int:
+        if not operations:
+            return 0
+        try:
+            result = await self.collection.bulk_write(operations, ordered=False)
+            return result.matched_count
+        except BulkWriteError as exc:
+            return exc.details.get("nMatched", 0)
+
+    async def count(self, filters: Optional[VehicleFilters] = None) -> int:
+        query = filters.to_query() if filters else {}
+        if not query:
+            # Read from collection metadata instead of scanning
+            return await self.collection.estimated_document_count()
+        return await self.collection.count_documents(query)
+
+    async def find_ids(self, query: dict, limit: int) -> List[str]:
+        cursor = self.collection.find(query, {"_id": 1}).sort("_id", 1).limit(limit)
+        return [str(doc["_id"]) async for doc in cursor]
+
+    async def delete(self, vehicle_id: str) -> bool:
         if not ObjectId.is_valid(vehicle_id):
             return False
         
-        result: DeleteResult = self.collection.delete_one({"_id": ObjectId(vehicle_id)})
+        result: DeleteResult = await self.collection.delete_one({"_id": ObjectId(vehicle_id)})
+        self._invalidate(vehicle_id)
         return result.deleted_count > 0
+
+    async def delete_returning(self, vehicle_id: str) -> Optional[Vehicle]:
+        """Delete in one round trip, returning the removed vehicle."""
+        if not ObjectId.is_valid(vehicle_id):
+            return None
+
+        doc = await self.collection.find_one_and_delete({"_id": ObjectId(vehicle_id)})
+        self._invalidate(vehicle_id)
+        return vehicle_from_document(doc) if doc else None
+
+    async def _coalesce(self, key: tuple, query: Callable[[], Awaitable[T]]) -> T:
+        if self.flights is None:
+            return await query()
+        return await self.flights.do(key, query)
+
+    @staticmethod
+    def _filters_key(filters: Optional[VehicleFilters]) -> Optional[str]:
+        return filters.model_dump_json(exclude_none=True) if filters else None
+
+    def _invalidate(self, vehicle_id: Optional[str] = None):
+        """Drop what a write made stale: the cached vehicle and any in-flight
+        read of it, and in-flight list queries (None: lists only, for inserts)."""
+        if vehicle_id is not None and self.cache is not None:
+            self.cache.invalidate(str(ObjectId(vehicle_id)))
+        if self.flights is not None:
+            if vehicle_id is not None:
+                self.flights.forget("get", ("get", str(ObjectId(vehicle_id))))
+            self.flights.forget("list")
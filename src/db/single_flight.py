@@ -0,0 +1,70 @@
+import asyncio
+import os
+from typing import Awaitable, Callable, Dict, Hashable, Optional, Tuple, TypeVar
+from src.metrics import reads_coalesced
+
+T = TypeVar("T")
+
+class SingleFlight:
+    """Coalesce concurrent identical reads into one in-flight query.
+
+    Keys are tuples whose first element names the operation ("get", "list",
+    ...). The first caller for a key runs the query in its own task; anyone
+    asking for the same key before it finishes awaits that task instead of
+    querying again, and everyone gets the same result or exception. A caller
+    that is cancelled (client gone) does not cancel the query for the rest.
+
+    Writes call `forget` so that callers arriving after a write never join a
+    query that started before it; the query still completes for those
+    already waiting on it. Keeping its result out of the vehicle cache is
+    the cache's job (see VehicleCache.generation).
+    """
+    enabled: bool = os.getenv("VEHICLE_SINGLE_FLIGHT_ENABLED", "true").lower() in ("1", "true", "yes")
+
+    def __init__(self, enabled: Optional[bool] = None):
+        if enabled is not None:
+            self.enabled = enabled
+        self._flights: Dict[Tuple[Hashable, ...], "asyncio.Task"] = {}
+        self.calls = 0
+        self.deduplicated = 0
+
+    async def do(self, key: Tuple[Hashable, ...], query: Callable[[], Awaitable[T]]) -> T:
+        if not self.enabled:
+            return await query()
+        self.calls += 1
+        task = self._flights.get(key)
+        if task is not None and not task.done():
+            self.deduplicated += 1
+            reads_coalesced.inc((str(key[0]),))
+        else:
+            task = asyncio.ensure_future(query())
+            self._flights[key] = task
+            task.add_done_callback(lambda done, key=key: self._finished(key, done))
+        return await asyncio.shield(task)
+
+    def _finished(self, key: Tuple[Hashable, ...], task: "asyncio.Task"):
+        if self._flights.get(key) is task:
+            del self._flights[key]
+        if not task.cancelled():
+            # Mark the exception retrieved even when every caller went away
+            task.exception()
+
+    def forget(self, operation: str, key: Optional[Tuple[Hashable, ...]] = None):
+        """Stop new callers joining in-flight queries for `key`, or for every
+        key of `operation` when no key is given."""
+        if key is not None:
+            self._flights.pop(key, None)
+            return
+        for stale in [k for k in self._flights if k[0] == operation]:
+            del self._flights[stale]
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "enabled": self.enabled,
+            "in_flight": len(self._flights),
+            "calls": self.calls,
+            "deduplicated": self.deduplicated,
+        }
+
+# Shared by every request-scoped repository in this process
+vehicle_reads = SingleFlight()
@@ -0,0 +1,137 @@
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+from src.models.vehicle import FleetStats, Vehicle
+
+# Dimensions the dashboard groups by. Each (dimension, value) pair is one
+# small counter document, so reading the summary costs the same no matter
+# how many vehicles there are.
+STAT_DIMENSIONS = ("estado_vehiculo", "tipo_vehiculo", "base_operativa")
+UNASSIGNED = "UNASSIGNED"
+# Marker document claimed by the one process that initialises the counters
+INITIALIZED_ID = "initialized"
+
+StatsDelta = Dict[Tuple[str, Optional[str]], List[float]]
+
+def _value(vehicle: Vehicle, dimension: str) -> Optional[str]:
+    value = getattr(vehicle, dimension)
+    return getattr(value, "value", value)
+
+def stats_delta(added: Iterable[Vehicle] = (), removed: Iterable[Vehicle] = ()) -> StatsDelta:
+    """Net counter changes for vehicles entering and leaving the fleet."""
+    delta: StatsDelta = defaultdict(lambda: [0, 0.0])
+    for sign, vehicles in ((1, added), (-1, removed)):
+        for vehicle in vehicles:
+            for dimension in STAT_DIMENSIONS:
+                entry = delta[(dimension, _value(vehicle, dimension))]
+                entry[0] += sign
+                entry[1] += sign * vehicle.capacidad_carga_kg
+    return {key: value for key, value in delta.items() if value[0] or value[1]}
+
+class FleetStatsRepository:
+    def __init__(self, db: AsyncIOMotorDatabase):
+        self.collection = db.get_collection("vehicle_stats")
+        self.vehicles = db.get_collection("vehicles")
+
+    async def apply(self, delta: StatsDelta):
+        if not delta:
+            return
+        operations = [
+            UpdateOne(
+                {"_id": {"dimension": dimension, "value": value}},
+                {"$inc": {"count": count, "capacidad_carga_kg": capacity}},
+                upsert=True,
+            )
+            for (dimension, value), (count, capacity) in delta.items()
+        ]
+        await self.collection.bulk_write(operations, ordered=False)
+
+    async def get(self) -> FleetStats:
+        stats = {dimension: {} for dimension in STAT_DIMENSIONS}
+        capacity_by_base = {}
+        async for doc in self.collection.find({"count": {"$gt": 0}}):
+            dimension, value = doc["_id"]["dimension"], doc["_id"]["value"]
+            if dimension not in stats:
+                continue
+            key = UNASSIGNED if value is None else value
+            stats[dimension][key] = doc["count"]
+            if dimension == "base_operativa":
+                capacity_by_base[key] = doc["capacidad_carga_kg"]
+        return FleetStats(
+            total=sum(stats["estado_vehiculo"].values()),
+            by_estado_vehiculo=stats["estado_vehiculo"],
+            by_tipo_vehiculo=stats["tipo_vehiculo"],
+            by_base_operativa=stats["base_operativa"],
+            capacidad_carga_kg_by_base=capacity_by_base,
+        )
+
+    async def rebuild(self) -> FleetStats:
+        """Recompute every counter from the vehicles collection.
+
+        Used to reconcile drift, e.g. after a crash between a vehicle write
+        and its counter update, or when counters were never initialised.
+        """
+        pipeline = [{
+            "$facet": {
+                dimension: [{
+                    "$group": {
+                        "_id": f"${dimension}",
+                        "count": {"$sum": 1},
+                        "capacidad_carga_kg": {"$sum": "$capacidad_carga_kg"},
+                    }
+                }]
+                for dimension in STAT_DIMENSIONS
+            }
+        }]
+        result = await self.vehicles.aggregate(pipeline).to_list(length=1)
+        groups = {
+            (dimension, group["_id"]): group
+            for dimension, dimension_groups in (result[0] if result else {}).items()
+            for group in dimension_groups
+        }
+        # Upserts instead of delete + insert: safe to run from several
+        # processes at once, and counters never disappear mid-rebuild
+        operations = [
+            UpdateOne(
+                {"_id": {"dimension": dimension, "value": value}},
+                {"$set": {"count": group["count"], "capacidad_carga_kg": group["capacidad_carga_kg"]}},
+                upsert=True,
+            )
+            for (dimension, value), group in groups.items()
+        ]
+        if operations:
+            await self.collection.bulk_write(operations, ordered=False)
+        # Groups no vehicle falls in any more
+        await self.collection.update_many(
+            {
+                "_id.dimension": {"$in": list(STAT_DIMENSIONS)},
+                "_id": {"$nin": [{"dimension": dimension, "value": value} for dimension, value in groups]},
+            },
+            {"$set": {"count": 0, "capacidad_carga_kg": 0}},
+        )
+        return await self.get()
+
+    async def ensure_initialized(self) -> bool:
+        """Rebuild the counters unless another process already has.
+
+        The first process to upsert the marker document rebuilds; workers
+        starting alongside it skip. Returns whether this call rebuilt.
+        """
+        try:
+            result = await self.collection.update_one(
+                {"_id": INITIALIZED_ID}, {"$setOnInsert": {"initialized_at": datetime.utcnow()}}, upsert=True
+            )
+        except DuplicateKeyError:
+            return False
+        if result.upserted_id is None:
+            return False
+        try:
+            await self.rebuild()
+        except Exception:
+            # Let the next start try again
+            await self.collection.delete_one({"_id": INITIALIZED_ID})
+            raise
+        return True
@@ -0,0 +1,65 @@
+import argparse
+import asyncio
+import os
+import sys
+from typing import AsyncIterator, BinaryIO
+import orjson
+from src.db.database import DatabaseManager
+from src.db.repository import VehicleRepository
+from src.db.stats_repository import FleetStatsRepository
+from src.services.importer import FORMAT_EXTENSIONS, IMPORT_FORMATS, read_rows, shutdown_executors
+from src.services.vehicle_service import VehicleService
+
+# Import a CSV or NDJSON file straight into MongoDB, bypassing the API:
+#
+#   python -m src.import_vehicles fleet.csv
+#   python -m src.import_vehicles - --format ndjson < fleet.ndjson
+#
+# The per-row error report and summary are written to stdout as NDJSON; the
+# exit status is 1 when any row was rejected.
+# MONGODB_URL, DATABASE_NAME, IMPORT_CHUNK_SIZE and IMPORT_WORKERS apply.
+
+READ_SIZE = 64 * 1024
+
+async def read_file(handle: BinaryIO) -> AsyncIterator[bytes]:
+    while True:
+        block = await asyncio.to_thread(handle.read, READ_SIZE)
+        if not block:
+            return
+        yield block
+
+async def run(handle: BinaryIO, file_format: str, chunk_size: int) -> int:
+    db = DatabaseManager.get_db()
+    repository = VehicleRepository(db)
+    await repository.create_indexes()
+    service = VehicleService(repository, FleetStatsRepository(db))
+    last = b""
+    async for chunk in service.import_vehicles(read_rows(read_file(handle), file_format), chunk_size):
+        sys.stdout.buffer.write(chunk)
+        last = chunk
+    sys.stdout.flush()
+    # The final line is the summary
+    summary = orjson.loads(last.splitlines()[-1])["summary"]
+    return 1 if summary["failed"] else 0
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Import vehicles from a CSV or NDJSON file")
+    parser.add_argument("path", help="File to import, or - for stdin")
+    parser.add_argument("--format", choices=IMPORT_FORMATS, help="Defaults to the file extension")
+    parser.add_argument("--chunk-size", type=int, default=VehicleService.import_chunk_size)
+    args = parser.parse_args()
+
+    file_format = args.format or FORMAT_EXTENSIONS.get(os.path.splitext(args.path)[1].lower())
+    if file_format is None:
+        parser.error("could not tell the file format from the name; pass --format")
+
+    handle = sys.stdin.buffer if args.path == "-" else open(args.path, "rb")
+    try:
+        return asyncio.run(run(handle, file_format, args.chunk_size))
+    finally:
+        handle.close()
+        shutdown_executors()
+        DatabaseManager.close()
+
+if __name__ == "__main__":
+    sys.exit(main())
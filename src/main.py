@@ -1,27 +1,50 @@
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
 from fastapi.exceptions import RequestValidationError
 from starlette.exceptions import HTTPException as StarletteHTTPException
 
 from src.db.database import DatabaseManager
 from src.db.repository import VehicleRepository
+from src.db.cache import vehicle_cache, vehicle_count_cache
+from src.db.single_flight import vehicle_reads
+from src.db.pool_monitor import pool_monitor
+from src.db.stats_repository import FleetStatsRepository
+from src.services.events import vehicle_events
+from src.services.importer import shutdown_executors
+from src.services.telemetry import vehicle_telemetry
 from src.api.v1.endpoints import vehicles
+from src.api.responses import ORJSONResponse
+from src.api.compression import CompressionMiddleware
+from src.metrics import CONTENT_TYPE, MetricsMiddleware, registry
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     DatabaseManager.connect()
     repo = VehicleRepository(DatabaseManager.get_db())
-    repo.create_indexes()
+    # Only missing indexes are created; INDEX_BUILD_MODE=background serves
+    # while they build and holds /health/ready until they are in place
+    app.state.indexes = repo.index_reconciler()
+    await app.state.indexes.start()
+    # Initialise the fleet counters once, even with several workers starting
+    await FleetStatsRepository(DatabaseManager.get_db()).ensure_initialized()
+    # Flushes buffered telemetry every TELEMETRY_FLUSH_INTERVAL_SECONDS
+    vehicle_telemetry.start(VehicleRepository(DatabaseManager.get_db(), cache=vehicle_cache, flights=vehicle_reads))
     yield
     # Shutdown
+    # Write out buffered telemetry while the client is still open
+    await vehicle_telemetry.stop()
+    await app.state.indexes.stop()
+    shutdown_executors()
     DatabaseManager.close()
 
 app = FastAPI(
     title="Vehicles API",
     description="API for managing vehicle fleet",
     version="1.0.0",
+    default_response_class=ORJSONResponse,
     lifespan=lifespan
 )
 
@@ -36,6 +59,8 @@ async def http_exception_handler(request: Request, exc: StarletteHTTPException):
                 "message": exc.detail,
             }
         },
+        # e.g. Retry-After on 503s
+        headers=getattr(exc, "headers", None),
     )
 
 @app.exception_handler(RequestValidationError)
@@ -46,12 +71,41 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
             "error": {
                 "code": "VALIDATION_ERROR",
                 "message": "Validation error",
-                "details": exc.errors(),
+                # Validator errors carry the raised exception in their context
+                "details": jsonable_encoder(exc.errors()),
             }
         },
     )
 
 app.include_router(vehicles.router, prefix="/api/v1/vehicles", tags=["vehicles"])
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(MetricsMiddleware)
+
+def _component_metrics():
+    cache = vehicle_cache.stats()
+    counts = vehicle_count_cache.stats()
+    pool = pool_monitor.snapshot()
+    telemetry = vehicle_telemetry.stats()
+    return [
+        ("vehicle_cache_hits_total", "counter", "Vehicle cache hits", cache["hits"]),
+        ("vehicle_cache_misses_total", "counter", "Vehicle cache misses", cache["misses"]),
+        ("vehicle_cache_evictions_total", "counter", "Vehicle cache evictions", cache["evictions"]),
+        ("vehicle_cache_stale_puts_total", "counter", "Loads not cached because a write raced them", cache["stale_puts"]),
+        ("vehicle_cache_size", "gauge", "Vehicles currently cached", cache["size"]),
+        ("vehicle_count_cache_hits_total", "counter", "List counts served from cache", counts["hits"]),
+        ("vehicle_count_cache_misses_total", "counter", "List counts read from MongoDB", counts["misses"]),
+        ("telemetry_pending_vehicles", "gauge", "Vehicles with buffered telemetry", telemetry["pending_vehicles"]),
+        ("telemetry_readings_received_total", "counter", "Telemetry readings accepted", telemetry["received"]),
+        ("telemetry_readings_rejected_total", "counter", "Telemetry readings rejected by backpressure", telemetry["rejected"]),
+        ("telemetry_flushes_total", "counter", "Telemetry buffer flushes", telemetry["flushes"]),
+        ("telemetry_flush_failures_total", "counter", "Failed telemetry buffer flushes", telemetry["flush_failures"]),
+        ("mongodb_pool_connections", "gauge", "Open connections in the MongoDB pool", pool["connections"]),
+        ("mongodb_pool_in_use", "gauge", "MongoDB connections checked out", pool["in_use"]),
+        ("mongodb_pool_checkouts_total", "counter", "MongoDB connection checkouts", pool["checkouts"]),
+        ("mongodb_pool_checkout_failures_total", "counter", "Failed MongoDB connection checkouts", pool["checkout_failures"]),
+    ]
+
+registry.register_collector(_component_metrics)
 
 @app.get("/health", status_code=200)
 async def health_check() -> dict[str, str]:
@@ -59,3 +113,46 @@ async def health_check() -> dict[str, str]:
     Health check endpoint to verify service status.
     """
     return {"status": "ok"}
+
+@app.get("/health/ready", status_code=200)
+async def readiness_check() -> JSONResponse:
+    """
+    Readiness probe: 503 until the declared indexes are in place (and for
+    good if building them failed or a unique index lacks its constraint),
+    while `/health` (liveness) answers as soon as the process serves requests.
+    """
+    indexes = getattr(app.state, "indexes", None)
+    if indexes is None:
+        return JSONResponse(status_code=503, content={"status": "starting", "indexes": None})
+    ready = indexes.ready
+    state = "ready" if ready else "failed" if indexes.state == "failed" else "starting"
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"status": state, "indexes": indexes.status()},
+    )
+
+@app.get("/diagnostics", status_code=200)
+async def diagnostics() -> dict:
+    """
+    Runtime counters of in-process components such as the vehicle cache,
+    the MongoDB connection pool, the event feed and the telemetry buffer.
+    """
+    return {
+        "vehicle_cache": vehicle_cache.stats(),
+        "vehicle_count_cache": vehicle_count_cache.stats(),
+        "vehicle_reads": vehicle_reads.stats(),
+        "mongo_pool": {
+            **pool_monitor.snapshot(),
+            "max_pool_size": DatabaseManager.max_pool_size,
+            "min_pool_size": DatabaseManager.min_pool_size,
+        },
+        "vehicle_events": vehicle_events.stats(),
+        "vehicle_telemetry": vehicle_telemetry.stats(),
+    }
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics() -> Response:
+    """
+    Prometheus text exposition of request, MongoDB and cache metrics.
+    """
+    return Response(registry.render(), media_type=CONTENT_TYPE)
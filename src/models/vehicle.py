@@ -1,9 +1,9 @@
-from datetime import date, datetime
+from datetime import date, datetime, timedelta, timezone
 from enum import Enum
-from typing import Annotated, Optional
+from typing import Annotated, Any, Dict, List, Literal, Optional
 import re
 
-from pydantic import BaseModel, Field, BeforeValidator, ConfigDict, field_validator
+from pydantic import BaseModel, Field, BeforeValidator, ConfigDict, field_validator, model_validator
 
 # Helper for MongoDB ObjectId
 PyObjectId = Annotated[str, BeforeValidator(str)]
@@ -58,6 +58,12 @@ class VehicleBase(BaseModel):
              raise ValueError('Invalid Mexican license plate format. Expected uppercase alphanumeric (e.g., AB-12345)')
         return upper_v
 
+    @field_validator('numero_economico', 'numero_serie')
+    @classmethod
+    def normalize_key(cls, v: str) -> str:
+        # Stored uppercased, like placa, so prefix search is one index range
+        return v.upper()
+
     model_config = ConfigDict(
         populate_by_name=True,
         json_schema_extra={
@@ -102,7 +108,177 @@ class VehicleUpdate(BaseModel):
     gps_id: Optional[str] = None
     base_operativa: Optional[str] = None
 
+    @field_validator('placa', 'numero_economico', 'numero_serie')
+    @classmethod
+    def normalize_key(cls, v: Optional[str]) -> Optional[str]:
+        return v.upper() if v is not None else v
+
     model_config = ConfigDict(populate_by_name=True)
 
 class Vehicle(VehicleBase):
     id: Optional[PyObjectId] = Field(validation_alias="_id", default=None)
+    version: Optional[int] = Field(None, description="Incremented on every update; drives the ETag")
+    # Maintained by telemetry ingestion only, so not accepted on create
+    ultimo_reporte_gps: Optional[datetime] = Field(None, description="Last telemetry heartbeat received")
+
+class VehicleFilters(BaseModel):
+    """Optional equality and range filters for listing vehicles"""
+    estado_vehiculo: Optional[VehicleStatus] = None
+    tipo_vehiculo: Optional[VehicleType] = None
+    base_operativa: Optional[str] = None
+    marca: Optional[str] = None
+    tipo_combustible: Optional[FuelType] = None
+    anno_min: Optional[int] = Field(None, ge=1990)
+    anno_max: Optional[int] = Field(None, ge=1990)
+
+    def to_query(self) -> dict:
+        query = self.model_dump(exclude_none=True, exclude={"anno_min", "anno_max"}, mode="json")
+        anno = {}
+        if self.anno_min is not None:
+            anno["$gte"] = self.anno_min
+        if self.anno_max is not None:
+            anno["$lte"] = self.anno_max
+        if anno:
+            query["anno"] = anno
+        return query
+
+    def matches(self, vehicle: "Vehicle") -> bool:
+        """Whether `vehicle` falls within these filters, without a query."""
+        for field, value in self.model_dump(exclude_none=True, exclude={"anno_min", "anno_max"}).items():
+            if getattr(vehicle, field, None) != value:
+                return False
+        if self.anno_min is not None and vehicle.anno < self.anno_min:
+            return False
+        return self.anno_max is None or vehicle.anno <= self.anno_max
+
+# Fields a client may request through a sparse fieldset; `id` and `version`
+# are always returned.
+PROJECTABLE_FIELDS = (*VehicleBase.model_fields, "ultimo_reporte_gps")
+
+def vehicle_document_to_dict(doc: dict) -> dict:
+    """Turn a stored document into the public Vehicle shape without validation."""
+    doc["id"] = str(doc.pop("_id"))
+    if isinstance(doc.get("vigencia_seguro"), datetime):
+        doc["vigencia_seguro"] = doc["vigencia_seguro"].date()
+    return doc
+
+def vehicle_from_document(doc: dict) -> Vehicle:
+    """Build a Vehicle from a stored document, trusting it instead of re-validating.
+
+    Documents only reach the collection through validated models, so running
+    the validators (placa regex included) again on every read is wasted work.
+    """
+    return Vehicle.model_construct(**vehicle_document_to_dict(doc))
+
+class VehiclePage(BaseModel):
+    """A page of vehicles plus the opaque cursor for the following page"""
+    items: List[Vehicle]
+    next_cursor: Optional[str] = None
+
+class VehicleFieldsPage(BaseModel):
+    """A page of partial vehicles holding only the requested fields"""
+    items: List[Dict[str, Any]]
+    next_cursor: Optional[str] = None
+
+class BulkItemResult(BaseModel):
+    """Outcome of a single item in a bulk operation"""
+    index: int
+    status: Literal["created", "error"]
+    vehicle: Optional[Vehicle] = None
+    error: Optional[str] = None
+
+class BulkCreateResult(BaseModel):
+    created: int
+    failed: int
+    results: List[BulkItemResult]
+
+class BulkUpdateItem(BaseModel):
+    id: str
+    update: VehicleUpdate
+
+class BulkUpdateRequest(BaseModel):
+    """Either explicit per-vehicle updates, or one update for every vehicle matching a filter"""
+    items: Optional[List[BulkUpdateItem]] = None
+    filter: Optional[VehicleFilters] = None
+    set: Optional[VehicleUpdate] = None
+
+    @model_validator(mode="after")
+    def check_mode(self) -> "BulkUpdateRequest":
+        if (self.items is None) == (self.set is None):
+            raise ValueError("Provide either items or filter and set")
+        if self.items is not None and self.filter is not None:
+            raise ValueError("filter can only be combined with set")
+        return self
+
+class BulkUpdateItemResult(BaseModel):
+    """Outcome of a single vehicle in a bulk update"""
+    index: int
+    id: str
+    status: Literal["updated", "not_found", "error"]
+    vehicle: Optional[Vehicle] = None
+    error: Optional[str] = None
+
+class BulkUpdateResult(BaseModel):
+    updated: int
+    failed: int
+    results: List[BulkUpdateItemResult]
+
+class VehicleSearchHit(BaseModel):
+    """A search result and what it matched on"""
+    matched: Literal["placa", "numero_economico", "numero_serie", "text"]
+    exact: bool = False
+    vehicle: Vehicle
+
+class VehicleChangeEvent(BaseModel):
+    """A change published on the vehicle event feed"""
+    id: str = Field(..., description="Resume token; send it back as Last-Event-ID")
+    type: Literal["created", "updated", "deleted", "imported", "reset"]
+    vehicle_id: Optional[str] = None
+    vehicle: Optional[Vehicle] = None
+    count: Optional[int] = Field(None, description="Vehicles created by an import chunk")
+    timestamp: datetime
+
+# How far ahead of the server clock a telematics unit may report
+TELEMETRY_MAX_CLOCK_SKEW = timedelta(minutes=5)
+
+class TelemetryReading(BaseModel):
+    """One telematics report, addressed by vehicle id or by GPS unit id"""
+    id: Optional[str] = None
+    gps_id: Optional[str] = None
+    kilometraje_actual: Optional[int] = Field(None, ge=0)
+    rendimiento_km_litro: Optional[float] = Field(None, gt=0)
+    timestamp: datetime = Field(default_factory=datetime.utcnow, description="When the unit took the reading")
+
+    @model_validator(mode="after")
+    def check_target(self) -> "TelemetryReading":
+        if (self.id is None) == (self.gps_id is None):
+            raise ValueError("Provide exactly one of id or gps_id")
+        taken_at = self.timestamp
+        if taken_at.tzinfo is not None:
+            taken_at = taken_at.astimezone(timezone.utc).replace(tzinfo=None)
+        # Heartbeats only move forward, so a unit with a wrong clock would pin it
+        if taken_at > datetime.utcnow() + TELEMETRY_MAX_CLOCK_SKEW:
+            raise ValueError("timestamp is in the future")
+        return self
+
+class TelemetryBatch(BaseModel):
+    readings: List[TelemetryReading] = Field(..., min_length=1)
+
+class TelemetryAck(BaseModel):
+    """Readings accepted into the write-behind buffer; they reach MongoDB on the next flush"""
+    accepted: int
+    pending_vehicles: int
+
+class FleetStats(BaseModel):
+    """Fleet counters maintained incrementally on every write"""
+    total: int
+    by_estado_vehiculo: Dict[str, int]
+    by_tipo_vehiculo: Dict[str, int]
+    by_base_operativa: Dict[str, int]
+    capacidad_carga_kg_by_base: Dict[str, float]
+
+class DueVehicle(BaseModel):
+    """A vehicle flagged by the compliance checks"""
+    due: List[Literal["insurance", "inspection"]]
+    due_at: Optional[datetime] = Field(None, description="When the vehicle became due; null if never inspected")
+    vehicle: Vehicle
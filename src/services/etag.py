@@ -0,0 +1,68 @@
+import hashlib
+import json
+from typing import Iterable, Optional
+from src.models.vehicle import Vehicle
+
+def vehicle_etag(vehicle: Vehicle) -> str:
+    """Strong ETag for a vehicle.
+
+    Versioned documents use their id and version, which costs no
+    serialization; documents written before versioning fall back to a hash
+    of their content.
+    """
+    if vehicle.version is not None:
+        return f'"{vehicle.id}-{vehicle.version}"'
+    digest = hashlib.sha1(vehicle.model_dump_json().encode()).hexdigest()
+    return f'"{digest}"'
+
+def list_etag(vehicles: Iterable[Vehicle], next_cursor: Optional[str] = None) -> str:
+    """Strong ETag for a page of vehicles, derived from the item ETags."""
+    digest = hashlib.sha1()
+    for vehicle in vehicles:
+        digest.update(vehicle_etag(vehicle).encode())
+    digest.update((next_cursor or "").encode())
+    return f'"{digest.hexdigest()}"'
+
+def fields_etag(docs: Iterable[dict], fields: Iterable[str], next_cursor: Optional[str] = None) -> str:
+    """Strong ETag for partial vehicles returned through a sparse fieldset."""
+    digest = hashlib.sha1(",".join(fields).encode())
+    for doc in docs:
+        if doc.get("version") is not None:
+            digest.update(f"{doc['id']}-{doc['version']}".encode())
+        else:
+            digest.update(json.dumps(doc, sort_keys=True, default=str).encode())
+    digest.update((next_cursor or "").encode())
+    return f'"{digest.hexdigest()}"'
+
+def representation_etag(etag: str, variant: Optional[str]) -> str:
+    """ETag for an alternative representation (e.g. "msgpack") of what `etag`
+    validates, so validators never match across formats."""
+    if not variant:
+        return etag
+    return f'{etag[:-1]}-{variant}"'
+
+def etag_matches(header: Optional[str], etag: str, weak: bool = False) -> bool:
+    """Check an If-None-Match (weak) or If-Match (strong) header against an ETag."""
+    if not header:
+        return False
+    candidates = [candidate.strip() for candidate in header.split(",")]
+    if weak:
+        candidates = [candidate.removeprefix("W/") for candidate in candidates]
+    return "*" in candidates or etag in candidates
+
+def etag_version(header: Optional[str], vehicle_id: str) -> Optional[int]:
+    """Version named by an If-Match header holding a single versioned ETag for this vehicle.
+
+    Lets a conditional update filter on the version directly instead of
+    reading the current vehicle first. Returns None for anything else.
+    """
+    if not header or "," in header:
+        return None
+    prefix = f'"{vehicle_id}-'
+    # The same version served as another format, or weakened by compression,
+    # still names that version
+    candidate = header.strip().removeprefix("W/")
+    if not (candidate.startswith(prefix) and candidate.endswith('"')):
+        return None
+    version, _, variant = candidate[len(prefix):-1].partition("-")
+    return int(version) if version.isdigit() and (not variant or variant.isalpha()) else None
@@ -0,0 +1,141 @@
+import asyncio
+import os
+import uuid
+from collections import deque
+from datetime import datetime
+from typing import AsyncIterator, Deque, Dict, List, Optional, Set
+from src.models.vehicle import Vehicle, VehicleChangeEvent
+
+class Subscription:
+    """One consumer of the event bus, with its own bounded queue."""
+
+    def __init__(self, bus: "EventBus", backlog: List[VehicleChangeEvent], queue_size: int):
+        self._bus = bus
+        self._backlog = deque(backlog)
+        self.queue: "asyncio.Queue[VehicleChangeEvent]" = asyncio.Queue(maxsize=queue_size)
+        self.dropped = False
+
+    def offer(self, event: VehicleChangeEvent):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # A consumer this far behind would hold back memory for everyone;
+            # cut it loose and let it resume from its last event id.
+            self.dropped = True
+            self._bus.unsubscribe(self)
+
+    async def next(self, timeout: Optional[float] = None) -> Optional[VehicleChangeEvent]:
+        """The next event, or None when `timeout` passes without one."""
+        if self._backlog:
+            return self._backlog.popleft()
+        if self.dropped:
+            raise SubscriberDropped()
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self._bus.unsubscribe(self)
+
+class SubscriberDropped(Exception):
+    pass
+
+class EventBus:
+    """In-process fan-out of vehicle changes to live subscribers.
+
+    Publishing never blocks: each subscriber has a bounded queue and is
+    dropped when it fills. Recent events are kept in a ring buffer so a
+    client reconnecting with its last event id gets what it missed. Ids
+    carry a per-process epoch; an id from another process (or one older than
+    the buffer) gets a `reset` event telling the client to reload its state.
+    """
+    queue_size: int = int(os.getenv("VEHICLE_EVENTS_QUEUE_SIZE", "256"))
+    history_size: int = int(os.getenv("VEHICLE_EVENTS_HISTORY_SIZE", "1024"))
+
+    def __init__(self, queue_size: Optional[int] = None, history_size: Optional[int] = None):
+        if queue_size is not None:
+            self.queue_size = queue_size
+        if history_size is not None:
+            self.history_size = history_size
+        self.epoch = uuid.uuid4().hex[:8]
+        self._sequence = 0
+        self._history: Deque[VehicleChangeEvent] = deque(maxlen=self.history_size)
+        self._subscribers: Set[Subscription] = set()
+        self.published = 0
+        self.dropped = 0
+
+    def publish(
+        self,
+        event_type: str,
+        vehicle_id: Optional[str] = None,
+        vehicle: Optional[Vehicle] = None,
+        count: Optional[int] = None,
+    ):
+        self._sequence += 1
+        event = VehicleChangeEvent(
+            id=f"{self.epoch}-{self._sequence}",
+            type=event_type,
+            vehicle_id=vehicle_id,
+            vehicle=vehicle,
+            count=count,
+            timestamp=datetime.utcnow(),
+        )
+        self._history.append(event)
+        self.published += 1
+        for subscription in list(self._subscribers):
+            subscription.offer(event)
+
+    def subscribe(self, last_event_id: Optional[str] = None) -> Subscription:
+        subscription = Subscription(self, self._missed_since(last_event_id), self.queue_size)
+        self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        if subscription in self._subscribers:
+            self._subscribers.discard(subscription)
+            if subscription.dropped:
+                self.dropped += 1
+
+    def _missed_since(self, last_event_id: Optional[str]) -> List[VehicleChangeEvent]:
+        if not last_event_id:
+            return []
+        epoch, _, sequence = last_event_id.partition("-")
+        oldest = int(self._history[0].id.rsplit("-", 1)[1]) if self._history else self._sequence + 1
+        if epoch != self.epoch or not sequence.isdigit() or int(sequence) + 1 < oldest:
+            return [self._reset()]
+        return [event for event in self._history if int(event.id.rsplit("-", 1)[1]) > int(sequence)]
+
+    def _reset(self) -> VehicleChangeEvent:
+        return VehicleChangeEvent(
+            id=f"{self.epoch}-{self._sequence}", type="reset", timestamp=datetime.utcnow()
+        )
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "subscribers": len(self._subscribers),
+            "published": self.published,
+            "dropped_subscribers": self.dropped,
+            "history": len(self._history),
+        }
+
+async def sse_stream(subscription: Subscription, heartbeat_seconds: float = 15.0) -> AsyncIterator[bytes]:
+    """Encode a subscription as Server-Sent Events, with comment heartbeats
+    so proxies keep the connection open and dead clients are noticed."""
+    try:
+        yield b"retry: 2000\n\n"
+        while True:
+            try:
+                event = await subscription.next(timeout=heartbeat_seconds)
+            except SubscriberDropped:
+                return
+            if event is None:
+                yield b": keepalive\n\n"
+                continue
+            data = event.model_dump_json(exclude_none=True)
+            yield f"id: {event.id}\nevent: {event.type}\ndata: {data}\n\n".encode()
+    finally:
+        subscription.close()
+
+# Shared by every request-scoped service in this process
+vehicle_events = EventBus()
@@ -0,0 +1,136 @@
+import codecs
+import csv
+import json
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import AsyncIterator, Dict, List, Optional, Tuple, Union
+from pydantic import ValidationError
+from src.models.vehicle import VehicleCreate
+
+IMPORT_FORMATS = ("csv", "ndjson")
+FORMAT_EXTENSIONS = {".csv": "csv", ".ndjson": "ndjson", ".jsonl": "ndjson"}
+
+# (row number, raw fields) or (row number, parse error message)
+RawRow = Tuple[int, Union[dict, str]]
+
+def detect_format(content_type: Optional[str]) -> Optional[str]:
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    if media_type == "text/csv":
+        return "csv"
+    if media_type in ("application/x-ndjson", "application/jsonl"):
+        return "ndjson"
+    return None
+
+async def _lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    buffer = b""
+    first = True
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if first:
+                line, first = line.removeprefix(codecs.BOM_UTF8), False
+            yield line.rstrip(b"\r").decode("utf-8", errors="replace")
+    if buffer.strip():
+        yield (buffer.removeprefix(codecs.BOM_UTF8) if first else buffer).rstrip(b"\r").decode("utf-8", errors="replace")
+
+async def _csv_rows(lines: AsyncIterator[str]) -> AsyncIterator[RawRow]:
+    header: Optional[List[str]] = None
+    record: List[str] = []
+    quotes = 0
+    number = 0
+    async for line in lines:
+        # A quoted field may span lines; the record is complete once quotes balance
+        record.append(line)
+        quotes += line.count('"')
+        if quotes % 2:
+            continue
+        text, record, quotes = "\n".join(record), [], 0
+        if not text.strip():
+            continue
+        fields = next(csv.reader([text]))
+        if header is None:
+            header = [name.strip() for name in fields]
+            continue
+        number += 1
+        if len(fields) > len(header):
+            yield number, f"Row has {len(fields)} fields, the header has {len(header)}"
+            continue
+        # Blank cells mean "not provided", so model defaults apply
+        yield number, {name: value.strip() for name, value in zip(header, fields) if name and value.strip()}
+    if record:
+        yield number + 1, "Unterminated quoted field"
+
+async def _ndjson_rows(lines: AsyncIterator[str]) -> AsyncIterator[RawRow]:
+    number = 0
+    async for line in lines:
+        number += 1
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as exc:
+            yield number, f"Invalid JSON: {exc}"
+            continue
+        yield number, row if isinstance(row, dict) else "Expected a JSON object"
+
+def read_rows(chunks: AsyncIterator[bytes], fmt: str) -> AsyncIterator[RawRow]:
+    """Parse a byte stream into rows as it arrives; only the current record is held in memory.
+
+    CSV rows are numbered from the first line after the header, NDJSON rows
+    by line.
+    """
+    parse = _csv_rows if fmt == "csv" else _ndjson_rows
+    return parse(_lines(chunks))
+
+async def take_chunk(rows: AsyncIterator[RawRow], size: int) -> List[RawRow]:
+    chunk: List[RawRow] = []
+    async for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            break
+    return chunk
+
+def _describe(exc: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in error['loc']) or 'row'}: {error['msg']}"
+        for error in exc.errors()
+    )
+
+def validate_chunk(rows: List[RawRow]) -> Tuple[List[Tuple[int, dict]], List[Tuple[int, str]]]:
+    """Validate raw rows against VehicleCreate.
+
+    Runs in a worker process, so it takes and returns plain data only: the
+    documents ready to insert and the errors, each with its row number.
+    """
+    valid: List[Tuple[int, dict]] = []
+    errors: List[Tuple[int, str]] = []
+    for number, row in rows:
+        if isinstance(row, str):
+            errors.append((number, row))
+            continue
+        try:
+            vehicle = VehicleCreate.model_validate(row)
+        except ValidationError as exc:
+            errors.append((number, _describe(exc)))
+            continue
+        valid.append((number, vehicle.model_dump(by_alias=True)))
+    return valid, errors
+
+_executors: Dict[int, Executor] = {}
+
+def validation_executor(workers: int) -> Optional[Executor]:
+    """Process pool shared by imports; None (the default thread pool) when workers is 0."""
+    if workers <= 0:
+        return None
+    if workers not in _executors:
+        _executors[workers] = ProcessPoolExecutor(max_workers=workers)
+    return _executors[workers]
+
+def shutdown_executors():
+    for executor in _executors.values():
+        executor.shutdown(cancel_futures=True)
+    _executors.clear()
+
+def default_workers() -> int:
+    return int(os.getenv("IMPORT_WORKERS", str(min(os.cpu_count() or 1, 4))))
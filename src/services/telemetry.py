@@ -0,0 +1,235 @@
+import asyncio
+import os
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+from src.db.repository import VehicleRepository
+from src.models.vehicle import TelemetryReading
+
+# ("id", vehicle id) or ("gps_id", GPS unit id)
+TelemetryKey = Tuple[str, str]
+# When the stored rendimiento_km_litro was measured
+RENDIMIENTO_TAKEN_AT = "rendimiento_medido_en"
+
+class TelemetryBufferFull(Exception):
+    pass
+
+def _utc(value: datetime) -> datetime:
+    # Stored dates are naive UTC, like datetime.utcnow()
+    return value.astimezone(timezone.utc).replace(tzinfo=None) if value.tzinfo else value
+
+class PendingTelemetry:
+    """Everything reported for one vehicle since the last flush, already merged."""
+    __slots__ = ("kilometraje_actual", "reported_at", "rendimiento")
+
+    def __init__(self):
+        self.kilometraje_actual: Optional[int] = None
+        self.reported_at: Optional[datetime] = None
+        # (taken at, value): the latest reading wins
+        self.rendimiento: Optional[Tuple[datetime, float]] = None
+
+    def merge(self, kilometraje_actual: Optional[int], reported_at: datetime,
+              rendimiento: Optional[Tuple[datetime, float]]):
+        # Odometers only move forward, so out-of-order reports cannot regress them
+        if kilometraje_actual is not None:
+            self.kilometraje_actual = max(self.kilometraje_actual or 0, kilometraje_actual)
+        self.reported_at = max(self.reported_at or reported_at, reported_at)
+        if rendimiento is not None and (self.rendimiento is None or rendimiento[0] >= self.rendimiento[0]):
+            self.rendimiento = rendimiento
+
+    def absorb(self, other: "PendingTelemetry"):
+        self.merge(other.kilometraje_actual, other.reported_at, other.rendimiento)
+
+    def update(self) -> dict:
+        maximums = {"ultimo_reporte_gps": self.reported_at}
+        if self.kilometraje_actual is not None:
+            maximums["kilometraje_actual"] = self.kilometraje_actual
+        return {"$max": maximums, "$inc": {"version": 1}}
+
+    def rendimiento_update(self) -> Optional[Tuple[dict, dict]]:
+        """Condition and update for fuel efficiency, which is not monotonic:
+        it is stored with its reading time and only replaced by a newer one,
+        so an old reading arriving in a later flush cannot win."""
+        if self.rendimiento is None:
+            return None
+        taken_at, value = self.rendimiento
+        condition = {"$or": [{RENDIMIENTO_TAKEN_AT: {"$lt": taken_at}}, {RENDIMIENTO_TAKEN_AT: None}]}
+        return condition, {"$set": {"rendimiento_km_litro": value, RENDIMIENTO_TAKEN_AT: taken_at}}
+
+class TelemetryBuffer:
+    """Write-behind buffer for high-frequency telematics reports.
+
+    Readings are merged per vehicle in memory and written every
+    `flush_interval_seconds` as unordered bulk_writes of `$max` updates,
+    plus `$set`s of fuel efficiency guarded by its reading time, so a truck
+    reporting every 30 seconds costs a share of one round trip per interval
+    instead of several per report. GPS unit ids are
+    resolved to vehicle ids with one query per flush.
+
+    Backpressure: a batch that would take the buffer past
+    `max_pending_vehicles` triggers an early flush and waits up to
+    `backpressure_timeout_seconds` for room, then is rejected with
+    TelemetryBufferFull (0 rejects immediately). A failed flush keeps its
+    readings for the next one.
+
+    Telemetry does bump `version`, so ETags change, but is not published on
+    the event feed: it would drown out fleet record changes.
+    """
+    flush_interval_seconds: float = float(os.getenv("TELEMETRY_FLUSH_INTERVAL_SECONDS", "5"))
+    max_pending_vehicles: int = int(os.getenv("TELEMETRY_MAX_PENDING_VEHICLES", "20000"))
+    max_batch_size: int = int(os.getenv("TELEMETRY_MAX_BATCH_SIZE", "5000"))
+    flush_batch_size: int = int(os.getenv("TELEMETRY_FLUSH_BATCH_SIZE", "1000"))
+    backpressure_timeout_seconds: float = float(os.getenv("TELEMETRY_BACKPRESSURE_TIMEOUT_SECONDS", "2"))
+
+    def __init__(
+        self,
+        flush_interval_seconds: Optional[float] = None,
+        max_pending_vehicles: Optional[int] = None,
+        flush_batch_size: Optional[int] = None,
+        backpressure_timeout_seconds: Optional[float] = None,
+    ):
+        if flush_interval_seconds is not None:
+            self.flush_interval_seconds = flush_interval_seconds
+        if max_pending_vehicles is not None:
+            self.max_pending_vehicles = max_pending_vehicles
+        if flush_batch_size is not None:
+            self.flush_batch_size = flush_batch_size
+        if backpressure_timeout_seconds is not None:
+            self.backpressure_timeout_seconds = backpressure_timeout_seconds
+        self._pending: Dict[TelemetryKey, PendingTelemetry] = {}
+        self._repository: Optional[VehicleRepository] = None
+        self._task: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+        self.received = 0
+        self.coalesced = 0
+        self.rejected = 0
+        self.flushes = 0
+        self.flush_failures = 0
+        self.written = 0
+        self.unmatched = 0
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    async def add(self, readings: List[TelemetryReading]) -> int:
+        """Buffer `readings`; returns the number of vehicles now pending."""
+        keys = [("id", reading.id) if reading.id is not None else ("gps_id", reading.gps_id) for reading in readings]
+        if self._new_keys(keys) + len(self._pending) > self.max_pending_vehicles:
+            await self._make_room()
+            if self._new_keys(keys) + len(self._pending) > self.max_pending_vehicles:
+                self.rejected += len(readings)
+                raise TelemetryBufferFull()
+
+        for key, reading in zip(keys, readings):
+            entry = self._pending.get(key)
+            if entry is None:
+                entry = self._pending[key] = PendingTelemetry()
+            else:
+                self.coalesced += 1
+            taken_at = _utc(reading.timestamp)
+            rendimiento = (taken_at, reading.rendimiento_km_litro) if reading.rendimiento_km_litro is not None else None
+            entry.merge(reading.kilometraje_actual, taken_at, rendimiento)
+        self.received += len(readings)
+        return len(self._pending)
+
+    def _new_keys(self, keys: List[TelemetryKey]) -> int:
+        return len({key for key in keys if key not in self._pending})
+
+    async def _make_room(self):
+        if self._repository is None or self.backpressure_timeout_seconds <= 0:
+            return
+        try:
+            # Shielded: a timed-out wait must not abandon a flush half way
+            await asyncio.wait_for(asyncio.shield(self.flush()), self.backpressure_timeout_seconds)
+        except asyncio.TimeoutError:
+            pass
+
+    async def flush(self) -> int:
+        """Write everything pending; returns the number of vehicles updated."""
+        async with self._flush_lock:
+            if not self._pending or self._repository is None:
+                return 0
+            pending, self._pending = self._pending, {}
+            try:
+                written = await self._write(pending)
+            except Exception as exc:
+                # Put the readings back; anything buffered meanwhile is merged in
+                for key, entry in pending.items():
+                    current = self._pending.get(key)
+                    if current is None:
+                        self._pending[key] = entry
+                    else:
+                        current.absorb(entry)
+                self.flush_failures += 1
+                print(f"Telemetry flush failed, {len(pending)} vehicles kept for retry: {exc}")
+                return 0
+            self.flushes += 1
+            self.written += written
+            return written
+
+    async def _write(self, pending: Dict[TelemetryKey, PendingTelemetry]) -> int:
+        gps_ids = [value for kind, value in pending if kind == "gps_id"]
+        ids_by_gps = await self._repository.ids_for_gps(gps_ids) if gps_ids else {}
+
+        # A vehicle reported both by id and by GPS unit becomes one update
+        by_vehicle: Dict[str, PendingTelemetry] = {}
+        for (kind, value), entry in pending.items():
+            vehicle_id = value if kind == "id" else ids_by_gps.get(value)
+            if vehicle_id is None:
+                self.unmatched += 1
+                continue
+            if vehicle_id in by_vehicle:
+                by_vehicle[vehicle_id].absorb(entry)
+            else:
+                by_vehicle[vehicle_id] = entry
+
+        entries = list(by_vehicle.items())
+        matched = 0
+        for start in range(0, len(entries), self.flush_batch_size):
+            chunk = entries[start:start + self.flush_batch_size]
+            guarded = [
+                (vehicle_id, *rendimiento)
+                for vehicle_id, entry in chunk
+                if (rendimiento := entry.rendimiento_update()) is not None
+            ]
+            matched += await self._repository.apply_telemetry(
+                [(vehicle_id, entry.update()) for vehicle_id, entry in chunk], guarded
+            )
+        self.unmatched += len(entries) - matched
+        return matched
+
+    def start(self, repository: VehicleRepository):
+        self._repository = repository
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval_seconds)
+            await self.flush()
+
+    async def stop(self):
+        """Stop the periodic flush and write out whatever is still buffered."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "pending_vehicles": len(self._pending),
+            "received": self.received,
+            "coalesced": self.coalesced,
+            "rejected": self.rejected,
+            "flushes": self.flushes,
+            "flush_failures": self.flush_failures,
+            "written": self.written,
+            "unmatched": self.unmatched,
+        }
+
+# Shared by every request-scoped service in this process
+vehicle_telemetry = TelemetryBuffer()
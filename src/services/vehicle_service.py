@@ -1,58 +1,564 @@
-from typing import List, Optional
+import asyncio
+import os
+from collections import deque
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Callable, Deque, List, Optional, Sequence, Tuple
+import orjson
+from bson import ObjectId
 from fastapi import HTTPException
-from src.models.vehicle import Vehicle, VehicleCreate, VehicleUpdate
-from src.db.repository import VehicleRepository
+from pymongo.errors import DuplicateKeyError, OperationFailure
+from src.models.vehicle import (
+    Vehicle, VehicleCreate, VehicleUpdate, VehiclePage, VehicleFieldsPage, BulkItemResult,
+    BulkCreateResult, VehicleFilters, FleetStats, DueVehicle, PROJECTABLE_FIELDS, vehicle_document_to_dict,
+    vehicle_from_document, BulkUpdateRequest, BulkUpdateItemResult, BulkUpdateResult,
+    VehicleSearchHit, TelemetryBatch, TelemetryAck
+)
+from src.db.repository import VehicleRepository, UNIQUE_FIELDS, SEARCH_FIELDS, duplicate_key_field
+from src.db.stats_repository import FleetStatsRepository, stats_delta
+from src.db.cache import CountCache
+from src.db.pagination import InvalidCursorError
+from src.services.etag import vehicle_etag, etag_matches, etag_version
+from src.services.events import EventBus, sse_stream
+from src.services.importer import RawRow, take_chunk, validate_chunk, validation_executor, default_workers
+from src.services.telemetry import TelemetryBuffer, TelemetryBufferFull
+
+DUPLICATE_MESSAGES = {
+    "placa": "Vehicle with this license plate already exists",
+    "numero_economico": "Vehicle with this fleet number already exists",
+    "numero_serie": "Vehicle with this VIN already exists",
+}
+
+# MongoDB's error code for a $text query without a text index
+INDEX_NOT_FOUND = 27
+SEARCH_RETRY_AFTER_SECONDS = 30
+
+def parse_fields(fields: str) -> List[str]:
+    requested = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in requested if field not in PROJECTABLE_FIELDS]
+    if unknown or not requested:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields requested: {', '.join(unknown)}" if unknown else "No fields requested"
+        )
+    return list(dict.fromkeys(requested))
+
+async def _ndjson_chunks(rows: AsyncIterator[bytes], batch_size: int) -> AsyncIterator[bytes]:
+    # Group encoded rows so each write to the socket carries a whole batch
+    lines: List[bytes] = []
+    async for row in rows:
+        lines.append(row)
+        if len(lines) >= batch_size:
+            yield b"\n".join(lines) + b"\n"
+            lines = []
+    if lines:
+        yield b"\n".join(lines) + b"\n"
+
+async def _merge_sorted(
+    *streams: Tuple[AsyncIterator[dict], Callable[[dict], datetime]]
+) -> AsyncIterator[Tuple[datetime, dict]]:
+    # Each stream is already sorted by its key; keep one pending doc per stream
+    pending = []
+    for index, (stream, key) in enumerate(streams):
+        doc = await anext(stream, None)
+        if doc is not None:
+            pending.append([key(doc), index, doc])
+    while pending:
+        entry = min(pending)
+        yield entry[0], entry[2]
+        stream, key = streams[entry[1]]
+        doc = await anext(stream, None)
+        if doc is None:
+            pending.remove(entry)
+        else:
+            entry[0], entry[2] = key(doc), doc
 
 class VehicleService:
-    def __init__(self, repository: VehicleRepository):
+    max_bulk_size: int = int(os.getenv("BULK_MAX_BATCH_SIZE", "500"))
+    # "precheck" queries for conflicts before inserting; "direct" inserts in one
+    # round trip and relies on the unique indexes to reject duplicates.
+    create_mode: str = os.getenv("VEHICLE_CREATE_MODE", "precheck")
+    # Rows validated and inserted per round trip, and validation processes
+    # (0 validates on the default thread pool instead)
+    import_chunk_size: int = int(os.getenv("IMPORT_CHUNK_SIZE", "1000"))
+    import_workers: int = default_workers()
+
+    def __init__(
+        self,
+        repository: VehicleRepository,
+        stats: Optional[FleetStatsRepository] = None,
+        events: Optional[EventBus] = None,
+        counts: Optional[CountCache] = None,
+        telemetry: Optional[TelemetryBuffer] = None,
+    ):
         self.repository = repository
+        self.stats = stats
+        self.events = events
+        self.counts = counts
+        self.telemetry = telemetry
+
+    async def create_vehicle(self, vehicle: VehicleCreate) -> Vehicle:
+        if self.create_mode == "precheck":
+            # Uniqueness checks
+            conflicts = await self.repository.check_uniqueness(vehicle.placa, vehicle.numero_economico, vehicle.numero_serie)
+
+            if conflicts:
+                for field in UNIQUE_FIELDS:
+                    if any(getattr(c, field) == getattr(vehicle, field) for c in conflicts):
+                        raise HTTPException(status_code=400, detail=DUPLICATE_MESSAGES[field])
+
+        # The unique indexes are the real guard: they also catch a concurrent
+        # writer that claims a key after the precheck.
+        try:
+            created = await self.repository.create(vehicle)
+        except DuplicateKeyError as exc:
+            field = duplicate_key_field(exc.details or {"errmsg": str(exc)})
+            raise HTTPException(
+                status_code=400, detail=DUPLICATE_MESSAGES.get(field, "Vehicle already exists")
+            )
+        await self._record_changes(added=[created])
+        self._publish("created", [created])
+        return created
+
+    async def create_vehicles_bulk(self, vehicles: List[VehicleCreate]) -> BulkCreateResult:
+        if len(vehicles) > self.max_bulk_size:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Bulk requests are limited to {self.max_bulk_size} vehicles"
+            )
+
+        # One query covers every unique key in the batch instead of one per item
+        stored = await self.repository.find_conflicts(vehicles) if vehicles else []
+        taken = {field: {doc.get(field) for doc in stored} for field in UNIQUE_FIELDS}
+        seen = {field: set() for field in UNIQUE_FIELDS}
+
+        results: List[Optional[BulkItemResult]] = [None] * len(vehicles)
+        accepted: List[int] = []
+        for index, vehicle in enumerate(vehicles):
+            error = None
+            for field in UNIQUE_FIELDS:
+                value = getattr(vehicle, field)
+                if value in taken[field]:
+                    error = DUPLICATE_MESSAGES[field]
+                elif value in seen[field]:
+                    error = f"{DUPLICATE_MESSAGES[field]} earlier in this batch"
+                if error:
+                    break
+            if error:
+                results[index] = BulkItemResult(index=index, status="error", error=error)
+                continue
+            for field in UNIQUE_FIELDS:
+                seen[field].add(getattr(vehicle, field))
+            accepted.append(index)
+
+        created, write_errors = await self.repository.create_many([vehicles[i] for i in accepted])
+        for position, index in enumerate(accepted):
+            if created[position] is not None:
+                results[index] = BulkItemResult(index=index, status="created", vehicle=created[position])
+                continue
+            # A concurrent writer can still claim a key between the check and the insert
+            field = duplicate_key_field(write_errors.get(position, {}))
+            error = DUPLICATE_MESSAGES[field] if field else "Vehicle could not be created"
+            results[index] = BulkItemResult(index=index, status="error", error=error)
+
+        await self._record_changes(added=[vehicle for vehicle in created if vehicle])
+        self._publish("created", [vehicle for vehicle in created if vehicle])
+        created_count = sum(1 for r in results if r.status == "created")
+        return BulkCreateResult(created=created_count, failed=len(results) - created_count, results=results)
+
+    async def import_vehicles(self, rows: AsyncIterator[RawRow], chunk_size: Optional[int] = None) -> AsyncIterator[bytes]:
+        """Validate and insert parsed rows chunk by chunk, streaming an NDJSON report.
 
-    def create_vehicle(self, vehicle: VehicleCreate) -> Vehicle:
-        # Uniqueness checks
-        conflicts = self.repository.check_uniqueness(vehicle.placa, vehicle.numero_economico, vehicle.numero_serie)
+        One line is emitted per rejected row, then a summary line. Each
+        inserted chunk is announced on the event feed as a single `imported`
+        event carrying its size, not one `created` event per row. Chunks are
+        validated in the process pool, at most one chunk per worker ahead of
+        the insert, so memory stays bounded by the chunk size however large
+        the input is.
+        """
+        chunk_size = chunk_size or self.import_chunk_size
+        loop = asyncio.get_running_loop()
+        executor = validation_executor(self.import_workers)
+        ahead = max(self.import_workers, 1)
+        pending: Deque[asyncio.Future] = deque()
+        total = imported = 0
+        exhausted = False
 
-        if conflicts:
-            if any(c.placa == vehicle.placa for c in conflicts):
-                raise HTTPException(status_code=400, detail="Vehicle with this license plate already exists")
-            
-            if any(c.numero_economico == vehicle.numero_economico for c in conflicts):
-                raise HTTPException(status_code=400, detail="Vehicle with this fleet number already exists")
+        while pending or not exhausted:
+            if not exhausted:
+                chunk = await take_chunk(rows, chunk_size)
+                if chunk:
+                    total += len(chunk)
+                    pending.append(loop.run_in_executor(executor, validate_chunk, chunk))
+                exhausted = len(chunk) < chunk_size
+            if not pending or (not exhausted and len(pending) < ahead):
+                continue
 
-            if any(c.numero_serie == vehicle.numero_serie for c in conflicts):
-                raise HTTPException(status_code=400, detail="Vehicle with this VIN already exists")
+            valid, errors = await pending.popleft()
+            docs = [doc for _, doc in valid]
+            write_errors = await self.repository.insert_documents(docs)
+            for position, error in write_errors.items():
+                field = duplicate_key_field(error)
+                errors.append((valid[position][0], DUPLICATE_MESSAGES[field] if field else "Vehicle could not be created"))
+            created = [vehicle_from_document(dict(doc)) for i, doc in enumerate(docs) if i not in write_errors]
+            imported += len(created)
+            await self._record_changes(added=created)
+            # One summary per chunk: an event per row would overflow every
+            # subscriber queue and the resume history on a large import
+            if self.events is not None and created:
+                self.events.publish("imported", count=len(created))
+            if errors:
+                errors.sort()
+                yield b"".join(
+                    orjson.dumps({"row": number, "status": "error", "error": message}) + b"\n"
+                    for number, message in errors
+                )
 
-        return self.repository.create(vehicle)
+        yield orjson.dumps({"summary": {"rows": total, "imported": imported, "failed": total - imported}}) + b"\n"
 
-    def get_vehicle(self, vehicle_id: str) -> Vehicle:
-        vehicle = self.repository.get_by_id(vehicle_id)
+    async def update_vehicles_bulk(self, request: BulkUpdateRequest) -> BulkUpdateResult:
+        if request.items is not None:
+            changes = [(item.id, item.update) for item in request.items]
+        else:
+            filters = request.filter or VehicleFilters()
+            ids = await self.repository.find_ids(filters.to_query(), limit=self.max_bulk_size + 1)
+            changes = [(vehicle_id, request.set) for vehicle_id in ids]
+        if len(changes) > self.max_bulk_size:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Bulk requests are limited to {self.max_bulk_size} vehicles"
+            )
+
+        results: List[Optional[BulkUpdateItemResult]] = [None] * len(changes)
+        accepted: List[int] = []
+        seen = set()
+        for index, (vehicle_id, _) in enumerate(changes):
+            if vehicle_id in seen:
+                results[index] = BulkUpdateItemResult(
+                    index=index, id=vehicle_id, status="error",
+                    error="Vehicle appears earlier in this batch"
+                )
+                continue
+            seen.add(vehicle_id)
+            accepted.append(index)
+
+        updated, write_errors = await self.repository.bulk_update([changes[i] for i in accepted])
+        delta_added, delta_removed = [], []
+        for position, index in enumerate(accepted):
+            vehicle_id = changes[index][0]
+            if updated[position] is not None:
+                previous, vehicle = updated[position]
+                delta_added.append(vehicle)
+                delta_removed.append(previous)
+                results[index] = BulkUpdateItemResult(
+                    index=index, id=vehicle_id, status="updated", vehicle=vehicle
+                )
+            elif position in write_errors:
+                field = duplicate_key_field(write_errors[position])
+                error = DUPLICATE_MESSAGES[field] if field else "Vehicle could not be updated"
+                results[index] = BulkUpdateItemResult(index=index, id=vehicle_id, status="error", error=error)
+            else:
+                results[index] = BulkUpdateItemResult(
+                    index=index, id=vehicle_id, status="not_found",
+                    error="Vehicle not found or modified concurrently"
+                )
+
+        # One counter write covers every transition in the batch
+        await self._record_changes(added=delta_added, removed=delta_removed)
+        self._publish("updated", delta_added)
+        updated_count = len(delta_added)
+        return BulkUpdateResult(updated=updated_count, failed=len(results) - updated_count, results=results)
+
+    async def get_vehicle(self, vehicle_id: str) -> Vehicle:
+        vehicle = await self.repository.get_by_id(vehicle_id)
+        if not vehicle:
+            raise HTTPException(status_code=404, detail="Vehicle not found")
+        return vehicle
+
+    async def get_vehicle_fields(self, vehicle_id: str, fields: List[str]) -> dict:
+        vehicle = await self.repository.get_fields_by_id(vehicle_id, fields)
         if not vehicle:
             raise HTTPException(status_code=404, detail="Vehicle not found")
         return vehicle
 
-    def list_vehicles(self, skip: int = 0, limit: int = 100) -> List[Vehicle]:
-        return self.repository.list(skip, limit)
-
-    def update_vehicle(self, vehicle_id: str, updates: VehicleUpdate) -> Vehicle:
-        current_vehicle = self.get_vehicle(vehicle_id)
-        
-        # Check uniqueness if updating fields
-        if updates.placa and updates.placa != current_vehicle.placa:
-             if self.repository.get_by_field("placa", updates.placa):
-                raise HTTPException(status_code=400, detail="Vehicle with this license plate already exists")
-
-        if updates.numero_economico and updates.numero_economico != current_vehicle.numero_economico:
-             if self.repository.get_by_field("numero_economico", updates.numero_economico):
-                raise HTTPException(status_code=400, detail="Vehicle with this fleet number already exists")
-        
-        updated_vehicle = self.repository.update(vehicle_id, updates)
-        if not updated_vehicle:
-             # Should not happen given get_vehicle check, but safe guard
-             raise HTTPException(status_code=404, detail="Vehicle not found")
-        
+    async def list_vehicle_fields(
+        self,
+        fields: List[str],
+        skip: int = 0,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        sort: str = "_id",
+        filters: Optional[VehicleFilters] = None,
+    ) -> VehicleFieldsPage:
+        try:
+            return await self.repository.list_fields(
+                fields, skip, limit, cursor=cursor, sort=sort, filters=filters
+            )
+        except InvalidCursorError as exc:
+            raise HTTPException(status_code=400, detail=str(exc))
+
+    async def list_vehicles(
+        self,
+        skip: int = 0,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        sort: str = "_id",
+        filters: Optional[VehicleFilters] = None,
+    ) -> VehiclePage:
+        try:
+            return await self.repository.list(skip, limit, cursor=cursor, sort=sort, filters=filters)
+        except InvalidCursorError as exc:
+            raise HTTPException(status_code=400, detail=str(exc))
+
+    async def count_vehicles(self, filters: Optional[VehicleFilters] = None) -> int:
+        """Total matching `filters`, from the count cache when one is configured."""
+        filters = filters or VehicleFilters()
+        if self.counts is None:
+            return await self.repository.count(filters)
+        cached = self.counts.get(filters)
+        if cached is not None:
+            return cached
+        generation = self.counts.generation()
+        count = await self.repository.count(filters)
+        self.counts.put(filters, count, generation)
+        return count
+
+    async def search_vehicles(self, q: str, limit: int = 10) -> List[VehicleSearchHit]:
+        """Rank prefix matches on the unique keys ahead of free-text matches.
+
+        Exact key matches come first, then prefixes (plate before fleet
+        number before VIN, shorter values first), then marca/modelo text
+        matches by score. All lookups run concurrently.
+        """
+        term = q.strip()
+        if not term:
+            raise HTTPException(status_code=400, detail="Search term must not be blank")
+
+        try:
+            *prefix_results, text_results = await asyncio.gather(
+                *(self.repository.prefix_search(field, term, limit) for field in SEARCH_FIELDS),
+                self.repository.text_search(term, limit),
+            )
+        except OperationFailure as exc:
+            # The text index may still be building in the background
+            if exc.code != INDEX_NOT_FOUND:
+                raise
+            raise HTTPException(
+                status_code=503,
+                detail="Search index is not ready yet",
+                headers={"Retry-After": str(SEARCH_RETRY_AFTER_SECONDS)},
+            )
+
+        ranked = {}
+
+        def offer(rank: tuple, hit: VehicleSearchHit):
+            current = ranked.get(hit.vehicle.id)
+            if current is None or rank < current[0]:
+                ranked[hit.vehicle.id] = (rank, hit)
+
+        normalized = term.upper()
+        for priority, (field, vehicles) in enumerate(zip(SEARCH_FIELDS, prefix_results)):
+            for vehicle in vehicles:
+                value = getattr(vehicle, field)
+                exact = value.upper() == normalized
+                offer((0 if exact else 1, priority, float(len(value)), value),
+                      VehicleSearchHit(matched=field, exact=exact, vehicle=vehicle))
+        for vehicle, score in text_results:
+            offer((2, len(SEARCH_FIELDS), -score, ""), VehicleSearchHit(matched="text", vehicle=vehicle))
+
+        return [hit for _, hit in sorted(ranked.values(), key=lambda entry: entry[0])[:limit]]
+
+    async def export_vehicles(self, batch_size: int = 1000, validate: bool = True) -> AsyncIterator[bytes]:
+        """Stream the whole fleet as NDJSON, one chunk per cursor batch.
+
+        Memory use is bounded by `batch_size` regardless of the fleet size.
+        """
+        async def rows():
+            async for doc in self.repository.stream(batch_size):
+                if validate:
+                    yield Vehicle(**doc).model_dump_json().encode()
+                else:
+                    yield orjson.dumps(vehicle_document_to_dict(doc), default=str)
+
+        async for chunk in _ndjson_chunks(rows(), batch_size):
+            yield chunk
+
+    def due_vehicles(
+        self,
+        insurance_within_days: Optional[int] = None,
+        inspection_older_than_days: Optional[int] = None,
+        batch_size: int = 500,
+    ) -> AsyncIterator[bytes]:
+        """Stream vehicles due for insurance renewal or inspection as NDJSON.
+
+        Each check walks its own date index in order; when both are requested
+        the two ordered streams are merged, so output stays in date order
+        without buffering the result set.
+        """
+        if insurance_within_days is None and inspection_older_than_days is None:
+            raise HTTPException(
+                status_code=400,
+                detail="Provide insurance_within_days and/or inspection_older_than_days"
+            )
+        now = datetime.utcnow()
+        insurance_cutoff = None
+        if insurance_within_days is not None:
+            insurance_cutoff = datetime.combine(
+                now.date() + timedelta(days=insurance_within_days), datetime.min.time()
+            )
+        inspection_window = None
+        if inspection_older_than_days is not None:
+            inspection_window = timedelta(days=inspection_older_than_days)
+        return self._due_vehicles(now, insurance_cutoff, inspection_window, batch_size)
+
+    async def _due_vehicles(
+        self,
+        now: datetime,
+        insurance_cutoff: Optional[datetime],
+        inspection_window: Optional[timedelta],
+        batch_size: int,
+    ) -> AsyncIterator[bytes]:
+        inspection_cutoff = now - inspection_window if inspection_window is not None else None
+
+        def insurance_due(doc: dict) -> bool:
+            return insurance_cutoff is not None and doc["vigencia_seguro"] <= insurance_cutoff
+
+        def inspection_due(doc: dict) -> bool:
+            last = doc.get("ultima_verificacion")
+            return inspection_cutoff is not None and (last is None or last < inspection_cutoff)
+
+        def inspection_key(doc: dict) -> datetime:
+            last = doc.get("ultima_verificacion")
+            return datetime.min if last is None else last + inspection_window
+
+        async def inspection_only():
+            # Vehicles matching both checks are emitted by the insurance stream
+            async for doc in self.repository.stream_inspection_due(inspection_cutoff, batch_size):
+                if not insurance_due(doc):
+                    yield doc
+
+        streams = []
+        if insurance_cutoff is not None:
+            streams.append((
+                self.repository.stream_insurance_due(insurance_cutoff, batch_size),
+                lambda doc: doc["vigencia_seguro"],
+            ))
+        if inspection_cutoff is not None:
+            streams.append((inspection_only(), inspection_key))
+
+        async def rows():
+            async for due_at, doc in _merge_sorted(*streams):
+                due = []
+                if insurance_due(doc):
+                    due.append("insurance")
+                if inspection_due(doc):
+                    due.append("inspection")
+                item = DueVehicle(
+                    due=due,
+                    due_at=None if due_at == datetime.min else due_at,
+                    vehicle=vehicle_from_document(doc),
+                )
+                yield item.model_dump_json().encode()
+
+        async for chunk in _ndjson_chunks(rows(), batch_size):
+            yield chunk
+
+    async def update_vehicle(
+        self, vehicle_id: str, updates: VehicleUpdate, if_match: Optional[str] = None
+    ) -> Vehicle:
+        # A versioned If-Match is checked by the update filter itself; only
+        # other ETags (wildcards, lists, legacy content hashes) need a read.
+        expected_version = etag_version(if_match, vehicle_id)
+        if if_match is not None and expected_version is None:
+            current_vehicle = await self.get_vehicle(vehicle_id)
+            if not etag_matches(if_match, vehicle_etag(current_vehicle)):
+                raise HTTPException(status_code=412, detail="Vehicle has been modified")
+            expected_version = current_vehicle.version
+
+        try:
+            result = await self.repository.update_with_previous(
+                vehicle_id, updates, expected_version=expected_version
+            )
+        except DuplicateKeyError as exc:
+            field = duplicate_key_field(exc.details or {"errmsg": str(exc)})
+            raise HTTPException(
+                status_code=400, detail=DUPLICATE_MESSAGES.get(field, "Vehicle already exists")
+            )
+        if not result:
+            # The failure path pays for the lookup that tells the two apart
+            if expected_version is not None and await self.repository.get_by_id(vehicle_id):
+                raise HTTPException(status_code=412, detail="Vehicle has been modified")
+            raise HTTPException(status_code=404, detail="Vehicle not found")
+
+        previous_vehicle, updated_vehicle = result
+        await self._record_changes(added=[updated_vehicle], removed=[previous_vehicle])
+        self._publish("updated", [updated_vehicle])
         return updated_vehicle
 
-    def delete_vehicle(self, vehicle_id: str) -> bool:
-        vehicle = self.repository.get_by_id(vehicle_id)
-        if not vehicle:
+    async def delete_vehicle(self, vehicle_id: str) -> bool:
+        if self.stats is None and self.counts is None:
+            deleted = await self.repository.delete(vehicle_id)
+        else:
+            # Counters need the removed vehicle, which find_one_and_delete
+            # returns in the same round trip
+            removed = await self.repository.delete_returning(vehicle_id)
+            deleted = removed is not None
+            if deleted:
+                await self._record_changes(removed=[removed])
+        if not deleted:
             raise HTTPException(status_code=404, detail="Vehicle not found")
-        return self.repository.delete(vehicle_id)
+        if self.events is not None:
+            self.events.publish("deleted", vehicle_id)
+        return deleted
+
+    def stream_events(self, last_event_id: Optional[str] = None, heartbeat_seconds: float = 15.0) -> AsyncIterator[bytes]:
+        """Server-Sent Events for every change made through this process.
+
+        Subscribing happens here, before the response starts, so no event
+        published in between is lost.
+        """
+        if self.events is None:
+            raise HTTPException(status_code=503, detail="Event feed is not enabled")
+        return sse_stream(self.events.subscribe(last_event_id), heartbeat_seconds)
+
+    async def ingest_telemetry(self, batch: TelemetryBatch) -> TelemetryAck:
+        """Buffer telemetry for the next write-behind flush.
+
+        Odometer, fuel efficiency and last-report time are not counted in
+        fleet stats or list filters, so nothing here touches those caches.
+        """
+        if self.telemetry is None:
+            raise HTTPException(status_code=503, detail="Telemetry ingestion is not enabled")
+        if len(batch.readings) > self.telemetry.max_batch_size:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Batch size exceeds maximum of {self.telemetry.max_batch_size} readings"
+            )
+        invalid = [reading.id for reading in batch.readings if reading.id is not None and not ObjectId.is_valid(reading.id)]
+        if invalid:
+            raise HTTPException(status_code=400, detail=f"Invalid vehicle ids: {', '.join(invalid[:10])}")
+        try:
+            pending = await self.telemetry.add(batch.readings)
+        except TelemetryBufferFull:
+            raise HTTPException(
+                status_code=503,
+                detail="Telemetry buffer is full, retry later",
+                headers={"Retry-After": str(max(1, round(self.telemetry.flush_interval_seconds)))},
+            )
+        return TelemetryAck(accepted=len(batch.readings), pending_vehicles=pending)
+
+    async def get_stats(self) -> FleetStats:
+        return await self.stats.get()
+
+    async def rebuild_stats(self) -> FleetStats:
+        return await self.stats.rebuild()
+
+    async def _record_changes(self, added: Sequence[Vehicle] = (), removed: Sequence[Vehicle] = ()):
+        if self.counts is not None:
+            self.counts.apply(added, removed)
+        if self.stats is not None:
+            await self.stats.apply(stats_delta(added, removed))
+
+    def _publish(self, event_type: str, vehicles: List[Vehicle]):
+        if self.events is not None:
+            for vehicle in vehicles:
+                self.events.publish(event_type, vehicle.id, vehicle)
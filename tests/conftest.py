@@ -0,0 +1,20 @@
+import pytest
+from unittest.mock import MagicMock, patch
+from src.main import app
+from src.api.deps import get_service
+from src.db.database import DatabaseManager
+from src.services.vehicle_service import VehicleService
+
+@pytest.fixture
+def mock_db_connection():
+    """Mock DB connection to prevent startup connection attempts."""
+    with patch.object(DatabaseManager, 'connect'), patch.object(DatabaseManager, 'close'):
+        yield
+
+@pytest.fixture
+def mock_service():
+    """Create a mock service and setup dependency override."""
+    service_mock = MagicMock(spec=VehicleService)
+    app.dependency_overrides[get_service] = lambda: service_mock
+    yield service_mock
+    app.dependency_overrides = {}
@@ -1,27 +1,12 @@
 import pytest
+from fastapi import HTTPException
 from fastapi.testclient import TestClient
-from unittest.mock import MagicMock, patch
 from src.main import app
-from src.services.vehicle_service import VehicleService
-from src.models.vehicle import Vehicle, VehicleCreate, VehicleType, VehicleStatus
-from src.api.deps import get_service
-from src.db.database import DatabaseManager
+from src.models.vehicle import Vehicle, VehicleCreate, VehicleType, VehicleStatus, VehiclePage, VehicleFieldsPage, VehicleFilters, BulkCreateResult, BulkItemResult, FleetStats, TelemetryAck
 
 client = TestClient(app)
 
-@pytest.fixture(autouse=True)
-def mock_db_connection():
-    """Mock DB connection to prevent startup connection attempts."""
-    with patch.object(DatabaseManager, 'connect'), patch.object(DatabaseManager, 'close'):
-        yield
-
-@pytest.fixture
-def mock_service():
-    """Create a mock service and setup dependency override."""
-    service_mock = MagicMock(spec=VehicleService)
-    app.dependency_overrides[get_service] = lambda: service_mock
-    yield service_mock
-    app.dependency_overrides = {}
+pytestmark = pytest.mark.usefixtures("mock_db_connection")
 
 def test_create_vehicle_api(mock_service):
     vehicle_data = {
@@ -48,6 +33,128 @@ def test_create_vehicle_api(mock_service):
     assert response.json()["placa"] == "AA-123-BB"
     mock_service.create_vehicle.assert_called_once()
 
+def test_create_vehicles_bulk_api(mock_service):
+    vehicle_data = {
+        "placa": "AA-123-BB",
+        "numero_economico": "100",
+        "marca": "Kenworth",
+        "modelo": "T680",
+        "anno": 2023,
+        "tipo_vehiculo": "TRACTOR_TRUCK",
+        "capacidad_carga_kg": 20000,
+        "numero_serie": "12345678901234567",
+        "poliza_seguro": "P-123",
+        "vigencia_seguro": "2025-12-31"
+    }
+    mock_service.create_vehicles_bulk.return_value = BulkCreateResult(
+        created=1,
+        failed=1,
+        results=[
+            BulkItemResult(index=0, status="created", vehicle=Vehicle(id="1", **vehicle_data)),
+            BulkItemResult(index=1, status="error", error="Vehicle with this license plate already exists earlier in this batch"),
+        ],
+    )
+
+    response = client.post("/api/v1/vehicles/bulk", json=[vehicle_data, vehicle_data])
+
+    assert response.status_code == 200
+    assert response.json()["created"] == 1
+    assert response.json()["results"][1]["status"] == "error"
+    assert len(mock_service.create_vehicles_bulk.call_args.args[0]) == 2
+
+def test_update_vehicles_bulk_api(mock_service):
+    from src.models.vehicle import BulkUpdateResult, BulkUpdateItemResult
+    mock_service.update_vehicles_bulk.return_value = BulkUpdateResult(
+        updated=0,
+        failed=1,
+        results=[BulkUpdateItemResult(index=0, id="1", status="not_found", error="Vehicle not found")],
+    )
+
+    response = client.patch(
+        "/api/v1/vehicles/bulk",
+        json={"items": [{"id": "1", "update": {"estado_vehiculo": "IN_MAINTENANCE"}}]},
+    )
+
+    assert response.status_code == 200
+    assert response.json()["results"][0]["status"] == "not_found"
+    request = mock_service.update_vehicles_bulk.call_args.args[0]
+    assert request.items[0].update.estado_vehiculo == VehicleStatus.IN_MAINTENANCE
+
+    # Mixing both modes is rejected before reaching the service
+    response = client.patch(
+        "/api/v1/vehicles/bulk",
+        json={"items": [], "set": {"estado_vehiculo": "ACTIVE"}},
+    )
+    assert response.status_code == 422
+
+def test_search_vehicles_api(mock_service):
+    from src.models.vehicle import VehicleSearchHit
+    vehicle = Vehicle(
+        id="1", placa="AA-123-BB", numero_economico="100", marca="Kenworth", modelo="T680", anno=2023,
+        tipo_vehiculo=VehicleType.TRACTOR_TRUCK, capacidad_carga_kg=20000,
+        numero_serie="12345678901234567", poliza_seguro="P-123", vigencia_seguro="2025-12-31"
+    )
+    mock_service.search_vehicles.return_value = [VehicleSearchHit(matched="placa", vehicle=vehicle)]
+
+    response = client.get("/api/v1/vehicles/search?q=aa-1&limit=5")
+
+    assert response.status_code == 200
+    assert response.json()[0]["matched"] == "placa"
+    assert response.json()[0]["vehicle"]["placa"] == "AA-123-BB"
+    mock_service.search_vehicles.assert_called_with("aa-1", limit=5)
+    assert client.get("/api/v1/vehicles/search?q=").status_code == 422
+
+def test_import_vehicles_api(mock_service):
+    async def import_vehicles(rows, chunk_size=None):
+        # The body must still be readable while the report streams
+        parsed = [row async for row in rows]
+        yield f'{{"summary": {{"rows": {len(parsed)}, "chunk_size": {chunk_size}}}}}\n'.encode()
+    mock_service.import_vehicles.side_effect = import_vehicles
+
+    response = client.post(
+        "/api/v1/vehicles/import?chunk_size=50",
+        content=b"placa,anno\nAB-123,2020\nCD-456,2021\n",
+        headers={"Content-Type": "text/csv"},
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert response.json() == {"summary": {"rows": 2, "chunk_size": 50}}
+    assert client.post("/api/v1/vehicles/import", content=b"{}").status_code == 415
+
+def test_ingest_telemetry_api(mock_service):
+    mock_service.ingest_telemetry.return_value = TelemetryAck(accepted=2, pending_vehicles=1)
+    readings = {"readings": [
+        {"gps_id": "GPS-1", "kilometraje_actual": 1200},
+        {"gps_id": "GPS-1", "kilometraje_actual": 1250, "rendimiento_km_litro": 2.8},
+    ]}
+
+    response = client.post("/api/v1/vehicles/telemetry", json=readings)
+
+    assert response.status_code == 202
+    assert response.json() == {"accepted": 2, "pending_vehicles": 1}
+    assert client.post("/api/v1/vehicles/telemetry", json={"readings": [{"kilometraje_actual": 1}]}).status_code == 422
+
+    mock_service.ingest_telemetry.side_effect = HTTPException(
+        status_code=503, detail="Telemetry buffer is full, retry later", headers={"Retry-After": "5"}
+    )
+    full = client.post("/api/v1/vehicles/telemetry", json=readings)
+    assert full.status_code == 503
+    assert full.headers["retry-after"] == "5"
+
+def test_vehicle_events_api(mock_service):
+    async def stream():
+        yield b"id: e-1\nevent: created\ndata: {}\n\n"
+    mock_service.stream_events.return_value = stream()
+
+    response = client.get("/api/v1/vehicles/events", headers={"Last-Event-ID": "e-0"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert response.headers["cache-control"] == "no-cache"
+    assert response.text == "id: e-1\nevent: created\ndata: {}\n\n"
+    mock_service.stream_events.assert_called_with("e-0")
+
 def test_get_vehicle_api(mock_service):
     vehicle_id = "123"
     vehicle = Vehicle(
@@ -70,6 +177,121 @@ def test_get_vehicle_api(mock_service):
     assert response.status_code == 200
     assert response.json()["id"] == vehicle_id
 
+def test_list_vehicles_orjson_api(mock_service):
+    vehicle = Vehicle(
+        id="123",
+        version=1,
+        placa="AA-123-BB",
+        numero_economico="100",
+        marca="Kenworth",
+        modelo="T680",
+        anno=2023,
+        tipo_vehiculo=VehicleType.TRACTOR_TRUCK,
+        capacidad_carga_kg=20000,
+        numero_serie="12345678901234567",
+        poliza_seguro="P-123",
+        vigencia_seguro="2025-12-31"
+    )
+    mock_service.list_vehicles.return_value = VehiclePage(items=[vehicle])
+
+    response = client.get("/api/v1/vehicles/")
+
+    assert response.status_code == 200
+    assert response.json() == [vehicle.model_dump(mode="json")]
+
+def test_get_vehicle_etag_api(mock_service):
+    vehicle = Vehicle(
+        id="123",
+        version=3,
+        placa="AA-123-BB",
+        numero_economico="100",
+        marca="Kenworth",
+        modelo="T680",
+        anno=2023,
+        tipo_vehiculo=VehicleType.TRACTOR_TRUCK,
+        capacidad_carga_kg=20000,
+        numero_serie="12345678901234567",
+        poliza_seguro="P-123",
+        vigencia_seguro="2025-12-31"
+    )
+    mock_service.get_vehicle.return_value = vehicle
+
+    response = client.get("/api/v1/vehicles/123")
+    assert response.headers["ETag"] == '"123-3"'
+
+    response = client.get("/api/v1/vehicles/123", headers={"If-None-Match": '"123-3"'})
+    assert response.status_code == 304
+    assert response.content == b""
+
+    response = client.get("/api/v1/vehicles/123", headers={"If-None-Match": '"123-2"'})
+    assert response.status_code == 200
+
+def test_list_vehicles_etag_api(mock_service):
+    mock_service.list_vehicles.return_value = VehiclePage(items=[])
+
+    etag = client.get("/api/v1/vehicles/").headers["ETag"]
+    response = client.get("/api/v1/vehicles/", headers={"If-None-Match": etag})
+
+    assert response.status_code == 304
+
+def test_update_vehicle_if_match_api(mock_service):
+    vehicle = Vehicle(
+        id="123",
+        version=4,
+        placa="AA-123-BB",
+        numero_economico="100",
+        marca="Kenworth",
+        modelo="T680",
+        anno=2023,
+        tipo_vehiculo=VehicleType.TRACTOR_TRUCK,
+        capacidad_carga_kg=20000,
+        numero_serie="12345678901234567",
+        poliza_seguro="P-123",
+        vigencia_seguro="2025-12-31"
+    )
+    mock_service.update_vehicle.return_value = vehicle
+
+    response = client.put("/api/v1/vehicles/123", json={"marca": "Kenworth"}, headers={"If-Match": '"123-3"'})
+
+    assert response.status_code == 200
+    assert response.headers["ETag"] == '"123-4"'
+    assert mock_service.update_vehicle.call_args.kwargs["if_match"] == '"123-3"'
+
+def test_list_vehicles_fields_api(mock_service):
+    mock_service.list_vehicle_fields.return_value = VehicleFieldsPage(
+        items=[{"id": "1", "version": 1, "placa": "AA-123-BB", "gps_id": "GPS-1", "estado_vehiculo": "ACTIVE"}]
+    )
+
+    response = client.get("/api/v1/vehicles/?fields=placa,gps_id,estado_vehiculo")
+
+    assert response.status_code == 200
+    assert response.json() == [
+        {"id": "1", "version": 1, "placa": "AA-123-BB", "gps_id": "GPS-1", "estado_vehiculo": "ACTIVE"}
+    ]
+    assert mock_service.list_vehicle_fields.call_args.args[0] == ["placa", "gps_id", "estado_vehiculo"]
+    mock_service.list_vehicles.assert_not_called()
+
+    etag = response.headers["ETag"]
+    response = client.get(
+        "/api/v1/vehicles/?fields=placa,gps_id,estado_vehiculo", headers={"If-None-Match": etag}
+    )
+    assert response.status_code == 304
+
+def test_get_vehicle_fields_api(mock_service):
+    mock_service.get_vehicle_fields.return_value = {"id": "1", "version": 2, "placa": "AA-123-BB"}
+
+    response = client.get("/api/v1/vehicles/1?fields=placa")
+
+    assert response.status_code == 200
+    assert response.json() == {"id": "1", "version": 2, "placa": "AA-123-BB"}
+    assert "ETag" in response.headers
+
+def test_unknown_fields_api(mock_service):
+    response = client.get("/api/v1/vehicles/?fields=placa,password")
+
+    assert response.status_code == 400
+    assert "password" in response.json()["error"]["message"]
+
 def test_get_vehicle_not_found(mock_service):
     from fastapi import HTTPException
     mock_service.get_vehicle.side_effect = HTTPException(status_code=404, detail="Vehicle not found")
@@ -80,13 +302,100 @@ def test_get_vehicle_not_found(mock_service):
     assert response.json()["error"]["message"] == "Vehicle not found"
 
 def test_list_vehicles_api(mock_service):
-    mock_service.list_vehicles.return_value = []
+    mock_service.list_vehicles.return_value = VehiclePage(items=[])
+    mock_service.count_vehicles.return_value = 42
     
     response = client.get("/api/v1/vehicles/?skip=0&limit=10")
     
     assert response.status_code == 200
     assert response.json() == []
-    mock_service.list_vehicles.assert_called_with(skip=0, limit=10)
+    assert "X-Next-Cursor" not in response.headers
+    assert response.headers["X-Total-Count"] == "42"
+    mock_service.count_vehicles.assert_called_with(VehicleFilters())
+    mock_service.list_vehicles.assert_called_with(
+        skip=0, limit=10, cursor=None, sort="_id", filters=VehicleFilters()
+    )
+
+def test_list_vehicles_cursor_api(mock_service):
+    mock_service.list_vehicles.return_value = VehiclePage(items=[], next_cursor="abc")
+
+    response = client.get("/api/v1/vehicles/?limit=10&cursor=xyz&order_by=fecha_alta")
+
+    assert response.status_code == 200
+    assert response.headers["X-Next-Cursor"] == "abc"
+    mock_service.list_vehicles.assert_called_with(
+        skip=0, limit=10, cursor="xyz", sort="fecha_alta", filters=VehicleFilters()
+    )
+
+def test_list_vehicles_filters_api(mock_service):
+    mock_service.list_vehicles.return_value = VehiclePage(items=[])
+
+    response = client.get(
+        "/api/v1/vehicles/?estado_vehiculo=ACTIVE&tipo_vehiculo=TRAILER&base_operativa=MTY"
+        "&marca=Utility&tipo_combustible=DIESEL&anno_min=2015&anno_max=2020&sort=-anno"
+    )
+
+    assert response.status_code == 200
+    kwargs = mock_service.list_vehicles.call_args.kwargs
+    assert kwargs["sort"] == "-anno"
+    assert kwargs["filters"].to_query() == {
+        "estado_vehiculo": "ACTIVE",
+        "tipo_vehiculo": "TRAILER",
+        "base_operativa": "MTY",
+        "marca": "Utility",
+        "tipo_combustible": "DIESEL",
+        "anno": {"$gte": 2015, "$lte": 2020},
+    }
+
+def test_list_vehicles_rejects_unknown_sort(mock_service):
+    response = client.get("/api/v1/vehicles/?sort=poliza_seguro")
+
+    assert response.status_code == 422
+
+def test_export_vehicles_api(mock_service):
+    async def chunks():
+        yield b'{"placa":"AA-123-BB"}\n'
+        yield b'{"placa":"CC-456-DD"}\n'
+    mock_service.export_vehicles.return_value = chunks()
+
+    response = client.get("/api/v1/vehicles/export?batch_size=50&validate=false")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert response.text.splitlines() == ['{"placa":"AA-123-BB"}', '{"placa":"CC-456-DD"}']
+    mock_service.export_vehicles.assert_called_with(batch_size=50, validate=False)
+
+def test_due_vehicles_api(mock_service):
+    async def chunks():
+        yield b'{"due":["insurance"]}\n'
+    mock_service.due_vehicles.return_value = chunks()
+
+    response = client.get("/api/v1/vehicles/due?insurance_within_days=30")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    mock_service.due_vehicles.assert_called_with(
+        insurance_within_days=30, inspection_older_than_days=None, batch_size=500
+    )
+
+def test_fleet_stats_api(mock_service):
+    stats = FleetStats(
+        total=2,
+        by_estado_vehiculo={"ACTIVE": 2},
+        by_tipo_vehiculo={"TRAILER": 2},
+        by_base_operativa={"MTY": 2},
+        capacidad_carga_kg_by_base={"MTY": 60000.0},
+    )
+    mock_service.get_stats.return_value = stats
+    mock_service.rebuild_stats.return_value = stats
+
+    response = client.get("/api/v1/vehicles/stats")
+    assert response.status_code == 200
+    assert response.json()["by_base_operativa"] == {"MTY": 2}
+
+    response = client.post("/api/v1/vehicles/stats/rebuild")
+    assert response.status_code == 200
+    mock_service.rebuild_stats.assert_awaited_once()
 
 def test_docs_endpoint():
     response = client.get("/docs")
@@ -0,0 +1,143 @@
+import asyncio
+from mongomock_motor import AsyncMongoMockClient
+from src.db.cache import VehicleCache, CountCache
+from src.db.repository import VehicleRepository
+from src.models.vehicle import Vehicle, VehicleCreate, VehicleUpdate, VehicleType, VehicleFilters, VehicleStatus
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def _vehicle(vehicle_id: str) -> Vehicle:
+    return Vehicle(
+        id=vehicle_id,
+        placa="AA-123-BB",
+        numero_economico=vehicle_id,
+        marca="Volvo",
+        modelo="VNL",
+        anno=2020,
+        tipo_vehiculo=VehicleType.TRACTOR_TRUCK,
+        capacidad_carga_kg=20000,
+        numero_serie="12345678901234567",
+        poliza_seguro="P-123",
+        vigencia_seguro="2025-01-01"
+    )
+
+def test_hit_and_miss_counters():
+    cache = VehicleCache(max_size=2, ttl_seconds=10, enabled=True)
+
+    assert cache.get("a") is None
+    cache.put("a", _vehicle("a"))
+    assert cache.get("a").id == "a"
+
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+def test_lru_eviction():
+    cache = VehicleCache(max_size=2, ttl_seconds=10, enabled=True)
+    cache.put("a", _vehicle("a"))
+    cache.put("b", _vehicle("b"))
+    cache.get("a")  # "b" is now the least recently used
+    cache.put("c", _vehicle("c"))
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["size"] == 2
+
+def test_ttl_expiry():
+    clock = FakeClock()
+    cache = VehicleCache(max_size=2, ttl_seconds=5, enabled=True, clock=clock)
+    cache.put("a", _vehicle("a"))
+
+    clock.now = 4.9
+    assert cache.get("a") is not None
+    clock.now = 5.0
+    assert cache.get("a") is None
+    assert cache.stats()["size"] == 0
+
+def test_invalidate_and_disabled():
+    cache = VehicleCache(max_size=2, ttl_seconds=5, enabled=True)
+    cache.put("a", _vehicle("a"))
+    cache.invalidate("a")
+    assert cache.get("a") is None
+
+    disabled = VehicleCache(enabled=False)
+    disabled.put("a", _vehicle("a"))
+    assert disabled.get("a") is None
+    assert disabled.stats()["size"] == 0
+
+def test_put_after_invalidate_is_dropped():
+    cache = VehicleCache(max_size=2, ttl_seconds=5, enabled=True)
+    generation = cache.generation("a")
+    cache.invalidate("a")
+    cache.put("a", _vehicle("a"), generation)
+    assert cache.get("a") is None
+    assert cache.stats()["stale_puts"] == 1
+
+    # Still detected once the invalidation itself has been forgotten
+    generation = cache.generation("a")
+    cache.invalidate("a")
+    cache.invalidate("b")
+    cache.invalidate("c")
+    cache.put("a", _vehicle("a"), generation)
+    assert cache.get("a") is None
+
+    cache.put("a", _vehicle("a"), cache.generation("a"))
+    assert cache.get("a") is not None
+
+async def test_read_racing_a_write_does_not_cache_the_old_vehicle():
+    repository = VehicleRepository(AsyncMongoMockClient().db, cache=VehicleCache(enabled=True))
+    created = await repository.create(VehicleCreate(
+        placa="RC-123-AA", numero_economico="RC-1", marca="OLD", modelo="VNL", anno=2020,
+        tipo_vehiculo=VehicleType.TRAILER, capacidad_carga_kg=20000, numero_serie="RC000000000000001",
+        poliza_seguro="P-1", vigencia_seguro="2030-01-01"
+    ))
+    find_one = repository.collection.find_one
+    loaded, release = asyncio.Event(), asyncio.Event()
+
+    async def held_find_one(*args, **kwargs):
+        doc = await find_one(*args, **kwargs)
+        loaded.set()
+        await release.wait()
+        return doc
+
+    repository.collection.find_one = held_find_one
+    read = asyncio.ensure_future(repository.get_by_id(created.id))
+    await loaded.wait()
+    repository.collection.find_one = find_one
+    await repository.update(created.id, VehicleUpdate(marca="NEW"))
+    release.set()
+
+    assert (await read).marca == "OLD"
+    assert (await repository.get_by_id(created.id)).marca == "NEW"
+
+def test_count_cache_expires_entries():
+    clock = FakeClock()
+    cache = CountCache(ttl_seconds=5, clock=clock)
+    cache.put(VehicleFilters(), 10)
+
+    assert cache.get(VehicleFilters()) == 10
+    clock.now = 6
+    assert cache.get(VehicleFilters()) is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+def test_count_cache_applies_changes_to_matching_filters():
+    cache = CountCache(ttl_seconds=60)
+    active = VehicleFilters(estado_vehiculo=VehicleStatus.ACTIVE)
+    old_models = VehicleFilters(anno_max=2015)
+    cache.put(VehicleFilters(), 10)
+    cache.put(active, 4)
+    cache.put(old_models, 3)
+
+    vehicle = _vehicle("a")
+    retired = vehicle.model_copy(update={"estado_vehiculo": VehicleStatus.OUT_OF_SERVICE})
+    cache.apply(added=[vehicle])
+    cache.apply(added=[retired], removed=[vehicle])
+
+    assert cache.get(VehicleFilters()) == 11
+    assert cache.get(active) == 4
+    assert cache.get(old_models) == 3
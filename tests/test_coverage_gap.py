@@ -1,14 +1,15 @@
 import pytest
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, AsyncMock, MagicMock
 from src.db.database import DatabaseManager, get_database
 from src.services.vehicle_service import VehicleService
-from src.models.vehicle import Vehicle, VehicleCreate, VehicleUpdate, VehicleType
+from src.models.vehicle import VehicleUpdate
 from fastapi import HTTPException
-from src.api.deps import get_repository, get_service
+from pymongo.errors import DuplicateKeyError
+from src.api.deps import get_repository, get_service, get_stats_repository
 
 # --- Database Manager Tests ---
 def test_database_manager_connect():
-    with patch("src.db.database.MongoClient") as mock_client:
+    with patch("src.db.database.AsyncIOMotorClient") as mock_client:
         DatabaseManager.client = None # Reset
         DatabaseManager.connect()
         mock_client.assert_called_once()
@@ -37,140 +38,92 @@ def test_dependencies():
     repo = get_repository(mock_db)
     assert repo.collection is not None
     
-    service = get_service(repo)
+    stats = get_stats_repository(mock_db)
+    service = get_service(repo, stats)
     assert service.repository is repo
+    assert service.stats is stats
     
 
 # --- Service Edge Case Tests ---
 @pytest.fixture
 def mock_repo():
-    return MagicMock()
+    return AsyncMock()
 
 @pytest.fixture
 def service(mock_repo):
     return VehicleService(mock_repo)
 
-def test_service_delete_not_found(service, mock_repo):
-    mock_repo.get_by_id.return_value = None
+async def test_service_delete_not_found(service, mock_repo):
+    mock_repo.delete.return_value = False
     with pytest.raises(HTTPException) as exc:
-        service.delete_vehicle("bad_id")
+        await service.delete_vehicle("bad_id")
     assert exc.value.status_code == 404
 
-def test_service_update_not_found(service, mock_repo):
-    mock_repo.get_by_id.return_value = None
+async def test_service_update_not_found(service, mock_repo):
+    mock_repo.update_with_previous.return_value = None
     with pytest.raises(HTTPException) as exc:
-        service.update_vehicle("bad_id", VehicleUpdate())
+        await service.update_vehicle("bad_id", VehicleUpdate())
     assert exc.value.status_code == 404
 
-def test_service_update_duplicate_placa(service, mock_repo):
-    # Original vehicle
-    mock_repo.get_by_id.return_value = Vehicle(
-        _id="123", 
-        placa="AA-100-AA", 
-        numero_economico="1", 
-        marca="Volvo", 
-        modelo="VNL", 
-        anno=2020, 
-        tipo_vehiculo=VehicleType.TRACTOR_TRUCK, 
-        capacidad_carga_kg=20000, 
-        numero_serie="12345678901234567", 
-        poliza_seguro="p", 
-        vigencia_seguro="2020-01-01"
-    )
-    # Existing other vehicle
-    mock_repo.get_by_field.return_value = Vehicle(
-        _id="456", 
-        placa="BB-200-BB", 
-        numero_economico="2", 
-        marca="Volvo", 
-        modelo="VNL", 
-        anno=2020, 
-        tipo_vehiculo=VehicleType.TRACTOR_TRUCK, 
-        capacidad_carga_kg=20000, 
-        numero_serie="12345678901234567", 
-        poliza_seguro="p", 
-        vigencia_seguro="2020-01-01"
+async def test_service_update_duplicate_placa(service, mock_repo):
+    # The unique index rejects the update
+    mock_repo.update_with_previous.side_effect = DuplicateKeyError(
+        "E11000 duplicate key error", 11000, {"keyPattern": {"placa": 1}}
     )
     
     with pytest.raises(HTTPException) as exc:
-        service.update_vehicle("123", VehicleUpdate(placa="BB-200-BB"))
+        await service.update_vehicle("123", VehicleUpdate(placa="BB-200-BB"))
     assert exc.value.status_code == 400
     assert "license plate already exists" in exc.value.detail
 
-def test_service_update_duplicate_economico(service, mock_repo):
-    mock_repo.get_by_id.return_value = Vehicle(
-        _id="123", 
-        placa="AA-100-AA", 
-        numero_economico="1", 
-        marca="Volvo", 
-        modelo="VNL", 
-        anno=2020, 
-        tipo_vehiculo=VehicleType.TRACTOR_TRUCK, 
-        capacidad_carga_kg=20000, 
-        numero_serie="12345678901234567", 
-        poliza_seguro="p", 
-        vigencia_seguro="2020-01-01"
-    )
-    mock_repo.get_by_field.return_value = Vehicle(
-        _id="456", 
-        placa="BB-200-BB", 
-        numero_economico="2", 
-        marca="Volvo", 
-        modelo="VNL", 
-        anno=2020, 
-        tipo_vehiculo=VehicleType.TRACTOR_TRUCK, 
-        capacidad_carga_kg=20000, 
-        numero_serie="12345678901234567", 
-        poliza_seguro="p", 
-        vigencia_seguro="2020-01-01"
+async def test_service_update_duplicate_economico(service, mock_repo):
+    mock_repo.update_with_previous.side_effect = DuplicateKeyError(
+        "E11000 duplicate key error", 11000, {"keyPattern": {"numero_economico": 1}}
     )
     
     with pytest.raises(HTTPException) as exc:
-        service.update_vehicle("123", VehicleUpdate(numero_economico="2"))
+        await service.update_vehicle("123", VehicleUpdate(numero_economico="2"))
     assert exc.value.status_code == 400
     assert "fleet number already exists" in exc.value.detail
 
-def test_service_get_not_found(service, mock_repo):
+async def test_service_update_duplicate_vin(service, mock_repo):
+    mock_repo.update_with_previous.side_effect = DuplicateKeyError(
+        "E11000 duplicate key error index: vehicles_db.vehicles.$numero_serie_1", 11000
+    )
+
+    with pytest.raises(HTTPException) as exc:
+        await service.update_vehicle("123", VehicleUpdate(numero_serie="X2345678901234567"))
+    assert exc.value.status_code == 400
+    assert "VIN" in exc.value.detail
+
+async def test_service_get_not_found(service, mock_repo):
     mock_repo.get_by_id.return_value = None
     with pytest.raises(HTTPException) as exc:
-        service.get_vehicle("bad_id")
+        await service.get_vehicle("bad_id")
     assert exc.value.status_code == 404
 
-def test_service_create_duplicate_economico(service, mock_repo):
+async def test_service_create_duplicate_economico(service, mock_repo):
     # Pass placa check
     mock_repo.get_by_field.side_effect = [None, True, None] # plaque ok, econ exists
     
     with pytest.raises(HTTPException) as exc:
-        service.create_vehicle(MagicMock(placa="AA-100-AA", numero_economico="e", numero_serie="s"))
+        await service.create_vehicle(MagicMock(placa="AA-100-AA", numero_economico="e", numero_serie="s"))
     assert exc.value.status_code == 400
     assert "fleet number" in exc.value.detail
 
-def test_service_create_duplicate_vin(service, mock_repo):
+async def test_service_create_duplicate_vin(service, mock_repo):
     # Pass placa, econ check
     mock_repo.get_by_field.side_effect = [None, None, True]
     
     with pytest.raises(HTTPException) as exc:
-        service.create_vehicle(MagicMock(placa="AA-100-AA", numero_economico="e", numero_serie="s"))
+        await service.create_vehicle(MagicMock(placa="AA-100-AA", numero_economico="e", numero_serie="s"))
     assert exc.value.status_code == 400
     assert "VIN" in exc.value.detail
 
-def test_service_update_fail_db(service, mock_repo):
-     mock_repo.get_by_id.return_value = Vehicle(
-        _id="123", 
-        placa="AA-100-AA", 
-        numero_economico="1", 
-        marca="Volvo", 
-        modelo="VNL", 
-        anno=2020, 
-        tipo_vehiculo=VehicleType.TRACTOR_TRUCK, 
-        capacidad_carga_kg=20000, 
-        numero_serie="12345678901234567", 
-        poliza_seguro="p", 
-        vigencia_seguro="2020-01-01"
-    )
-     mock_repo.get_by_field.return_value = None
-     mock_repo.update.return_value = None # DB Update failed for some reason
+async def test_service_update_fail_db(service, mock_repo):
+     mock_repo.update_with_previous.return_value = None # DB Update failed for some reason
      
      with pytest.raises(HTTPException) as exc:
-         service.update_vehicle("123", VehicleUpdate(placa="New"))
+         await service.update_vehicle("123", VehicleUpdate(placa="New"))
      assert exc.value.status_code == 404
+     mock_repo.get_by_id.assert_not_called()
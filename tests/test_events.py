@@ -0,0 +1,91 @@
+import pytest
+from unittest.mock import AsyncMock
+from src.models.vehicle import Vehicle, VehicleCreate, VehicleType
+from src.services.events import EventBus, SubscriberDropped, sse_stream
+from src.services.vehicle_service import VehicleService
+
+def _vehicle(i: int) -> Vehicle:
+    return Vehicle(
+        id=f"v{i}", version=1, placa=f"EV-{i:03d}-AA", numero_economico=f"EV-{i}", marca="Volvo",
+        modelo="VNL", anno=2020, tipo_vehiculo=VehicleType.TRAILER, capacidad_carga_kg=25000,
+        numero_serie=f"EV{i:015d}", poliza_seguro="P-1", vigencia_seguro="2030-01-01"
+    )
+
+async def test_publish_fans_out_to_every_subscriber():
+    bus = EventBus()
+    first, second = bus.subscribe(), bus.subscribe()
+
+    bus.publish("created", "v1", _vehicle(1))
+
+    for subscription in (first, second):
+        event = await subscription.next(timeout=1)
+        assert (event.type, event.vehicle_id) == ("created", "v1")
+    assert bus.stats()["subscribers"] == 2
+
+    first.close()
+    assert bus.stats()["subscribers"] == 1
+
+async def test_slow_subscriber_is_dropped():
+    bus = EventBus(queue_size=2)
+    slow, fast = bus.subscribe(), bus.subscribe()
+
+    for i in range(2):
+        bus.publish("updated", f"v{i}")
+        await fast.next(timeout=1)
+    bus.publish("updated", "v2")
+
+    assert slow.dropped
+    assert not fast.dropped
+    assert bus.stats()["dropped_subscribers"] == 1
+    with pytest.raises(SubscriberDropped):
+        await slow.next(timeout=1)
+
+async def test_resume_replays_missed_events():
+    bus = EventBus(history_size=3)
+    bus.publish("created", "v1")
+    first_id = bus._history[-1].id
+    bus.publish("updated", "v1")
+    bus.publish("deleted", "v1")
+
+    resumed = bus.subscribe(last_event_id=first_id)
+    replayed = [await resumed.next(timeout=1) for _ in range(2)]
+    assert [event.type for event in replayed] == ["updated", "deleted"]
+    assert await resumed.next(timeout=0.01) is None
+
+    # Too old for the history, or issued by another process
+    bus.publish("created", "v2")
+    bus.publish("created", "v3")
+    assert (await bus.subscribe(last_event_id=first_id).next()).type == "reset"
+    assert (await bus.subscribe(last_event_id="other-1").next()).type == "reset"
+
+async def test_sse_stream_format():
+    bus = EventBus()
+    subscription = bus.subscribe()
+    bus.publish("created", "v1", _vehicle(1))
+    stream = sse_stream(subscription, heartbeat_seconds=0.01)
+
+    assert await anext(stream) == b"retry: 2000\n\n"
+    chunk = (await anext(stream)).decode()
+    assert chunk.startswith(f"id: {bus.epoch}-1\nevent: created\ndata: {{")
+    assert '"vehicle_id":"v1"' in chunk
+    assert await anext(stream) == b": keepalive\n\n"
+
+    await stream.aclose()
+    assert bus.stats()["subscribers"] == 0
+
+async def test_service_publishes_changes():
+    bus = EventBus()
+    repository = AsyncMock()
+    service = VehicleService(repository, events=bus)
+    subscription = bus.subscribe()
+    vehicle = _vehicle(1)
+    repository.check_uniqueness.return_value = []
+    repository.create.return_value = vehicle
+    repository.delete.return_value = True
+
+    await service.create_vehicle(VehicleCreate(**vehicle.model_dump(exclude={"id", "version"})))
+    await service.delete_vehicle("v1")
+
+    created, deleted = await subscription.next(timeout=1), await subscription.next(timeout=1)
+    assert (created.type, created.vehicle.placa) == ("created", vehicle.placa)
+    assert (deleted.type, deleted.vehicle_id, deleted.vehicle) == ("deleted", "v1", None)
@@ -7,3 +7,10 @@ def test_health_check():
     response = client.get("/health")
     assert response.status_code == 200
     assert response.json() == {"status": "ok"}
+
+def test_diagnostics():
+    response = client.get("/diagnostics")
+    assert response.status_code == 200
+    body = response.json()
+    assert {"hits", "misses", "size"} <= set(body["vehicle_cache"])
+    assert {"in_use", "checkouts", "wait_time_avg_ms", "max_pool_size"} <= set(body["mongo_pool"])
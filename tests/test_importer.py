@@ -0,0 +1,101 @@
+import json
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+from src.db.repository import VehicleRepository
+from src.db.stats_repository import FleetStatsRepository
+from src.services.events import EventBus
+from src.services.importer import read_rows, validate_chunk
+from src.services.vehicle_service import VehicleService
+
+HEADER = "placa,numero_economico,marca,modelo,anno,tipo_vehiculo,capacidad_carga_kg,numero_serie,poliza_seguro,vigencia_seguro"
+
+def csv_row(i: int, placa: str = None) -> str:
+    return f"{placa or f'IM-{i:04d}'},E-{i},Volvo,VNL,2020,TRAILER,20000,IM{i:015d},P-1,2030-01-01"
+
+async def chunked(data: bytes, size: int = 7):
+    # Split records across chunks the way a network body arrives
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+async def collect(rows):
+    return [row async for row in rows]
+
+async def run_import(service, body: bytes, fmt: str, chunk_size: int = 2):
+    report = b"".join([chunk async for chunk in service.import_vehicles(read_rows(chunked(body), fmt), chunk_size)])
+    return [json.loads(line) for line in report.splitlines()]
+
+@pytest.fixture
+def service():
+    db = AsyncMongoMockClient().db
+    service = VehicleService(VehicleRepository(db), FleetStatsRepository(db), events=EventBus())
+    service.import_workers = 0
+    return service
+
+async def test_read_csv_rows_handles_quotes_and_blank_cells():
+    body = b'\xef\xbb\xbfplaca,marca,notas\r\nAB-123,,"two\nlines, ""quoted"""\r\n\r\nCD-456,Volvo,x,extra\n'
+
+    rows = await collect(read_rows(chunked(body), "csv"))
+
+    assert rows == [
+        (1, {"placa": "AB-123", "notas": 'two\nlines, "quoted"'}),
+        (2, "Row has 4 fields, the header has 3"),
+    ]
+
+async def test_read_ndjson_rows_reports_bad_lines():
+    body = b'{"placa": "AB-123"}\n\nnot json\n[1]'
+
+    rows = await collect(read_rows(chunked(body), "ndjson"))
+
+    assert rows[0] == (1, {"placa": "AB-123"})
+    assert rows[1][0] == 3 and rows[1][1].startswith("Invalid JSON")
+    assert rows[2] == (4, "Expected a JSON object")
+
+def test_validate_chunk_splits_valid_and_invalid_rows():
+    valid_row = dict(zip(HEADER.split(","), csv_row(1).split(",")))
+
+    valid, errors = validate_chunk([(1, valid_row), (2, {**valid_row, "placa": "bad"}), (3, "Invalid JSON")])
+
+    assert [number for number, _ in valid] == [1]
+    assert valid[0][1]["anno"] == 2020
+    assert errors[0][0] == 2 and "placa" in errors[0][1]
+    assert errors[1] == (3, "Invalid JSON")
+
+async def test_import_csv_inserts_valid_rows_and_reports_errors(service):
+    lines = [HEADER, csv_row(1), csv_row(2, placa="bad"), csv_row(3), csv_row(4, placa="IM-0001"), csv_row(5)]
+    await service.repository.create_indexes()
+    subscription = service.events.subscribe()
+
+    report = await run_import(service, "\n".join(lines).encode(), "csv")
+
+    assert report[:-1] == [
+        {"row": 2, "status": "error", "error": report[0]["error"]},
+        {"row": 4, "status": "error", "error": "Vehicle with this license plate already exists"},
+    ]
+    assert "placa" in report[0]["error"]
+    assert report[-1] == {"summary": {"rows": 5, "imported": 3, "failed": 2}}
+    assert await service.repository.collection.count_documents({}) == 3
+    assert (await service.get_stats()).total == 3
+    # One summary per inserted chunk of two rows, not one event per vehicle
+    events = [subscription.queue.get_nowait() for _ in range(subscription.queue.qsize())]
+    assert [(event.type, event.count) for event in events] == [("imported", 1), ("imported", 1), ("imported", 1)]
+
+async def test_large_import_does_not_drop_subscribers(service):
+    service.events = EventBus(queue_size=4)
+    subscription = service.events.subscribe()
+    rows = [dict(zip(HEADER.split(","), csv_row(i).split(","))) for i in range(50)]
+
+    await run_import(service, "\n".join(json.dumps(row) for row in rows).encode(), "ndjson", chunk_size=25)
+
+    assert not subscription.dropped
+    assert sum(subscription.queue.get_nowait().count for _ in range(subscription.queue.qsize())) == 50
+
+async def test_import_ndjson_with_process_pool(service):
+    service.import_workers = 2
+    rows = [dict(zip(HEADER.split(","), csv_row(i).split(","))) for i in range(10)]
+    body = "\n".join(json.dumps(row) for row in rows).encode()
+
+    report = await run_import(service, body, "ndjson", chunk_size=3)
+
+    assert report == [{"summary": {"rows": 10, "imported": 10, "failed": 0}}]
+    stored = await service.repository.get_by_field("placa", "IM-0009")
+    assert stored.version == 1
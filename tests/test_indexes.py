@@ -0,0 +1,77 @@
+import asyncio
+import time
+import pytest
+from fastapi.testclient import TestClient
+from mongomock_motor import AsyncMongoMockClient
+from unittest.mock import patch
+from src.main import app
+from src.db.database import DatabaseManager
+from src.db.indexes import IndexReconciler
+from src.db.repository import VehicleRepository, VEHICLE_INDEXES
+
+@pytest.fixture
+def mock_db():
+    return AsyncMongoMockClient().db
+
+async def test_reconcile_creates_only_missing_indexes(mock_db):
+    repo = VehicleRepository(mock_db)
+    await repo.collection.create_index("placa", unique=True)
+
+    created = await repo.create_indexes()
+
+    assert "placa_1" not in created
+    assert "marca_modelo_text" in created
+    assert len(created) == len(VEHICLE_INDEXES) - 1
+    # A restart finds everything in place and builds nothing
+    assert await repo.create_indexes() == []
+
+async def test_reconcile_reports_conflicting_options(mock_db):
+    await mock_db.vehicles.create_index("numero_serie")
+    reconciler = IndexReconciler(mock_db.vehicles, VEHICLE_INDEXES)
+
+    await reconciler.reconcile()
+
+    assert reconciler.conflicts == ["numero_serie_1"]
+    assert "numero_serie_1" not in reconciler.created
+    # The unique guard against duplicate VINs is missing: not ready
+    assert reconciler.status()["state"] == "failed"
+    assert "numero_serie_1" in reconciler.status()["error"]
+    assert not reconciler.ready
+
+async def test_extra_unique_constraint_is_only_reported(mock_db):
+    await mock_db.vehicles.create_index([("anno", 1), ("_id", 1)], unique=True)
+    reconciler = IndexReconciler(mock_db.vehicles, VEHICLE_INDEXES)
+
+    await reconciler.reconcile()
+
+    assert reconciler.conflicts == ["anno_1__id_1"]
+    assert reconciler.ready
+
+def test_cold_start_with_background_index_build(mock_db):
+    build_seconds = 0.5
+    create_index = mock_db.vehicles.create_index
+
+    async def slow_create_index(*args, **kwargs):
+        await asyncio.sleep(build_seconds)
+        return await create_index(*args, **kwargs)
+
+    with patch.object(DatabaseManager, "connect"), patch.object(DatabaseManager, "close"), \
+            patch.object(DatabaseManager, "get_db", return_value=mock_db), \
+            patch.object(IndexReconciler, "mode", "background"), \
+            patch.object(type(mock_db.vehicles), "create_index", side_effect=slow_create_index, autospec=False):
+        started = time.perf_counter()
+        with TestClient(app) as client:
+            startup_seconds = time.perf_counter() - started
+            assert client.get("/health").json() == {"status": "ok"}
+            assert client.get("/health/ready").status_code == 503
+
+            deadline = time.perf_counter() + 10
+            while client.get("/health/ready").status_code != 200 and time.perf_counter() < deadline:
+                time.sleep(0.05)
+            ready = client.get("/health/ready")
+
+    # Serving started without waiting for the index build
+    assert startup_seconds < build_seconds
+    assert ready.status_code == 200
+    assert ready.json()["indexes"]["state"] == "ready"
+    assert len(ready.json()["indexes"]["created"]) == len(VEHICLE_INDEXES)
@@ -0,0 +1,54 @@
+from types import SimpleNamespace
+from fastapi.testclient import TestClient
+from src.main import app
+from src.metrics import Histogram, Gauge, mongo_command_duration
+from src.db.command_monitor import CommandMonitor
+
+client = TestClient(app)
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("test_latency_seconds", "Test latency", ("route",), buckets=(0.1, 1.0))
+    histogram.observe(("/a",), 0.05)
+    histogram.observe(("/a",), 0.5)
+    histogram.observe(("/a",), 5)
+
+    lines = histogram.render()
+
+    assert 'test_latency_seconds_bucket{route="/a",le="0.1"} 1' in lines
+    assert 'test_latency_seconds_bucket{route="/a",le="1.0"} 2' in lines
+    assert 'test_latency_seconds_bucket{route="/a",le="+Inf"} 3' in lines
+    assert 'test_latency_seconds_count{route="/a"} 3' in lines
+    assert 'test_latency_seconds_sum{route="/a"} 5.55' in lines
+
+def test_gauge_labels_are_escaped():
+    gauge = Gauge("test_in_flight", "Test gauge", ("route",))
+    gauge.inc(('/a"b',))
+    gauge.inc(('/a"b',))
+    gauge.dec(('/a"b',))
+
+    assert gauge.render()[-1] == 'test_in_flight{route="/a\\"b"} 1'
+
+def test_command_monitor_records_durations():
+    monitor = CommandMonitor()
+    before = mongo_command_duration.count(("find", "success"))
+
+    monitor.succeeded(SimpleNamespace(command_name="find", duration_micros=1500))
+    monitor.failed(SimpleNamespace(command_name="insert", duration_micros=300))
+
+    assert mongo_command_duration.count(("find", "success")) == before + 1
+    assert mongo_command_duration.count(("insert", "failure")) >= 1
+
+def test_metrics_endpoint_uses_route_templates():
+    client.get("/health")
+    client.get("/api/v1/vehicles/not-an-id")
+
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    body = response.text
+    assert 'http_request_duration_seconds_count{method="GET",route="/health",status="200"}' in body
+    assert 'route="/api/v1/vehicles/{vehicle_id}"' in body
+    assert "not-an-id" not in body
+    assert 'http_requests_in_flight{method="GET"} 1' in body
+    assert "vehicle_cache_hits_total" in body
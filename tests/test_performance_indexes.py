@@ -1,19 +1,19 @@
 import pytest
-from mongomock import MongoClient
+from mongomock_motor import AsyncMongoMockClient
 from src.db.repository import VehicleRepository
 
 @pytest.fixture
 def mock_db():
-    client = MongoClient()
+    client = AsyncMongoMockClient()
     return client.db
 
-def test_indexes_are_created(mock_db):
+async def test_indexes_are_created(mock_db):
     repo = VehicleRepository(mock_db)
 
     # This method is expected to be added
-    repo.create_indexes()
+    await repo.create_indexes()
 
-    indexes = repo.collection.index_information()
+    indexes = await repo.collection.index_information()
 
     # Check for 'placa' index
     # index_information returns a dict where keys are index names and values are index details
@@ -0,0 +1,52 @@
+from types import SimpleNamespace
+from unittest.mock import patch
+from src.db.database import DatabaseManager
+from src.db.pool_monitor import PoolMonitor
+
+def _event():
+    return SimpleNamespace(address=("localhost", 27017), connection_id=1, reason="timeout")
+
+def test_pool_monitor_tracks_checkouts():
+    monitor = PoolMonitor()
+    monitor.connection_created(_event())
+    monitor.connection_created(_event())
+    monitor.connection_check_out_started(_event())
+    assert monitor.snapshot()["waiting"] == 1
+    monitor.connection_checked_out(_event())
+
+    snapshot = monitor.snapshot()
+    assert snapshot["connections"] == 2
+    assert snapshot["in_use"] == 1
+    assert snapshot["waiting"] == 0
+    assert snapshot["checkouts"] == 1
+    assert snapshot["wait_time_max_ms"] >= snapshot["wait_time_avg_ms"] >= 0
+
+    monitor.connection_checked_in(_event())
+    monitor.connection_closed(_event())
+    snapshot = monitor.snapshot()
+    assert snapshot["in_use"] == 0
+    assert snapshot["connections"] == 1
+
+def test_pool_monitor_tracks_failures_and_clears():
+    monitor = PoolMonitor()
+    monitor.connection_check_out_started(_event())
+    monitor.connection_check_out_failed(_event())
+    monitor.pool_cleared(_event())
+
+    snapshot = monitor.snapshot()
+    assert snapshot["checkout_failures"] == 1
+    assert snapshot["checkouts"] == 0
+    assert snapshot["waiting"] == 0
+    assert snapshot["pool_clears"] == 1
+
+def test_connect_passes_pool_options():
+    with patch("src.db.database.AsyncIOMotorClient") as mock_client, \
+         patch.multiple(DatabaseManager, max_pool_size=20, wait_queue_timeout_ms=500, compressors="zstd,zlib"):
+        DatabaseManager.connect()
+        kwargs = mock_client.call_args.kwargs
+        assert kwargs["maxPoolSize"] == 20
+        assert kwargs["waitQueueTimeoutMS"] == 500
+        assert kwargs["compressors"] == "zstd,zlib"
+        assert "maxIdleTimeMS" not in kwargs
+        assert len(kwargs["event_listeners"]) == 2
+    DatabaseManager.client = None
@@ -0,0 +1,130 @@
+import os
+from datetime import datetime, timedelta
+import pytest
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import MongoClient
+from pymongo.errors import ServerSelectionTimeoutError
+from src.db.repository import VehicleRepository, build_list_query
+from src.db.pagination import KEYSET_SORT_FIELDS, keyset_sort
+from src.models.vehicle import VehicleFilters, VehicleStatus, VehicleType, FuelType
+
+# mongomock has no query planner, so these checks need a real MongoDB
+MONGODB_URL = os.getenv("MONGODB_URL", "mongodb://localhost:27017")
+
+def _mongo_available() -> bool:
+    client = MongoClient(MONGODB_URL, serverSelectionTimeoutMS=500)
+    try:
+        client.admin.command("ping")
+        return True
+    except ServerSelectionTimeoutError:
+        return False
+    finally:
+        client.close()
+
+pytestmark = pytest.mark.skipif(not _mongo_available(), reason="explain() checks need a running MongoDB")
+
+# Filter, sort and the index that must serve both without an in-memory SORT
+COMMON_FILTERS = [
+    (VehicleFilters(estado_vehiculo=VehicleStatus.ACTIVE), "_id", "estado_vehiculo_1__id_1"),
+    (VehicleFilters(estado_vehiculo=VehicleStatus.ACTIVE, tipo_vehiculo=VehicleType.TRAILER), "_id",
+     "estado_vehiculo_1_tipo_vehiculo_1__id_1_anno_1"),
+    (VehicleFilters(tipo_vehiculo=VehicleType.TRAILER, anno_min=2015), "_id", "tipo_vehiculo_1__id_1_anno_1"),
+    (VehicleFilters(base_operativa="MTY", estado_vehiculo=VehicleStatus.ACTIVE), "_id",
+     "base_operativa_1_estado_vehiculo_1__id_1"),
+    (VehicleFilters(marca="Kenworth", anno_min=2015, anno_max=2020), "_id", "marca_1__id_1_anno_1"),
+    (VehicleFilters(tipo_combustible=FuelType.DIESEL), "_id", "tipo_combustible_1__id_1"),
+    (VehicleFilters(anno_min=2015), "-anno", "anno_1__id_1"),
+]
+
+# Every whitelisted sort key, unfiltered, and the index that orders it
+SORT_INDEX_NAMES = {
+    "_id": "_id_",
+    "fecha_alta": "fecha_alta_1__id_1",
+    "anno": "anno_1__id_1",
+    "placa": "placa_1",
+    "numero_economico": "numero_economico_1",
+    "capacidad_carga_kg": "capacidad_carga_kg_1__id_1",
+}
+
+@pytest.fixture
+async def repository():
+    client = AsyncIOMotorClient(MONGODB_URL)
+    db = client["vehicles_query_plans_test"]
+    repo = VehicleRepository(db)
+    await repo.collection.drop()
+    await repo.create_indexes()
+    await repo.collection.insert_many([
+        {
+            "placa": f"QP-{i:05d}", "numero_economico": f"QP-{i}", "numero_serie": f"QP{i:015d}",
+            "marca": ["Kenworth", "Volvo"][i % 2], "anno": 2010 + i % 12,
+            # Selective filters, so no plain `_id` walk ties with the filter's index
+            "estado_vehiculo": list(VehicleStatus)[i % 3].value, "tipo_vehiculo": ["TRAILER", "DOLLY"][i % 2],
+            "tipo_combustible": list(FuelType)[i % 3].value,
+            "base_operativa": ["MTY", "GDL"][i % 2], "capacidad_carga_kg": 1000.0 * (i % 30),
+            "fecha_alta": datetime(2024, 1, 1) + timedelta(hours=i),
+        }
+        for i in range(500)
+    ])
+    yield repo
+    await client.drop_database(db.name)
+    client.close()
+
+def _stages(plan) -> list:
+    if isinstance(plan, dict):
+        found = [plan] if "stage" in plan else []
+        for value in plan.values():
+            found.extend(_stages(value))
+        return found
+    if isinstance(plan, list):
+        return [stage for item in plan for stage in _stages(item)]
+    return []
+
+async def _assert_served_by(repository, query: dict, sort: list, index_name: str):
+    explain = await repository.collection.find(query).sort(sort).limit(100).explain()
+    stages = _stages(explain["queryPlanner"]["winningPlan"])
+    names = [stage["stage"] for stage in stages]
+    assert "COLLSCAN" not in names
+    assert "SORT" not in names
+    assert [stage.get("indexName") for stage in stages if stage["stage"] == "IXSCAN"] == [index_name]
+
+@pytest.mark.parametrize("filters,sort,index_name", COMMON_FILTERS)
+async def test_list_filters_use_their_index(repository, filters, sort, index_name):
+    await _assert_served_by(repository, build_list_query(filters, sort, None), keyset_sort(sort), index_name)
+
+def test_every_sort_field_has_an_index():
+    assert set(SORT_INDEX_NAMES) == set(KEYSET_SORT_FIELDS)
+
+@pytest.mark.parametrize("sort", [*SORT_INDEX_NAMES, *(f"-{field}" for field in SORT_INDEX_NAMES)])
+async def test_sorts_are_served_by_an_index(repository, sort):
+    await _assert_served_by(repository, {}, keyset_sort(sort), SORT_INDEX_NAMES[sort.lstrip("-")])
+
+async def test_due_queries_use_date_indexes(repository):
+    from datetime import datetime
+    cutoff = datetime(2030, 1, 1)
+    for query, sort in (
+        ({"vigencia_seguro": {"$lte": cutoff}}, [("vigencia_seguro", 1), ("_id", 1)]),
+        (
+            {"$or": [{"ultima_verificacion": {"$lt": cutoff}}, {"ultima_verificacion": None}]},
+            [("ultima_verificacion", 1), ("_id", 1)],
+        ),
+    ):
+        explain = await repository.collection.find(query).sort(sort).explain()
+        stages = [stage["stage"] for stage in _stages(explain["queryPlanner"]["winningPlan"])]
+        assert "COLLSCAN" not in stages
+        assert "SORT" not in stages
+
+@pytest.mark.parametrize("field", ["placa", "numero_economico", "numero_serie"])
+async def test_prefix_search_is_an_index_range_scan(repository, field):
+    import re
+    query = {field: re.compile("^QP-00")}
+    explain = await repository.collection.find(query).sort(field, 1).limit(10).explain()
+
+    stages = [stage["stage"] for stage in _stages(explain["queryPlanner"]["winningPlan"])]
+    assert "IXSCAN" in stages
+    assert "COLLSCAN" not in stages
+    assert "SORT" not in stages
+
+async def test_text_search_uses_text_index(repository):
+    results = await repository.text_search("kenworth", limit=5)
+    assert len(results) == 5
+    assert all(vehicle.marca == "Kenworth" for vehicle, _ in results)
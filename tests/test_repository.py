@@ -1,18 +1,20 @@
+from bson import ObjectId
 import pytest
-from mongomock import MongoClient
+from mongomock_motor import AsyncMongoMockClient
 from src.db.repository import VehicleRepository
-from src.models.vehicle import VehicleCreate, VehicleUpdate, VehicleType
+from src.db.cache import VehicleCache
+from src.models.vehicle import VehicleCreate, VehicleUpdate, VehicleType, VehicleFilters, VehicleStatus
 
 @pytest.fixture
 def mock_db():
-    client = MongoClient()
+    client = AsyncMongoMockClient()
     return client.db
 
 @pytest.fixture
 def repository(mock_db):
     return VehicleRepository(mock_db)
 
-def test_create_vehicle(repository):
+async def test_create_vehicle(repository):
     vehicle_in = VehicleCreate(
         placa="AB-123-CD",
         numero_economico="001",
@@ -25,11 +27,11 @@ def test_create_vehicle(repository):
         poliza_seguro="INS-001",
         vigencia_seguro="2025-01-01"
     )
-    created = repository.create(vehicle_in)
+    created = await repository.create(vehicle_in)
     assert created.id is not None
     assert created.placa == "AB-123-CD"
 
-def test_get_vehicle(repository):
+async def test_get_vehicle(repository):
     vehicle_in = VehicleCreate(
         placa="XY-999-ZZ",
         numero_economico="002",
@@ -42,13 +44,13 @@ def test_get_vehicle(repository):
         poliza_seguro="INS-002",
         vigencia_seguro="2026-01-01"
     )
-    created = repository.create(vehicle_in)
+    created = await repository.create(vehicle_in)
     
-    fetched = repository.get_by_id(str(created.id))
+    fetched = await repository.get_by_id(str(created.id))
     assert fetched is not None
     assert fetched.numero_economico == "002"
 
-def test_update_vehicle(repository):
+async def test_update_vehicle(repository):
     # Setup
     vehicle_in = VehicleCreate(
         placa="UP-000-DT",
@@ -62,17 +64,29 @@ def test_update_vehicle(repository):
         poliza_seguro="INS-003",
         vigencia_seguro="2025-06-01"
     )
-    created = repository.create(vehicle_in)
+    created = await repository.create(vehicle_in)
 
     # Update
     update_data = VehicleUpdate(numero_economico="003-UPDATED")
-    updated = repository.update(str(created.id), update_data)
+    updated = await repository.update(str(created.id), update_data)
     
     assert updated is not None
     assert updated.numero_economico == "003-UPDATED"
     assert updated.placa == "UP-000-DT" # Unchanged
 
-def test_delete_vehicle(repository):
+async def test_empty_update_checks_expected_version(repository):
+    created = await repository.create(VehicleCreate(
+        placa="EV-000-DT", numero_economico="EV-1", marca="Volvo", modelo="VNL", anno=2021,
+        tipo_vehiculo=VehicleType.TRACTOR_TRUCK, capacidad_carga_kg=22000, numero_serie="E2345678901234567",
+        poliza_seguro="INS-EV", vigencia_seguro="2025-06-01"
+    ))
+    await repository.update(created.id, VehicleUpdate(marca="Kenworth"))
+
+    assert await repository.update_with_previous(created.id, VehicleUpdate(), expected_version=1) is None
+    before, after = await repository.update_with_previous(created.id, VehicleUpdate(), expected_version=2)
+    assert before.version == after.version == 2
+
+async def test_delete_vehicle(repository):
     vehicle_in = VehicleCreate(
         placa="DL-000-TE",
         numero_economico="004",
@@ -85,15 +99,15 @@ def test_delete_vehicle(repository):
         poliza_seguro="INS-004",
         vigencia_seguro="2024-12-31"
     )
-    created = repository.create(vehicle_in)
+    created = await repository.create(vehicle_in)
     
-    result = repository.delete(str(created.id))
+    result = await repository.delete(str(created.id))
     assert result is True
     
-    fetched = repository.get_by_id(str(created.id))
+    fetched = await repository.get_by_id(str(created.id))
     assert fetched is None
 
-def test_check_uniqueness(repository):
+async def test_check_uniqueness(repository):
     # Create 2 vehicles
     v1 = VehicleCreate(
         placa="AA-111-AA",
@@ -107,7 +121,7 @@ def test_check_uniqueness(repository):
         poliza_seguro="INS-001",
         vigencia_seguro="2025-01-01"
     )
-    repository.create(v1)
+    await repository.create(v1)
 
     v2 = VehicleCreate(
         placa="BB-222-BB",
@@ -121,18 +135,255 @@ def test_check_uniqueness(repository):
         poliza_seguro="INS-002",
         vigencia_seguro="2025-01-01"
     )
-    repository.create(v2)
+    await repository.create(v2)
 
     # Check for conflict with v1's placa
-    conflicts = repository.check_uniqueness("AA-111-AA", "NEW-ECO", "NEW-VIN")
+    conflicts = await repository.check_uniqueness("AA-111-AA", "NEW-ECO", "NEW-VIN")
     assert len(conflicts) == 1
     assert conflicts[0].placa == "AA-111-AA"
 
     # Check for conflict with v2's fleet number
-    conflicts = repository.check_uniqueness("NEW-PLACA", "202", "NEW-VIN")
+    conflicts = await repository.check_uniqueness("NEW-PLACA", "202", "NEW-VIN")
     assert len(conflicts) == 1
     assert conflicts[0].numero_economico == "202"
 
     # Check for conflict with both (matches v1 and v2)
-    conflicts = repository.check_uniqueness("AA-111-AA", "202", "NEW-VIN")
+    conflicts = await repository.check_uniqueness("AA-111-AA", "202", "NEW-VIN")
     assert len(conflicts) == 2
+
+async def _seed(repository, count):
+    for i in range(count):
+        await repository.create(VehicleCreate(
+            placa=f"PG-{i:03d}-AA",
+            numero_economico=f"PG-{i}",
+            marca="Volvo",
+            modelo="VNL",
+            anno=2020,
+            tipo_vehiculo=VehicleType.TRAILER,
+            capacidad_carga_kg=25000,
+            numero_serie=f"PG{i:015d}",
+            poliza_seguro="INS-PG",
+            vigencia_seguro="2025-01-01"
+        ))
+
+@pytest.mark.parametrize("sort", ["_id", "fecha_alta", "placa", "numero_economico", "capacidad_carga_kg"])
+async def test_list_cursor_pagination(repository, sort):
+    await _seed(repository, 5)
+
+    seen = []
+    page = await repository.list(limit=2, sort=sort)
+    while True:
+        seen.extend(v.numero_economico for v in page.items)
+        if page.next_cursor is None:
+            break
+        page = await repository.list(limit=2, cursor=page.next_cursor, sort=sort)
+
+    assert seen == [f"PG-{i}" for i in range(5)]
+
+async def test_list_skip_matches_cursor(repository):
+    await _seed(repository, 4)
+
+    first = await repository.list(limit=2)
+    by_cursor = await repository.list(limit=2, cursor=first.next_cursor)
+    by_skip = await repository.list(skip=2, limit=2)
+
+    assert [v.id for v in by_cursor.items] == [v.id for v in by_skip.items]
+
+async def test_list_trusted_read_matches_validated(repository):
+    await _seed(repository, 2)
+
+    page = await repository.list(limit=2)
+    raw = await repository.collection.find().sort("_id", 1).to_list(length=2)
+
+    from src.models.vehicle import Vehicle
+    for vehicle, doc in zip(page.items, raw):
+        assert vehicle.model_dump() == Vehicle(**doc).model_dump()
+
+async def test_create_duplicate_rejected_by_index(repository):
+    from pymongo.errors import DuplicateKeyError
+    from src.db.repository import duplicate_key_field
+    await repository.create_indexes()
+    await _seed(repository, 1)
+
+    duplicate = VehicleCreate(
+        placa="PG-999-AA", numero_economico="PG-0", marca="Volvo", modelo="VNL", anno=2020,
+        tipo_vehiculo=VehicleType.TRAILER, capacidad_carga_kg=25000, numero_serie=f"PG{9:015d}",
+        poliza_seguro="INS-PG", vigencia_seguro="2025-01-01"
+    )
+    with pytest.raises(DuplicateKeyError) as exc:
+        await repository.create(duplicate)
+    assert duplicate_key_field(exc.value.details) == "numero_economico"
+
+async def test_update_with_previous_and_delete_returning(repository):
+    from pymongo.errors import DuplicateKeyError
+    await repository.create_indexes()
+    await _seed(repository, 2)
+    first, second = (await repository.list()).items
+
+    previous, updated = await repository.update_with_previous(first.id, VehicleUpdate(marca="Kenworth"))
+    assert (previous.marca, previous.version) == ("Volvo", 1)
+    assert (updated.marca, updated.version) == ("Kenworth", 2)
+    assert updated.model_dump() == (await repository.get_by_id(first.id)).model_dump()
+
+    # A clashing VIN is rejected by the unique index
+    with pytest.raises(DuplicateKeyError):
+        await repository.update_with_previous(first.id, VehicleUpdate(numero_serie=second.numero_serie))
+
+    removed = await repository.delete_returning(first.id)
+    assert removed.id == first.id
+    assert await repository.delete_returning(first.id) is None
+
+async def test_bulk_update(repository):
+    await repository.create_indexes()
+    await _seed(repository, 3)
+    first, second, third = (await repository.list()).items
+    # Another writer bumps the third vehicle between the read and the write
+    await repository.collection.update_one({"_id": ObjectId(third.id)}, {"$set": {"version": 5}})
+
+    results, errors = await repository.bulk_update([
+        (first.id, VehicleUpdate(estado_vehiculo=VehicleStatus.IN_MAINTENANCE)),
+        (second.id, VehicleUpdate(placa=first.placa)),
+        (str(ObjectId()), VehicleUpdate(marca="Kenworth")),
+        ("not-an-id", VehicleUpdate(marca="Kenworth")),
+    ])
+
+    previous, updated = results[0]
+    assert previous.estado_vehiculo == VehicleStatus.ACTIVE
+    assert (updated.estado_vehiculo, updated.version) == (VehicleStatus.IN_MAINTENANCE, 2)
+    assert results[1:] == [None, None, None]
+    assert list(errors) == [1]
+    stored = await repository.get_by_id(first.id)
+    assert stored.estado_vehiculo == VehicleStatus.IN_MAINTENANCE
+
+async def test_prefix_search(repository):
+    await repository.create_indexes()
+    await _seed(repository, 12)
+
+    by_plate = await repository.prefix_search("placa", "pg-01", limit=5)
+    assert [v.placa for v in by_plate] == ["PG-010-AA", "PG-011-AA"]
+
+    by_fleet_number = await repository.prefix_search("numero_economico", "PG-1", limit=2)
+    assert [v.numero_economico for v in by_fleet_number] == ["PG-1", "PG-10"]
+
+    # Regex metacharacters in the term are matched literally
+    assert await repository.prefix_search("placa", "PG.", limit=5) == []
+
+    # Keys are stored uppercased, so mixed-case input is found in any case
+    created = await repository.create(VehicleCreate(
+        placa="MX-001-AA", numero_economico="Fleet-001", marca="Volvo", modelo="VNL", anno=2020,
+        tipo_vehiculo=VehicleType.TRAILER, capacidad_carga_kg=25000, numero_serie="1m8gdm9a0kp042788",
+        poliza_seguro="INS-PG", vigencia_seguro="2025-01-01"
+    ))
+    assert (created.numero_economico, created.numero_serie) == ("FLEET-001", "1M8GDM9A0KP042788")
+    assert [v.id for v in await repository.prefix_search("numero_economico", "fleet", limit=5)] == [created.id]
+    assert [v.id for v in await repository.prefix_search("numero_serie", "1m8g", limit=5)] == [created.id]
+
+async def test_count(repository):
+    await _seed(repository, 3)
+
+    assert await repository.count() == 3
+    assert await repository.count(VehicleFilters(anno_min=2020, marca="Volvo")) == 3
+    assert await repository.count(VehicleFilters(estado_vehiculo=VehicleStatus.IN_MAINTENANCE)) == 0
+
+async def test_list_invalid_cursor(repository):
+    from src.db.pagination import InvalidCursorError
+    with pytest.raises(InvalidCursorError):
+        await repository.list(cursor="not-a-cursor")
+
+    await _seed(repository, 2)
+    page = await repository.list(limit=1)
+    with pytest.raises(InvalidCursorError):
+        await repository.list(cursor=page.next_cursor, sort="fecha_alta")
+
+async def test_find_conflicts_and_create_many(repository):
+    await repository.create_indexes()
+    await _seed(repository, 2)
+
+    batch = [
+        VehicleCreate(
+            placa=f"BK-{i:03d}-AA", numero_economico=f"BK-{i}", marca="Utility", modelo="3000R",
+            anno=2021, tipo_vehiculo=VehicleType.TRAILER, capacidad_carga_kg=30000,
+            numero_serie=f"BK{i:015d}", poliza_seguro="INS-BK", vigencia_seguro="2026-01-01"
+        )
+        for i in range(3)
+    ]
+    batch[1] = batch[1].model_copy(update={"placa": "PG-001-AA"})
+
+    conflicts = await repository.find_conflicts(batch)
+    assert [c["placa"] for c in conflicts] == ["PG-001-AA"]
+
+    created, errors = await repository.create_many(batch)
+    assert created[0].placa == "BK-000-AA"
+    assert created[1] is None
+    assert created[2].id is not None
+    assert list(errors) == [1]
+
+async def test_stream(repository):
+    await _seed(repository, 5)
+
+    docs = [doc async for doc in repository.stream(batch_size=2)]
+
+    assert [doc["numero_economico"] for doc in docs] == [f"PG-{i}" for i in range(5)]
+
+async def test_get_by_id_cache_invalidation(mock_db):
+    cache = VehicleCache(max_size=10, ttl_seconds=60, enabled=True)
+    repository = VehicleRepository(mock_db, cache=cache)
+    await _seed(repository, 1)
+    vehicle_id = (await repository.list(limit=1)).items[0].id
+
+    await repository.get_by_id(vehicle_id)
+    await repository.get_by_id(vehicle_id)
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    await repository.update(vehicle_id, VehicleUpdate(marca="Kenworth"))
+    assert (await repository.get_by_id(vehicle_id)).marca == "Kenworth"
+    assert cache.misses == 2
+
+    await repository.delete(vehicle_id)
+    assert await repository.get_by_id(vehicle_id) is None
+
+async def test_update_versioning(repository):
+    await _seed(repository, 1)
+    vehicle = (await repository.list(limit=1)).items[0]
+    assert vehicle.version == 1
+
+    updated = await repository.update(vehicle.id, VehicleUpdate(marca="Kenworth"), expected_version=1)
+    assert updated.version == 2
+
+    stale = await repository.update(vehicle.id, VehicleUpdate(marca="Volvo"), expected_version=1)
+    assert stale is None
+    assert (await repository.get_by_id(vehicle.id)).marca == "Kenworth"
+
+async def test_sparse_fieldsets(repository):
+    await _seed(repository, 3)
+
+    page = await repository.list_fields(["placa", "estado_vehiculo"], limit=2, sort="fecha_alta")
+    assert page.items[0].keys() == {"id", "version", "placa", "estado_vehiculo"}
+    assert page.next_cursor is not None
+
+    rest = await repository.list_fields(
+        ["placa", "estado_vehiculo"], limit=2, cursor=page.next_cursor, sort="fecha_alta"
+    )
+    assert [item["placa"] for item in rest.items] == ["PG-002-AA"]
+
+    fetched = await repository.get_fields_by_id(page.items[0]["id"], ["vigencia_seguro"])
+    assert str(fetched["vigencia_seguro"]) == "2025-01-01"
+    assert await repository.get_fields_by_id("bad-id", ["placa"]) is None
+
+async def test_list_filters_and_descending_sort(repository):
+    await _seed(repository, 6)
+    for i in range(6):
+        vehicle = (await repository.list(skip=i, limit=1)).items[0]
+        await repository.update(vehicle.id, VehicleUpdate(
+            anno=2010 + i,
+            estado_vehiculo=VehicleStatus.IN_MAINTENANCE if i % 2 else VehicleStatus.ACTIVE
+        ))
+
+    filters = VehicleFilters(estado_vehiculo=VehicleStatus.ACTIVE, anno_min=2011)
+    page = await repository.list(limit=1, sort="-anno", filters=filters)
+    seen = [v.anno for v in page.items]
+    while page.next_cursor:
+        page = await repository.list(limit=1, cursor=page.next_cursor, sort="-anno", filters=filters)
+        seen.extend(v.anno for v in page.items)
+
+    assert seen == [2014, 2012]
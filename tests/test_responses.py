@@ -0,0 +1,112 @@
+import bson
+import msgpack
+import pytest
+from fastapi.testclient import TestClient
+from src.main import app
+from src.api.compression import choose_encoding
+from src.api.responses import BSONResponse, MsgPackResponse, ORJSONResponse, negotiate
+from src.models.vehicle import Vehicle, VehiclePage, VehicleType
+from src.services.etag import etag_version
+
+client = TestClient(app)
+
+pytestmark = pytest.mark.usefixtures("mock_db_connection")
+
+def _vehicles(count: int):
+    return [
+        Vehicle(
+            id=f"{i:024x}", version=1, placa=f"NG-{i:03d}-AA", numero_economico=str(i), marca="Volvo",
+            modelo="VNL", anno=2020, tipo_vehiculo=VehicleType.TRAILER, capacidad_carga_kg=20000,
+            numero_serie=f"NG{i:015d}", poliza_seguro="P-1", vigencia_seguro="2030-01-01"
+        )
+        for i in range(count)
+    ]
+
+@pytest.mark.parametrize("accept, expected", [
+    (None, ORJSONResponse),
+    ("*/*", ORJSONResponse),
+    ("text/html", ORJSONResponse),
+    ("application/msgpack", MsgPackResponse),
+    ("application/json;q=0.5, application/x-msgpack", MsgPackResponse),
+    ("application/bson;q=0.9, application/json", ORJSONResponse),
+    ("application/msgpack;q=0, application/bson", BSONResponse),
+])
+def test_negotiate(accept, expected):
+    assert negotiate(accept) is expected
+
+@pytest.mark.parametrize("accept_encoding, expected", [
+    (None, None),
+    ("gzip", "gzip"),
+    ("gzip, deflate, br", "br"),
+    ("br;q=0.5, gzip", "gzip"),
+    ("*", "br"),
+    ("identity", None),
+])
+def test_choose_encoding(accept_encoding, expected):
+    assert choose_encoding(accept_encoding) == expected
+
+def test_list_vehicles_binary_formats(mock_service):
+    vehicles = _vehicles(2)
+    mock_service.list_vehicles.return_value = VehiclePage(items=vehicles)
+    mock_service.count_vehicles.return_value = 2
+
+    packed = client.get("/api/v1/vehicles/", headers={"Accept": "application/msgpack"})
+    assert packed.headers["content-type"] == "application/msgpack"
+    assert packed.headers["vary"] == "Accept"
+    assert msgpack.unpackb(packed.content) == client.get("/api/v1/vehicles/").json()
+
+    encoded = client.get("/api/v1/vehicles/", headers={"Accept": "application/bson"})
+    assert encoded.headers["content-type"] == "application/bson"
+    items = bson.decode(encoded.content)["items"]
+    assert items[1]["placa"] == "NG-001-AA"
+    assert items[1]["vigencia_seguro"].year == 2030
+    assert items[1]["tipo_vehiculo"] == "TRAILER"
+
+def test_large_responses_are_compressed(mock_service):
+    mock_service.list_vehicles.return_value = VehiclePage(items=_vehicles(50))
+    mock_service.count_vehicles.return_value = 50
+    mock_service.get_vehicle.return_value = _vehicles(1)[0]
+
+    for encoding in ("br", "gzip"):
+        response = client.get("/api/v1/vehicles/", headers={"Accept-Encoding": encoding})
+        assert response.headers["content-encoding"] == encoding
+        assert "Accept-Encoding" in response.headers["vary"]
+        assert int(response.headers["content-length"]) < len(response.content)
+        assert len(response.json()) == 50
+
+    # A single vehicle is under the threshold
+    small = client.get(f"/api/v1/vehicles/{'0' * 24}", headers={"Accept-Encoding": "br"})
+    assert "content-encoding" not in small.headers
+
+def test_etags_differ_per_representation(mock_service):
+    vehicle = _vehicles(1)[0]
+    mock_service.get_vehicle.return_value = vehicle
+    mock_service.list_vehicles.return_value = VehiclePage(items=_vehicles(50))
+    mock_service.count_vehicles.return_value = 50
+    url = f"/api/v1/vehicles/{vehicle.id}"
+
+    json_etag = client.get(url).headers["etag"]
+    packed = client.get(url, headers={"Accept": "application/msgpack", "If-None-Match": json_etag})
+    assert packed.status_code == 200
+    assert packed.headers["etag"] == f'"{vehicle.id}-1-msgpack"'
+
+    not_modified = client.get(url, headers={"Accept": "application/msgpack", "If-None-Match": packed.headers["etag"]})
+    assert not_modified.status_code == 304
+    assert not_modified.headers["vary"] == "Accept, Accept-Encoding"
+
+    compressed = client.get("/api/v1/vehicles/", headers={"Accept-Encoding": "gzip"})
+    assert compressed.headers["etag"].startswith('W/"')
+    identity = client.get("/api/v1/vehicles/", headers={"Accept-Encoding": "identity"})
+    assert compressed.headers["etag"] == f"W/{identity.headers['etag']}"
+    revalidated = client.get("/api/v1/vehicles/", headers={"If-None-Match": compressed.headers["etag"]})
+    assert revalidated.status_code == 304
+
+@pytest.mark.parametrize("header, expected", [
+    ('"abc-2"', 2),
+    ('W/"abc-2"', 2),
+    ('"abc-2-msgpack"', 2),
+    ('"abc-x"', None),
+    ('"abc-2-1"', None),
+])
+def test_etag_version_accepts_representations(header, expected):
+    assert etag_version(header, "abc") == expected
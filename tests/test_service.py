@@ -1,18 +1,22 @@
+import json
 import pytest
-from unittest.mock import Mock, MagicMock
+from datetime import datetime, timedelta
+from bson import ObjectId
+from unittest.mock import AsyncMock, MagicMock
 from fastapi import HTTPException
+from pymongo.errors import OperationFailure
 from src.services.vehicle_service import VehicleService
 from src.models.vehicle import Vehicle, VehicleCreate, VehicleUpdate, VehicleType, VehicleStatus
 
 @pytest.fixture
 def mock_repo():
-    return Mock()
+    return AsyncMock()
 
 @pytest.fixture
 def service(mock_repo):
     return VehicleService(mock_repo)
 
-def test_create_vehicle_success(service, mock_repo):
+async def test_create_vehicle_success(service, mock_repo):
     # Setup
     vehicle_in = VehicleCreate(
         placa="AA-123-BB",
@@ -34,13 +38,13 @@ def test_create_vehicle_success(service, mock_repo):
     mock_repo.create.return_value = created_vehicle
 
     # Execute
-    result = service.create_vehicle(vehicle_in)
+    result = await service.create_vehicle(vehicle_in)
 
     # Verify
     assert result == created_vehicle
     mock_repo.create.assert_called_once()
 
-def test_create_vehicle_duplicate_placa(service, mock_repo):
+async def test_create_vehicle_duplicate_placa(service, mock_repo):
     vehicle_in = VehicleCreate(
         placa="AA-123-BB",
         numero_economico="100",
@@ -59,12 +63,27 @@ def test_create_vehicle_duplicate_placa(service, mock_repo):
 
     # Execute
     with pytest.raises(HTTPException) as exc:
-        service.create_vehicle(vehicle_in)
+        await service.create_vehicle(vehicle_in)
     
     assert exc.value.status_code == 400
     assert "license plate already exists" in exc.value.detail
 
-def test_update_vehicle_success(service, mock_repo):
+async def test_create_vehicle_direct_mode(service, mock_repo):
+    from pymongo.errors import DuplicateKeyError
+    service.create_mode = "direct"
+    vehicle_in = _vehicle_create(0)
+    mock_repo.create.side_effect = DuplicateKeyError(
+        "E11000 duplicate key error", 11000, {"keyPattern": {"numero_serie": 1}}
+    )
+
+    with pytest.raises(HTTPException) as exc:
+        await service.create_vehicle(vehicle_in)
+
+    assert exc.value.status_code == 400
+    assert "VIN already exists" in exc.value.detail
+    mock_repo.check_uniqueness.assert_not_called()
+
+async def test_update_vehicle_success(service, mock_repo):
     vehicle_id = "test_id"
     existing_vehicle = Vehicle(
         id=vehicle_id,
@@ -80,14 +99,355 @@ def test_update_vehicle_success(service, mock_repo):
         vigencia_seguro="2025-01-01"
     )
 
-    mock_repo.get_by_id.return_value = existing_vehicle
-    mock_repo.get_by_field.return_value = None # No duplicates for new values
-    
     update_data = VehicleUpdate(placa="NEW-PL8")
     updated_vehicle = existing_vehicle.model_copy(update={"placa": "NEW-PL8"})
-    mock_repo.update.return_value = updated_vehicle
+    mock_repo.update_with_previous.return_value = (existing_vehicle, updated_vehicle)
 
-    result = service.update_vehicle(vehicle_id, update_data)
+    result = await service.update_vehicle(vehicle_id, update_data)
 
     assert result.placa == "NEW-PL8"
-    mock_repo.update.assert_called_once()
+    mock_repo.update_with_previous.assert_called_once()
+    # A single atomic write: no reads before it
+    mock_repo.get_by_id.assert_not_called()
+    mock_repo.get_by_field.assert_not_called()
+
+async def test_list_vehicles_invalid_cursor(service, mock_repo):
+    from src.db.pagination import InvalidCursorError
+    mock_repo.list.side_effect = InvalidCursorError("Malformed pagination cursor")
+
+    with pytest.raises(HTTPException) as exc:
+        await service.list_vehicles(cursor="bad")
+
+    assert exc.value.status_code == 400
+
+def _vehicle_create(i: int, **overrides) -> VehicleCreate:
+    data = dict(
+        placa=f"BK-{i:03d}-AA",
+        numero_economico=f"BK-{i}",
+        marca="Utility",
+        modelo="3000R",
+        anno=2021,
+        tipo_vehiculo=VehicleType.TRAILER,
+        capacidad_carga_kg=30000,
+        numero_serie=f"BK{i:015d}",
+        poliza_seguro="INS-BK",
+        vigencia_seguro="2026-01-01"
+    )
+    data.update(overrides)
+    return VehicleCreate(**data)
+
+async def test_create_vehicles_bulk(service, mock_repo):
+    batch = [
+        _vehicle_create(0),
+        _vehicle_create(1, placa="TAKEN-01"),
+        _vehicle_create(2, numero_economico="BK-0"),
+        _vehicle_create(3),
+        _vehicle_create(4),
+    ]
+    mock_repo.find_conflicts.return_value = [{"placa": "TAKEN-01"}]
+    mock_repo.create_many.return_value = (
+        [Vehicle(id="a", **batch[0].model_dump()), None, Vehicle(id="c", **batch[4].model_dump())],
+        {1: {"index": 1, "code": 11000, "keyPattern": {"numero_serie": 1}}},
+    )
+
+    result = await service.create_vehicles_bulk(batch)
+
+    mock_repo.find_conflicts.assert_awaited_once()
+    mock_repo.create_many.assert_awaited_once_with([batch[0], batch[3], batch[4]])
+    assert (result.created, result.failed) == (2, 3)
+    assert [r.status for r in result.results] == ["created", "error", "error", "error", "created"]
+    assert "license plate" in result.results[1].error
+    assert "earlier in this batch" in result.results[2].error
+    assert "VIN" in result.results[3].error
+
+async def test_create_vehicles_bulk_too_large(service, mock_repo):
+    service.max_bulk_size = 1
+
+    with pytest.raises(HTTPException) as exc:
+        await service.create_vehicles_bulk([_vehicle_create(0), _vehicle_create(1)])
+
+    assert exc.value.status_code == 400
+    mock_repo.create_many.assert_not_called()
+
+async def test_update_vehicles_bulk(mock_repo):
+    from src.models.vehicle import BulkUpdateRequest
+    stats = AsyncMock()
+    service = VehicleService(mock_repo, stats)
+    first = Vehicle(id="a", version=1, **_vehicle_create(0).model_dump())
+    second = Vehicle(id="b", version=1, **_vehicle_create(1).model_dump())
+    to_maintenance = {"update": {"estado_vehiculo": "IN_MAINTENANCE"}}
+    request = BulkUpdateRequest(items=[
+        {"id": "a", **to_maintenance},
+        {"id": "b", **to_maintenance},
+        {"id": "a", **to_maintenance},
+        {"id": "missing", **to_maintenance},
+    ])
+    mock_repo.bulk_update.return_value = (
+        [
+            (first, first.model_copy(update={"estado_vehiculo": VehicleStatus.IN_MAINTENANCE, "version": 2})),
+            None,
+            None,
+        ],
+        {1: {"index": 1, "code": 11000, "keyPattern": {"placa": 1}}},
+    )
+
+    result = await service.update_vehicles_bulk(request)
+
+    assert [change[0] for change in mock_repo.bulk_update.call_args.args[0]] == ["a", "b", "missing"]
+    assert (result.updated, result.failed) == (1, 3)
+    assert [r.status for r in result.results] == ["updated", "error", "error", "not_found"]
+    assert "license plate" in result.results[1].error
+    assert "earlier in this batch" in result.results[2].error
+    stats.apply.assert_awaited_once()
+    assert stats.apply.await_args.args[0] == {
+        ("estado_vehiculo", "ACTIVE"): [-1, -30000.0],
+        ("estado_vehiculo", "IN_MAINTENANCE"): [1, 30000.0],
+    }
+
+async def test_update_vehicles_bulk_by_filter(service, mock_repo):
+    from src.models.vehicle import BulkUpdateRequest
+    service.max_bulk_size = 2
+    request = BulkUpdateRequest(filter={"base_operativa": "MTY"}, set={"estado_vehiculo": "ACTIVE"})
+    mock_repo.find_ids.return_value = ["a", "b", "c"]
+
+    with pytest.raises(HTTPException) as exc:
+        await service.update_vehicles_bulk(request)
+
+    assert exc.value.status_code == 400
+    assert mock_repo.find_ids.call_args.args[0] == {"base_operativa": "MTY"}
+    mock_repo.bulk_update.assert_not_called()
+
+async def test_search_vehicles_ranking(service, mock_repo):
+    exact = Vehicle(id="a", **_vehicle_create(0, placa="AB-123").model_dump())
+    longer = Vehicle(id="b", **_vehicle_create(1, placa="AB-12345").model_dump())
+    fleet = Vehicle(id="c", **_vehicle_create(2, numero_economico="AB-1234").model_dump())
+    text = Vehicle(id="d", **_vehicle_create(3).model_dump())
+
+    async def prefix_search(field, prefix, limit):
+        return {"placa": [exact, longer], "numero_economico": [fleet, exact], "numero_serie": []}[field]
+    mock_repo.prefix_search.side_effect = prefix_search
+    mock_repo.text_search.return_value = [(text, 1.5), (longer, 0.8)]
+
+    hits = await service.search_vehicles(" ab-123 ", limit=3)
+
+    assert [hit.vehicle.id for hit in hits] == ["a", "b", "c"]
+    assert [hit.matched for hit in hits] == ["placa", "placa", "numero_economico"]
+    assert hits[0].exact and not hits[1].exact
+    assert mock_repo.prefix_search.call_args.args[1] == "ab-123"
+
+    with pytest.raises(HTTPException) as exc:
+        await service.search_vehicles("   ")
+    assert exc.value.status_code == 400
+
+async def test_search_while_text_index_builds_is_unavailable(service, mock_repo):
+    mock_repo.prefix_search.return_value = []
+    mock_repo.text_search.side_effect = OperationFailure("text index required for $text query", code=27)
+
+    with pytest.raises(HTTPException) as exc:
+        await service.search_vehicles("kenworth")
+    assert exc.value.status_code == 503
+    assert "Retry-After" in exc.value.headers
+
+    mock_repo.text_search.side_effect = OperationFailure("boom", code=2)
+    with pytest.raises(OperationFailure):
+        await service.search_vehicles("kenworth")
+
+async def test_export_vehicles_raw_matches_validated(service, mock_repo):
+    docs = [
+        {
+            "_id": ObjectId(), "placa": f"EX-{i:03d}-AA", "numero_economico": f"EX-{i}",
+            "marca": "Volvo", "modelo": "VNL", "anno": 2020, "tipo_vehiculo": "TRAILER",
+            "capacidad_carga_kg": 30000.0, "numero_serie": f"EX{i:015d}", "estado_vehiculo": "ACTIVE",
+            "fecha_alta": datetime(2024, 1, 2, 3, 4, 5), "ultima_verificacion": None,
+            "poliza_seguro": "P-1", "vigencia_seguro": datetime(2026, 1, 1),
+        }
+        for i in range(3)
+    ]
+
+    async def stream(batch_size):
+        for doc in docs:
+            yield dict(doc)
+    mock_repo.stream = stream
+
+    validated = [chunk async for chunk in service.export_vehicles(batch_size=2)]
+    raw = [chunk async for chunk in service.export_vehicles(batch_size=2, validate=False)]
+
+    assert len(validated) == 2
+    validated_rows = [json.loads(line) for line in b"".join(validated).splitlines()]
+    raw_rows = [json.loads(line) for line in b"".join(raw).splitlines()]
+    assert len(raw_rows) == 3
+    for validated_row, raw_row in zip(validated_rows, raw_rows):
+        assert {k: v for k, v in validated_row.items() if v is not None} == \
+            {k: v for k, v in raw_row.items() if v is not None}
+
+async def test_update_vehicle_if_match(service, mock_repo):
+    existing_vehicle = _vehicle_create(0)
+    current = Vehicle(id="abc", version=2, **existing_vehicle.model_dump())
+    updated = current.model_copy(update={"marca": "Kenworth", "version": 3})
+    mock_repo.get_by_id.return_value = current
+
+    # Stale version: the filtered update misses and the vehicle still exists
+    mock_repo.update_with_previous.return_value = None
+    with pytest.raises(HTTPException) as exc:
+        await service.update_vehicle("abc", VehicleUpdate(marca="Kenworth"), if_match='"abc-1"')
+    assert exc.value.status_code == 412
+    assert mock_repo.update_with_previous.call_args.kwargs["expected_version"] == 1
+
+    mock_repo.update_with_previous.return_value = (current, updated)
+    result = await service.update_vehicle("abc", VehicleUpdate(marca="Kenworth"), if_match='"abc-2"')
+    assert result.version == 3
+    assert mock_repo.update_with_previous.call_args.kwargs["expected_version"] == 2
+
+    # ETags that do not name a version are compared against the stored vehicle
+    mock_repo.update_with_previous.reset_mock()
+    with pytest.raises(HTTPException) as exc:
+        await service.update_vehicle("abc", VehicleUpdate(marca="Kenworth"), if_match='"other", "abc-1"')
+    assert exc.value.status_code == 412
+    mock_repo.update_with_previous.assert_not_called()
+
+    # Conditional update against a vehicle that does not exist
+    mock_repo.update_with_previous.return_value = None
+    mock_repo.get_by_id.return_value = None
+    with pytest.raises(HTTPException) as exc:
+        await service.update_vehicle("abc", VehicleUpdate(marca="Kenworth"), if_match='"abc-2"')
+    assert exc.value.status_code == 404
+
+def test_etag_helpers():
+    from src.services.etag import vehicle_etag, list_etag, etag_matches
+    unversioned = Vehicle(id="abc", **_vehicle_create(0).model_dump())
+
+    assert vehicle_etag(unversioned) == vehicle_etag(unversioned.model_copy())
+    assert vehicle_etag(unversioned) != vehicle_etag(unversioned.model_copy(update={"marca": "Kenworth"}))
+    assert list_etag([unversioned], "c1") != list_etag([unversioned], "c2")
+    assert etag_matches('"a", W/"b"', '"b"', weak=True)
+    assert not etag_matches('W/"b"', '"b"')
+    assert etag_matches("*", '"b"')
+
+async def test_vehicle_fields_not_found(service, mock_repo):
+    mock_repo.get_fields_by_id.return_value = None
+
+    with pytest.raises(HTTPException) as exc:
+        await service.get_vehicle_fields("abc", ["placa"])
+
+    assert exc.value.status_code == 404
+
+async def test_writes_update_fleet_stats(mock_repo):
+    stats = AsyncMock()
+    service = VehicleService(mock_repo, stats)
+    vehicle_in = _vehicle_create(0, base_operativa="MTY")
+    created = Vehicle(id="a", version=1, **vehicle_in.model_dump())
+    mock_repo.check_uniqueness.return_value = []
+    mock_repo.create.return_value = created
+
+    await service.create_vehicle(vehicle_in)
+    assert stats.apply.await_args.args[0] == {
+        ("estado_vehiculo", "ACTIVE"): [1, 30000.0],
+        ("tipo_vehiculo", "TRAILER"): [1, 30000.0],
+        ("base_operativa", "MTY"): [1, 30000.0],
+    }
+
+    mock_repo.update_with_previous.return_value = (
+        created, created.model_copy(update={"base_operativa": "GDL", "version": 2})
+    )
+    await service.update_vehicle("a", VehicleUpdate(base_operativa="GDL"))
+    assert stats.apply.await_args.args[0] == {
+        ("base_operativa", "GDL"): [1, 30000.0],
+        ("base_operativa", "MTY"): [-1, -30000.0],
+    }
+
+    mock_repo.delete_returning.return_value = created
+    await service.delete_vehicle("a")
+    assert stats.apply.await_args.args[0][("estado_vehiculo", "ACTIVE")] == [-1, -30000.0]
+
+async def test_count_vehicles_is_cached_and_kept_current(mock_repo):
+    from src.db.cache import CountCache
+    from src.models.vehicle import VehicleFilters
+    service = VehicleService(mock_repo, counts=CountCache(ttl_seconds=60))
+    mty = VehicleFilters(base_operativa="MTY")
+    mock_repo.count.side_effect = lambda filters: 7 if filters == mty else 20
+
+    assert await service.count_vehicles() == 20
+    assert await service.count_vehicles(mty) == 7
+    assert await service.count_vehicles(mty) == 7
+    assert mock_repo.count.await_count == 2
+
+    vehicle_in = _vehicle_create(0, base_operativa="MTY")
+    created = Vehicle(id="a", version=1, **vehicle_in.model_dump())
+    mock_repo.check_uniqueness.return_value = []
+    mock_repo.create.return_value = created
+    await service.create_vehicle(vehicle_in)
+    assert await service.count_vehicles() == 21
+    assert await service.count_vehicles(mty) == 8
+
+    mock_repo.delete_returning.return_value = created
+    await service.delete_vehicle("a")
+    assert await service.count_vehicles() == 20
+    assert await service.count_vehicles(mty) == 7
+    assert mock_repo.count.await_count == 2
+
+async def test_count_racing_a_write_is_not_cached(mock_repo):
+    import asyncio
+    from src.db.cache import CountCache
+    service = VehicleService(mock_repo, counts=CountCache(ttl_seconds=60))
+    counting, release = asyncio.Event(), asyncio.Event()
+
+    async def count(filters):
+        # The query already sees the vehicle created below
+        counting.set()
+        await release.wait()
+        return 21
+
+    mock_repo.count.side_effect = count
+    pending = asyncio.ensure_future(service.count_vehicles())
+    await counting.wait()
+    vehicle_in = _vehicle_create(0)
+    mock_repo.check_uniqueness.return_value = []
+    mock_repo.create.return_value = Vehicle(id="a", version=1, **vehicle_in.model_dump())
+    await service.create_vehicle(vehicle_in)
+    release.set()
+
+    assert await pending == 21
+    mock_repo.count.side_effect = lambda filters: 21
+    # Not stored and then bumped to 22 by the create
+    assert await service.count_vehicles() == 21
+    assert mock_repo.count.await_count == 2
+
+async def test_due_vehicles_merges_in_date_order():
+    from mongomock_motor import AsyncMongoMockClient
+    from src.db.repository import VehicleRepository
+    repository = VehicleRepository(AsyncMongoMockClient().db)
+    service = VehicleService(repository)
+    today = datetime.combine(datetime.utcnow().date(), datetime.min.time())
+    fleet = {
+        # numero_economico: (vigencia_seguro, ultima_verificacion)
+        "INSURANCE-SOON": (today + timedelta(days=10), today),
+        "INSURANCE-EXPIRED": (today - timedelta(days=5), today),
+        "BOTH": (today + timedelta(days=20), today - timedelta(days=400)),
+        "NEVER-INSPECTED": (today + timedelta(days=900), None),
+        "INSPECTION-OLD": (today + timedelta(days=900), today - timedelta(days=380)),
+        "COMPLIANT": (today + timedelta(days=900), today - timedelta(days=10)),
+    }
+    for i, (numero_economico, (vigencia, verificacion)) in enumerate(fleet.items()):
+        await repository.create(_vehicle_create(
+            i, numero_economico=numero_economico, vigencia_seguro=vigencia.date(),
+            ultima_verificacion=verificacion
+        ))
+
+    async def due(**kwargs):
+        chunks = [chunk async for chunk in service.due_vehicles(batch_size=2, **kwargs)]
+        return [json.loads(line) for line in b"".join(chunks).splitlines()]
+
+    rows = await due(insurance_within_days=30)
+    assert [r["vehicle"]["numero_economico"] for r in rows] == ["INSURANCE-EXPIRED", "INSURANCE-SOON", "BOTH"]
+
+    rows = await due(insurance_within_days=30, inspection_older_than_days=365)
+    assert [r["vehicle"]["numero_economico"] for r in rows] == [
+        "NEVER-INSPECTED", "INSPECTION-OLD", "INSURANCE-EXPIRED", "INSURANCE-SOON", "BOTH"
+    ]
+    assert rows[0]["due"] == ["inspection"] and rows[0]["due_at"] is None
+    assert rows[-1]["due"] == ["insurance", "inspection"]
+
+async def test_due_vehicles_requires_a_check(service):
+    with pytest.raises(HTTPException) as exc:
+        service.due_vehicles()
+    assert exc.value.status_code == 400
@@ -0,0 +1,100 @@
+import asyncio
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+from src.db.repository import VehicleRepository
+from src.db.single_flight import SingleFlight
+from src.metrics import reads_coalesced
+from src.models.vehicle import VehicleCreate, VehicleType, VehicleFilters
+
+class SlowQuery:
+    def __init__(self, result=None, error=None):
+        self.result = result
+        self.error = error
+        self.calls = 0
+        self.release = asyncio.Event()
+
+    async def __call__(self):
+        self.calls += 1
+        await self.release.wait()
+        if self.error:
+            raise self.error
+        return self.result
+
+async def test_concurrent_calls_share_one_query():
+    flights = SingleFlight(enabled=True)
+    query = SlowQuery(result={"id": "a"})
+    before = reads_coalesced.value(("get",))
+
+    callers = [asyncio.ensure_future(flights.do(("get", "a"), query)) for _ in range(5)]
+    await asyncio.sleep(0)
+    query.release.set()
+    results = await asyncio.gather(*callers)
+
+    assert query.calls == 1
+    assert all(result is results[0] for result in results)
+    assert flights.stats()["deduplicated"] == 4
+    assert flights.stats()["in_flight"] == 0
+    assert reads_coalesced.value(("get",)) - before == 4
+
+async def test_errors_reach_every_caller_and_cancellation_does_not():
+    flights = SingleFlight(enabled=True)
+    query = SlowQuery(error=RuntimeError("boom"))
+
+    first = asyncio.ensure_future(flights.do(("get", "a"), query))
+    second = asyncio.ensure_future(flights.do(("get", "a"), query))
+    await asyncio.sleep(0)
+    first.cancel()
+    query.release.set()
+
+    with pytest.raises(RuntimeError):
+        await second
+    assert first.cancelled()
+    assert query.calls == 1
+
+async def test_forget_starts_a_fresh_query():
+    flights = SingleFlight(enabled=True)
+    stale, fresh = SlowQuery(result="stale"), SlowQuery(result="fresh")
+
+    waiting = asyncio.ensure_future(flights.do(("list", 1), stale))
+    await asyncio.sleep(0)
+    flights.forget("list")
+    after_write = asyncio.ensure_future(flights.do(("list", 1), fresh))
+    await asyncio.sleep(0)
+    stale.release.set()
+    fresh.release.set()
+
+    assert await waiting == "stale"
+    assert await after_write == "fresh"
+
+async def test_repository_coalesces_reads():
+    repository = VehicleRepository(AsyncMongoMockClient().db, flights=SingleFlight(enabled=True))
+    created = await repository.create(VehicleCreate(
+        placa="SF-123-AA", numero_economico="SF-1", marca="Volvo", modelo="VNL", anno=2020,
+        tipo_vehiculo=VehicleType.TRAILER, capacidad_carga_kg=20000, numero_serie="SF000000000000001",
+        poliza_seguro="P-1", vigencia_seguro="2030-01-01"
+    ))
+    find_one, find = repository.collection.find_one, repository.collection.find
+    counts = {"find_one": 0, "find": 0}
+
+    async def counting_find_one(*args, **kwargs):
+        counts["find_one"] += 1
+        await asyncio.sleep(0.01)
+        return await find_one(*args, **kwargs)
+
+    def counting_find(*args, **kwargs):
+        counts["find"] += 1
+        return find(*args, **kwargs)
+
+    repository.collection.find_one = counting_find_one
+    repository.collection.find = counting_find
+
+    vehicles = await asyncio.gather(*(repository.get_by_id(created.id) for _ in range(10)))
+    pages = await asyncio.gather(
+        *(repository.list(limit=10, filters=VehicleFilters(marca="Volvo")) for _ in range(10)),
+        repository.list(limit=5),
+    )
+
+    assert {vehicle.placa for vehicle in vehicles} == {"SF-123-AA"}
+    assert counts["find_one"] == 1
+    assert counts["find"] == 2
+    assert all(len(page.items) == 1 for page in pages)
@@ -0,0 +1,84 @@
+import asyncio
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+from src.db.repository import VehicleRepository
+from src.db.stats_repository import FleetStatsRepository, stats_delta
+from src.models.vehicle import VehicleCreate, VehicleUpdate, VehicleType, VehicleStatus
+
+@pytest.fixture
+def mock_db():
+    client = AsyncMongoMockClient()
+    return client.db
+
+def _vehicle(i: int, base, tipo=VehicleType.TRAILER) -> VehicleCreate:
+    return VehicleCreate(
+        placa=f"ST-{i:03d}-AA",
+        numero_economico=f"ST-{i}",
+        marca="Utility",
+        modelo="3000R",
+        anno=2021,
+        tipo_vehiculo=tipo,
+        capacidad_carga_kg=1000.0 * (i + 1),
+        numero_serie=f"ST{i:015d}",
+        poliza_seguro="INS-ST",
+        vigencia_seguro="2026-01-01",
+        base_operativa=base
+    )
+
+async def test_incremental_counters(mock_db):
+    vehicles = VehicleRepository(mock_db)
+    stats = FleetStatsRepository(mock_db)
+
+    created = [await vehicles.create(_vehicle(i, base)) for i, base in enumerate(["MTY", "MTY", None])]
+    await stats.apply(stats_delta(added=created))
+
+    moved = await vehicles.update(created[0].id, VehicleUpdate(
+        base_operativa="GDL", estado_vehiculo=VehicleStatus.IN_MAINTENANCE
+    ))
+    await stats.apply(stats_delta(added=[moved], removed=[created[0]]))
+    await stats.apply(stats_delta(removed=[created[2]]))
+
+    result = await stats.get()
+    assert result.total == 2
+    assert result.by_estado_vehiculo == {"ACTIVE": 1, "IN_MAINTENANCE": 1}
+    assert result.by_tipo_vehiculo == {"TRAILER": 2}
+    assert result.by_base_operativa == {"MTY": 1, "GDL": 1}
+    assert result.capacidad_carga_kg_by_base == {"MTY": 2000.0, "GDL": 1000.0}
+
+async def test_rebuild_matches_incremental(mock_db):
+    vehicles = VehicleRepository(mock_db)
+    stats = FleetStatsRepository(mock_db)
+    created = [
+        await vehicles.create(_vehicle(i, base, tipo))
+        for i, (base, tipo) in enumerate([
+            ("MTY", VehicleType.TRAILER), (None, VehicleType.DOLLY), ("GDL", VehicleType.TRAILER)
+        ])
+    ]
+    await stats.apply(stats_delta(added=created))
+    incremental = await stats.get()
+
+    await stats.collection.delete_many({})
+
+    rebuilt = await stats.rebuild()
+    assert rebuilt == incremental
+    assert rebuilt.by_base_operativa == {"MTY": 1, "GDL": 1, "UNASSIGNED": 1}
+
+def test_stats_delta_cancels_out():
+    vehicle = _vehicle(0, "MTY")
+    assert stats_delta(added=[vehicle], removed=[vehicle]) == {}
+
+async def test_concurrent_rebuilds_and_one_time_initialisation(mock_db):
+    vehicles = VehicleRepository(mock_db)
+    stats = FleetStatsRepository(mock_db)
+    created = [await vehicles.create(_vehicle(i, base)) for i, base in enumerate(["MTY", "GDL"])]
+    # A group left over from vehicles that no longer exist
+    await stats.apply(stats_delta(added=[created[0].model_copy(update={"base_operativa": "QRO"})]))
+
+    results = await asyncio.gather(stats.rebuild(), stats.rebuild())
+    assert results[0] == results[1]
+    assert results[0].by_base_operativa == {"MTY": 1, "GDL": 1}
+
+    workers = [FleetStatsRepository(mock_db) for _ in range(3)]
+    initialized = await asyncio.gather(*(worker.ensure_initialized() for worker in workers))
+    assert sorted(initialized) == [False, False, True]
+    assert await stats.get() == results[0]
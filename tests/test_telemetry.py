@@ -0,0 +1,150 @@
+from datetime import datetime, timedelta, timezone
+import pytest
+from fastapi import HTTPException
+from mongomock_motor import AsyncMongoMockClient
+from src.db.repository import VehicleRepository
+from src.models.vehicle import VehicleCreate, VehicleType, TelemetryBatch, TelemetryReading
+from src.services.telemetry import TelemetryBuffer, TelemetryBufferFull
+from src.services.vehicle_service import VehicleService
+
+NOW = datetime(2026, 1, 1, 12, 0)
+
+@pytest.fixture
+def repository():
+    return VehicleRepository(AsyncMongoMockClient().db)
+
+async def create_vehicle(repository, suffix: str, gps_id=None, kilometraje=None):
+    vehicle = VehicleCreate(
+        placa=f"TL-{suffix}-AA", numero_economico=f"TL-{suffix}", marca="Volvo", modelo="VNL", anno=2020,
+        tipo_vehiculo=VehicleType.TRAILER, capacidad_carga_kg=20000, numero_serie=f"TL00000000000{suffix}",
+        poliza_seguro="P-1", vigencia_seguro="2030-01-01", gps_id=gps_id, kilometraje_actual=kilometraje
+    )
+    # mongomock cannot $max against a stored null (MongoDB orders null below
+    # numbers and dates), so leave unset fields out of the document
+    doc = vehicle.model_dump(by_alias=True, exclude_none=True, exclude=["id"])
+    await repository.insert_documents([doc])
+    return await repository.get_by_id(str(doc["_id"]))
+
+async def test_readings_for_one_vehicle_are_coalesced(repository):
+    vehicle = await create_vehicle(repository, "0001", gps_id="GPS-1", kilometraje=5000)
+    buffer = TelemetryBuffer(flush_interval_seconds=60)
+    buffer._repository = repository
+
+    await buffer.add([
+        TelemetryReading(gps_id="GPS-1", kilometraje_actual=5200, rendimiento_km_litro=2.5, timestamp=NOW),
+        # Out of order: an older report must not move the odometer back
+        TelemetryReading(gps_id="GPS-1", kilometraje_actual=5100, rendimiento_km_litro=9.9,
+                         timestamp=NOW - timedelta(minutes=5)),
+        TelemetryReading(id=vehicle.id, rendimiento_km_litro=2.7, timestamp=NOW + timedelta(minutes=1)),
+    ])
+    assert buffer.pending == 2
+    assert buffer.stats()["coalesced"] == 1
+
+    assert await buffer.flush() == 1
+    stored = await repository.get_by_id(vehicle.id)
+    assert stored.kilometraje_actual == 5200
+    assert stored.rendimiento_km_litro == 2.7
+    assert stored.ultimo_reporte_gps == NOW + timedelta(minutes=1)
+    assert stored.version == vehicle.version + 1
+    assert buffer.pending == 0
+
+async def test_flush_never_regresses_stored_values(repository):
+    vehicle = await create_vehicle(repository, "0002", kilometraje=9000)
+    buffer = TelemetryBuffer()
+    buffer._repository = repository
+
+    aware = datetime(2026, 1, 1, 7, 0, tzinfo=timezone(timedelta(hours=-5)))
+    await buffer.add([
+        TelemetryReading(id=vehicle.id, kilometraje_actual=8000, timestamp=aware),
+        TelemetryReading(gps_id="UNKNOWN", kilometraje_actual=1),
+    ])
+    await buffer.flush()
+
+    stored = await repository.get_by_id(vehicle.id)
+    assert stored.kilometraje_actual == 9000
+    assert stored.ultimo_reporte_gps == NOW
+    assert buffer.stats()["unmatched"] == 1
+
+async def test_older_fuel_efficiency_in_a_later_flush_is_ignored(repository):
+    vehicle = await create_vehicle(repository, "0007")
+    buffer = TelemetryBuffer()
+    buffer._repository = repository
+
+    await buffer.add([TelemetryReading(id=vehicle.id, rendimiento_km_litro=2.7, timestamp=NOW)])
+    await buffer.flush()
+    # Delayed by the unit, so it lands in the next flush
+    await buffer.add([TelemetryReading(id=vehicle.id, rendimiento_km_litro=9.9, timestamp=NOW - timedelta(minutes=5))])
+    assert await buffer.flush() == 1
+
+    stored = await repository.get_by_id(vehicle.id)
+    assert stored.rendimiento_km_litro == 2.7
+    assert stored.ultimo_reporte_gps == NOW
+
+    await buffer.add([TelemetryReading(id=vehicle.id, rendimiento_km_litro=3.1, timestamp=NOW + timedelta(minutes=1))])
+    await buffer.flush()
+    assert (await repository.get_by_id(vehicle.id)).rendimiento_km_litro == 3.1
+
+def test_future_timestamps_are_rejected():
+    with pytest.raises(ValueError, match="future"):
+        TelemetryReading(id="x", timestamp=datetime.utcnow() + timedelta(days=1))
+    # A little clock skew is tolerated
+    TelemetryReading(id="x", timestamp=datetime.now(timezone.utc) + timedelta(minutes=1))
+
+async def test_full_buffer_flushes_then_rejects(repository):
+    first, second = await create_vehicle(repository, "0003"), await create_vehicle(repository, "0004")
+    buffer = TelemetryBuffer(max_pending_vehicles=1, backpressure_timeout_seconds=1)
+    buffer._repository = repository
+
+    await buffer.add([TelemetryReading(id=first.id, kilometraje_actual=10)])
+    # Room is made by flushing early
+    await buffer.add([TelemetryReading(id=second.id, kilometraje_actual=20)])
+    assert buffer.stats()["flushes"] == 1
+    assert (await repository.get_by_id(first.id)).kilometraje_actual == 10
+
+    with pytest.raises(TelemetryBufferFull):
+        await buffer.add([TelemetryReading(id=first.id), TelemetryReading(id=second.id)])
+    assert buffer.stats()["rejected"] == 2
+
+    service = VehicleService(repository, telemetry=TelemetryBuffer(max_pending_vehicles=0, backpressure_timeout_seconds=0))
+    with pytest.raises(HTTPException) as exc:
+        await service.ingest_telemetry(TelemetryBatch(readings=[TelemetryReading(id=first.id)]))
+    assert exc.value.status_code == 503
+    assert "Retry-After" in exc.value.headers
+
+async def test_failed_flush_keeps_readings(repository):
+    vehicle = await create_vehicle(repository, "0005")
+    buffer = TelemetryBuffer()
+    buffer._repository = repository
+    apply_telemetry = repository.apply_telemetry
+
+    async def failing(updates):
+        raise RuntimeError("primary stepped down")
+
+    repository.apply_telemetry = failing
+    await buffer.add([TelemetryReading(id=vehicle.id, kilometraje_actual=100)])
+    assert await buffer.flush() == 0
+    assert buffer.pending == 1
+    assert buffer.stats()["flush_failures"] == 1
+
+    repository.apply_telemetry = apply_telemetry
+    assert await buffer.flush() == 1
+    assert (await repository.get_by_id(vehicle.id)).kilometraje_actual == 100
+
+async def test_stop_flushes_what_is_buffered(repository):
+    vehicle = await create_vehicle(repository, "0006")
+    buffer = TelemetryBuffer(flush_interval_seconds=60)
+    buffer.start(repository)
+
+    await buffer.add([TelemetryReading(id=vehicle.id, kilometraje_actual=321)])
+    await buffer.stop()
+
+    assert buffer.pending == 0
+    assert (await repository.get_by_id(vehicle.id)).kilometraje_actual == 321
+
+def test_heartbeat_is_not_client_writable():
+    vehicle = VehicleCreate(
+        placa="TL-9999-AA", numero_economico="TL-9999", marca="Volvo", modelo="VNL", anno=2020,
+        tipo_vehiculo=VehicleType.TRAILER, capacidad_carga_kg=20000, numero_serie="TL000000000009999",
+        poliza_seguro="P-1", vigencia_seguro="2030-01-01", ultimo_reporte_gps="2100-01-01T00:00:00"
+    )
+    assert "ultimo_reporte_gps" not in vehicle.model_dump()